@@ -0,0 +1,296 @@
+"""
+Load test of the FastAPI backend (src/app.py) with the traffic of the dashboard pages.
+
+Virtual users (threads, each with its own keep-alive connection, like the dashboard's
+pooled session) load pages one after the other: every page load is the sequence of
+requests that page makes (web_app/data_client.py), on a subreddit picked with a Zipf skew
+(a few subreddits get most of the views) and, for the trend pages, a random granularity
+and time range of the ones the dashboard offers. The page mix is set with --mix.
+
+For every concurrency level it reports, per route (path template) and overall: requests,
+throughput, p50/p95/p99 latency and error rate (HTTP errors and failed connections).
+Requests of the --warmup seconds are not counted. Results are saved as JSON (one file per
+commit) and can be compared with a previous run, for instance before and after a backend
+change, against the same database. Run the backend as it is deployed (docker-compose.yaml):
+a single worker, since the live update subscribers live in one process. --server-workers
+records the number of workers it ran with, and runs with different numbers are not compared.
+
+    uvicorn src.app:app --host 0.0.0.0 --port 8000
+    python benchmarks/api_load.py --url http://localhost:8000 --concurrency 1 8 32 --duration 30
+    python benchmarks/api_load.py --baseline benchmarks/results/api-load-<commit>.json
+
+The client runs in one process: at high concurrency check that the reported client CPU
+stays well below one core, or the client is what is being measured.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from inference_suite import RESULTS_DIR, git_commit
+
+REGRESSION_THRESHOLD = 0.10 # flag routes with a p95 more than 10% higher (or a throughput 10% lower) than the baseline
+# the dashboard's trend ranges (web_app/data_client.py) and chart size
+TREND_RANGES = {"hourly": [4, 14, 30, 90], "daily": [30, 90, 365], "weekly": [90, 365, 730], "monthly": [365, 730, 1825]}
+MAX_CHART_POINTS = 300
+DEFAULT_MIX = {"selector": 2, "analysis": 3, "trends": 4, "compare": 1, "pipeline": 1}
+
+
+def selector_page(rng: random.Random, subreddit: str, subreddits: list[str]) -> list[tuple[str, str, dict]]:
+    """(route, path, params) of the requests of one page load"""
+    return [
+        ("/subreddits/", "/subreddits/", {}),
+        ("/posts/count/", "/posts/count/", {"subreddit": subreddit}),
+    ]
+
+
+def analysis_page(rng: random.Random, subreddit: str, subreddits: list[str]) -> list[tuple[str, str, dict]]:
+    return [
+        ("/data/comments/sentiment/{subreddit}", f"/data/comments/sentiment/{subreddit}", {}),
+        ("/posts/count/", "/posts/count/", {"subreddit": subreddit}),
+    ]
+
+
+def trends_page(rng: random.Random, subreddit: str, subreddits: list[str]) -> list[tuple[str, str, dict]]:
+    freq = rng.choice(list(TREND_RANGES))
+    days = rng.choice(TREND_RANGES[freq])
+    return [(f"/data/sentiment/{freq}/{{subreddit}}", f"/data/sentiment/{freq}/{subreddit}",
+             {"days": days, "max_points": MAX_CHART_POINTS})]
+
+
+def compare_page(rng: random.Random, subreddit: str, subreddits: list[str]) -> list[tuple[str, str, dict]]:
+    freq = rng.choice(list(TREND_RANGES))
+    others = rng.sample(subreddits, min(len(subreddits), rng.randint(1, 4)))
+    selected = sorted({subreddit, *others})
+    return [(f"/data/sentiment/compare/{freq}", f"/data/sentiment/compare/{freq}",
+             {"subreddits": selected, "days": TREND_RANGES[freq][0], "max_points": MAX_CHART_POINTS})]
+
+
+def pipeline_page(rng: random.Random, subreddit: str, subreddits: list[str]) -> list[tuple[str, str, dict]]:
+    return [
+        ("/metrics/stages/", "/metrics/stages/", {"hours": 24}),
+        ("/metrics/api/", "/metrics/api/", {"hours": 24}),
+    ]
+
+
+PAGES = {
+    "selector": selector_page,
+    "analysis": analysis_page,
+    "trends": trends_page,
+    "compare": compare_page,
+    "pipeline": pipeline_page,
+}
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """selector=2,trends=4 -> page weights"""
+    mix = {}
+    for item in value.split(","):
+        page, _, weight = item.partition("=")
+        if page not in PAGES:
+            raise argparse.ArgumentTypeError(f"unknown page {page!r}, expected one of {', '.join(PAGES)}")
+        mix[page] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, base_url: str, subreddits: list[str], mix: dict[str, float], think_time: float,
+                 start_time: float, warmup_end: float, end_time: float, seed: int, timeout: float):
+        super().__init__(daemon=True)
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.prefix = url.path.rstrip("/")
+        self.subreddits = subreddits
+        # Zipf-skewed subreddit popularity
+        self.subreddit_weights = [1 / (rank + 1) for rank in range(len(subreddits))]
+        self.mix = mix
+        self.think_time = think_time
+        self.start_time, self.warmup_end, self.end_time = start_time, warmup_end, end_time
+        self.rng = random.Random(seed)
+        self.timeout = timeout
+        self.samples = [] # (route, seconds, ok)
+        self.connection = None
+
+    def request(self, path: str, params: dict) -> bool:
+        query = urlencode(params, doseq=True)
+        target = f"{self.prefix}{path}" + (f"?{query}" if query else "")
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.connection.request("GET", target, headers={"Accept": "application/json"})
+            response = self.connection.getresponse()
+            response.read()
+            if response.will_close:
+                self.connection.close()
+                self.connection = None
+            return response.status < 400
+        except (OSError, http.client.HTTPException):
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = None
+            return False
+
+    def run(self):
+        pages, weights = list(self.mix), list(self.mix.values())
+        while time.perf_counter() < self.end_time:
+            page = self.rng.choices(pages, weights=weights)[0]
+            subreddit = self.rng.choices(self.subreddits, weights=self.subreddit_weights)[0]
+            for route, path, params in PAGES[page](self.rng, subreddit, self.subreddits):
+                started = time.perf_counter()
+                ok = self.request(path, params)
+                ended = time.perf_counter()
+                if started >= self.warmup_end and ended <= self.end_time:
+                    self.samples.append((route, ended - started, ok))
+            if self.think_time:
+                time.sleep(self.rng.expovariate(1 / self.think_time))
+        if self.connection is not None:
+            self.connection.close()
+
+
+def summarize(samples: list[tuple[str, float, bool]], seconds: float) -> dict:
+    latencies = sorted(s for _, s, _ in samples)
+    errors = sum(not ok for _, _, ok in samples)
+    return {
+        "requests": len(samples),
+        "throughput": len(samples) / seconds,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def run_level(base_url: str, subreddits: list[str], mix: dict[str, float], concurrency: int, duration: float,
+              warmup: float, think_time: float, seed: int, timeout: float) -> dict:
+    start_time = time.perf_counter()
+    warmup_end = start_time + warmup
+    end_time = warmup_end + duration
+    users = [
+        VirtualUser(base_url, subreddits, mix, think_time, start_time, warmup_end, end_time, seed * 1000 + i, timeout)
+        for i in range(concurrency)
+    ]
+    cpu_start = time.process_time()
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    client_cpu = (time.process_time() - cpu_start) / (warmup + duration)
+
+    samples = [sample for user in users for sample in user.samples]
+    by_route = defaultdict(list)
+    for sample in samples:
+        by_route[sample[0]].append(sample)
+    return {
+        "concurrency": concurrency,
+        "client_cpu": client_cpu,
+        "overall": summarize(samples, duration),
+        "routes": {route: summarize(route_samples, duration) for route, route_samples in sorted(by_route.items())},
+    }
+
+
+def print_level(level: dict):
+    print(f"\nConcurrency {level['concurrency']} (client CPU {level['client_cpu']:.0%} of a core):")
+    print(f"  {'route':<40} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for route, stats in [*level["routes"].items(), ("overall", level["overall"])]:
+        print(f"  {route:<40} {stats['requests']:>9} {stats['throughput']:>8.1f} {stats['p50_ms']:>8.1f} "
+              f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['error_rate']:>7.1%}")
+
+
+def compare(report: dict, baseline_path: Path):
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nComparison with {baseline_path} (commit {baseline['commit']}):")
+    if baseline.get("server_workers") != report["server_workers"]:
+        print(f"  (the baseline backend ran with {baseline.get('server_workers', 'an unknown number of')} workers, "
+              f"this one with {report['server_workers']}: not compared)")
+        return
+    if baseline["mix"] != report["mix"] or baseline["think_time"] != report["think_time"]:
+        print("  (the page mix or think time differs from the baseline: the throughputs are not comparable)")
+    old = {
+        (level["concurrency"], route): stats
+        for level in baseline["levels"] for route, stats in [*level["routes"].items(), ("overall", level["overall"])]
+    }
+    for level in report["levels"]:
+        for route, stats in [*level["routes"].items(), ("overall", level["overall"])]:
+            previous = old.get((level["concurrency"], route))
+            if previous is None or not previous["requests"]:
+                continue
+            p95_change = stats["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+            throughput_change = stats["throughput"] / previous["throughput"] - 1
+            flag = "  <-- REGRESSION" if p95_change > REGRESSION_THRESHOLD or throughput_change < -REGRESSION_THRESHOLD else ""
+            if stats["error_rate"] > previous["error_rate"]:
+                flag += f"  <-- errors {previous['error_rate']:.1%} -> {stats['error_rate']:.1%}"
+            print(f"  c={level['concurrency']:<4} {route:<40} p95 {p95_change:+.1%}  throughput {throughput_change:+.1%}{flag}")
+
+
+def fetch_subreddits(base_url: str, timeout: float) -> list[str]:
+    url = urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+    try:
+        connection.request("GET", f"{url.path.rstrip('/')}/subreddits/")
+        response = connection.getresponse()
+        if response.status >= 400:
+            raise SystemExit(f"GET /subreddits/ failed: HTTP {response.status}")
+        return [sub["name"] for sub in json.loads(response.read())]
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("API_URL", "http://localhost:8000"))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32], help="virtual users, one run per value")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds not measured at the start of every level")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between the page loads of a user (0: closed loop)")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="page weights, e.g. selector=2,analysis=3,trends=4")
+    parser.add_argument("--subreddits", nargs="+", help="subreddits to view (default: every subreddit of GET /subreddits/)")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn workers of the backend under test")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    subreddits = args.subreddits or fetch_subreddits(args.url, args.timeout)
+    if not subreddits:
+        raise SystemExit("No subreddits to view: add some or pass --subreddits")
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count()},
+        "url": args.url,
+        "server_workers": args.server_workers,
+        "mix": args.mix,
+        "duration": args.duration,
+        "think_time": args.think_time,
+        "subreddits": len(subreddits),
+        "levels": [],
+    }
+    for concurrency in args.concurrency:
+        level = run_level(args.url, subreddits, args.mix, concurrency, args.duration, args.warmup,
+                          args.think_time, args.seed, args.timeout)
+        print_level(level)
+        report["levels"].append(level)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    output_path = RESULTS_DIR / f"api-load-{commit}.json"
+    output_path.write_text(json.dumps(report, indent=2))
+    print(f"\nResults saved to {output_path}")
+
+    if args.baseline:
+        compare(report, args.baseline)
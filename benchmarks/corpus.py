@@ -0,0 +1,62 @@
+"""
+Synthetic Reddit-like comment corpus for the benchmarks.
+
+Comment lengths follow a log-normal distribution in words: most are a few dozen tokens,
+with a long tail up to the 512 token truncation. A share of comments are exact duplicates
+or trivial bodies, like in real threads, so the inference cache and the prefilter get
+realistic work too.
+DEFAULT_PROFILE is a hand-picked approximation, not fitted on data: use
+length_profile_from_db (inference_suite.py --profile-from-db) to fit it on the database.
+"""
+import math
+import random
+import statistics
+
+# log-normal parameters of the number of words per comment, hand-picked
+DEFAULT_PROFILE = {"mu": 2.7, "sigma": 1.1, "max_words": 400}
+DUPLICATE_SHARE = 0.08
+TRIVIAL_SHARE = 0.05
+
+WORDS = [
+    "this", "is", "the", "best", "worst", "thing", "ever", "lol", "thanks", "agree",
+    "why", "would", "anyone", "do", "that", "great", "post", "really", "not", "sure",
+    "i", "think", "you", "are", "right", "wrong", "people", "just", "like", "it",
+    "honestly", "game", "price", "update", "love", "hate", "good", "bad", "way", "too",
+]
+DUPLICATES = ["thanks", "lol", "this", "same", "+1", "so true", "I am a bot, this action was performed automatically."]
+TRIVIAL = ["[deleted]", "[removed]", "", "😂😂😂", "https://i.redd.it/abc123.png", "k"]
+
+
+def length_profile_from_db(db_manager, sample_size: int = 5000) -> dict:
+    """Fit the log-normal word-count profile on a random sample of all the stored comments"""
+    from sqlalchemy import func
+    from sqlmodel import Session, select
+    from reddit_db.models import Comment
+
+    with Session(db_manager.engine) as session:
+        bodies = session.exec(select(Comment.body).order_by(func.random()).limit(sample_size)).all()
+    log_lengths = [math.log(len(body.split())) for body in bodies if body and body.split()]
+    if len(log_lengths) < 2:
+        return dict(DEFAULT_PROFILE)
+    return {
+        "mu": statistics.mean(log_lengths),
+        "sigma": statistics.stdev(log_lengths),
+        "max_words": DEFAULT_PROFILE["max_words"],
+    }
+
+
+def synthetic_comments(n: int, seed: int = 42, profile: dict = DEFAULT_PROFILE) -> list[dict]:
+    """Return n {"comment_id", "body"} dicts, reproducible for a given seed"""
+    rng = random.Random(seed)
+    comments = []
+    for i in range(n):
+        roll = rng.random()
+        if roll < TRIVIAL_SHARE:
+            body = rng.choice(TRIVIAL)
+        elif roll < TRIVIAL_SHARE + DUPLICATE_SHARE:
+            body = rng.choice(DUPLICATES)
+        else:
+            n_words = min(int(rng.lognormvariate(profile["mu"], profile["sigma"])) + 1, profile["max_words"])
+            body = " ".join(rng.choice(WORDS) for _ in range(n_words))
+        comments.append({"comment_id": str(i), "body": body})
+    return comments
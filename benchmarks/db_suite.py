@@ -0,0 +1,320 @@
+"""
+RedditDBManager benchmark suite on the synthetic datasets.
+
+For every scale tier it (re)generates the synthetic dataset (synthetic_dataset.py, into
+BENCH_DATABASE_URL), then times every public RedditDBManager method: the first call
+(cold caches) and the median / max of --repeat more. Subreddit methods run on the
+largest, the median and the smallest subreddit, since the Zipf sizes make them behave
+very differently. Writes run on synthetic rows and are undone where they would skew the
+following cases. Methods that are not timed are listed with the reason, and a method
+added to RedditDBManager without a case here is reported as missing.
+
+Results are saved as JSON (one file per commit) and can be compared with a previous run.
+
+    BENCH_DATABASE_URL=postgresql://... python benchmarks/db_suite.py --tiers 100k 1m 10m
+    python benchmarks/db_suite.py --tiers 1m --skip-generate --baseline benchmarks/results/db-<commit>.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+from sqlalchemy import delete, func, update
+from sqlmodel import Session, select
+
+from inference_suite import RESULTS_DIR, git_commit
+from reddit_db.db_manager import RedditDBManager
+from reddit_db.models import (
+    ApiUsage, CachedSentiment, Comment, CommentSentiment, PipelineRun, Post, SentimentModelVersion, SentimentTrial, StageMetric,
+    SubredditLease, Subreddit,
+)
+from synthetic_dataset import MODEL_VERSION, TIERS, bench_database_url, generate
+
+REGRESSION_THRESHOLD = 0.20 # flag cases more than 20% slower than the baseline (queries are noisier than inference)
+CANDIDATE_VERSION = "synthetic_candidate"
+# the Comment columns the update cases overwrite, restored by cleanup()
+SCORE_COLUMNS = ["negative_score", "neutral_score", "positive_score", "pred_label"]
+# inference cache entries written by the save_cached_sentiment case, deleted by cleanup()
+CACHE_MODEL_ID = "synthetic"
+CACHED_HASHES = {f"{i:064x}": (0.2, 0.3, 0.5) for i in range(512)}
+NOT_TIMED = {
+    "reset_database": "drops every table",
+    "activate_model_version": "rewrites the score columns of every comment",
+}
+
+
+def subreddits_by_size(manager: RedditDBManager) -> list[str]:
+    counts = manager.calculate_subreddits_post_counts()
+    return sorted(counts, key=counts.get, reverse=True)
+
+
+def sample_comment_ids(manager: RedditDBManager, subreddit: str, n: int) -> list[str]:
+    with Session(manager.engine) as session:
+        return list(session.exec(
+            select(Comment.comment_id).join(Post, Post.post_id == Comment.post_id)
+            .where(Post.subreddit_name == subreddit).where(Comment.pred_label != None).limit(n)
+        ).all())
+
+
+def snapshot_sentiments(manager: RedditDBManager, comment_ids: list[str]) -> dict:
+    """Scores of the comments the update cases overwrite, in Comment and in CommentSentiment"""
+    with Session(manager.engine) as session:
+        comments = session.exec(select(Comment).where(Comment.comment_id.in_(comment_ids))).all()
+        sentiments = session.exec(
+            select(CommentSentiment)
+            .where(CommentSentiment.comment_id.in_(comment_ids), CommentSentiment.model_version == MODEL_VERSION)
+        ).all()
+        return {
+            "comment_ids": comment_ids,
+            "comments": [{"comment_id": c.comment_id, **{col: getattr(c, col) for col in SCORE_COLUMNS}} for c in comments],
+            "sentiments": [sentiment.model_dump() for sentiment in sentiments],
+        }
+
+
+def restore_sentiments(manager: RedditDBManager, snapshot: dict):
+    with Session(manager.engine) as session:
+        for row in snapshot["comments"]:
+            session.exec(update(Comment).where(Comment.comment_id == row["comment_id"])
+                         .values(**{col: row[col] for col in SCORE_COLUMNS}))
+        session.exec(delete(CommentSentiment).where(
+            CommentSentiment.comment_id.in_(snapshot["comment_ids"]), CommentSentiment.model_version == MODEL_VERSION
+        ))
+        session.add_all(CommentSentiment(**row) for row in snapshot["sentiments"])
+        session.commit()
+
+
+def build_cases(manager: RedditDBManager) -> tuple[list[tuple[str, str, Callable]], dict]:
+    """(method, variant, call) for every timed case, and the snapshot of the rows they overwrite"""
+    by_size = subreddits_by_size(manager)
+    subreddits = {"largest": by_size[0], "median": by_size[len(by_size) // 2], "smallest": by_size[-1]}
+    largest = by_size[0]
+    top_20 = by_size[:20]
+    labeled_ids = sample_comment_ids(manager, largest, 512)
+    snapshot = snapshot_sentiments(manager, labeled_ids)
+    predictions = [
+        {"comment_id": comment_id, "negative_score": 0.2, "neutral_score": 0.3, "positive_score": 0.5, "pred_label": "positive"}
+        for comment_id in labeled_ids
+    ]
+    # calculate_subreddit_priorities rewrites them
+    snapshot["priorities"] = manager.get_subreddits_priorities()
+    manager.register_model_version(CANDIDATE_VERSION, "synthetic")
+    manager.save_comment_sentiments(CANDIDATE_VERSION, predictions)
+    run_id = manager.start_pipeline_run("db_suite")
+    metrics = [{
+        "stage": stage, "started_datetime": datetime.utcnow(), "ended_datetime": datetime.utcnow(),
+        "rows_processed": 100, "api_calls": 10, "errors": 0, "unlabeled_backlog": 1, "uncommented_backlog": 1,
+    } for stage in ["ingestion", "comments", "sentiment"]]
+    usage = [{
+        "operation": "listing/hot", "subreddit_name": largest, "started_datetime": datetime.utcnow(),
+        "ended_datetime": datetime.utcnow(), "requests": 10, "items": 50, "ratelimit_remaining": 500.0, "ratelimit_used": 100,
+    }]
+    worker_id = "db_suite"
+    # a manager connecting on its own, so the first call times the connection and the schema check
+    schema_manager = RedditDBManager(manager.db_url, create_schema=False)
+
+    def claim_and_release():
+        subreddit = manager.claim_subreddit_lease(worker_id, lease_seconds=60, refetch_seconds=0)
+        if subreddit is not None:
+            manager.heartbeat_subreddit_lease(worker_id, subreddit, lease_seconds=60)
+            manager.release_subreddit_lease(worker_id, subreddit, fetched=False)
+
+    cases = [
+        ("init_schema", "existing schema", schema_manager.init_schema),
+        ("calculate_subreddits_post_counts", "", manager.calculate_subreddits_post_counts),
+        ("count_posts", "all", manager.count_posts),
+        ("count_comments", "all", manager.count_comments),
+        ("count_comments", "unlabeled", lambda: manager.count_comments(labeled=False)),
+        ("get_highest_priority_subreddits", "", manager.get_highest_priority_subreddits),
+        ("claim_subreddit_lease", "claim+heartbeat+release", claim_and_release),
+        ("heartbeat_subreddit_lease", "not owned", lambda: manager.heartbeat_subreddit_lease(worker_id, largest)),
+        ("release_subreddit_lease", "not owned", lambda: manager.release_subreddit_lease(worker_id, largest, fetched=False)),
+        ("get_subreddit_leases", "", manager.get_subreddit_leases),
+        ("get_subreddits_priorities", "", manager.get_subreddits_priorities),
+        ("calculate_subreddit_priorities", "", manager.calculate_subreddit_priorities),
+        ("get_unlabeled_comments", "512", lambda: manager.get_unlabeled_comments(limit=512)),
+        ("get_posts_without_comments", "", manager.get_posts_without_comments),
+        ("update_comments_with_sentiment", "512", lambda: manager.update_comments_with_sentiment(predictions)),
+        ("update_comments_with_sentiment", "512, versioned", lambda: manager.update_comments_with_sentiment(predictions, MODEL_VERSION)),
+        ("save_comment_sentiments", "512", lambda: manager.save_comment_sentiments(CANDIDATE_VERSION, predictions)),
+        ("register_model_version", "existing", lambda: manager.register_model_version(CANDIDATE_VERSION, "synthetic")),
+        ("get_model_versions", "", manager.get_model_versions),
+        ("get_active_model_version", "", manager.get_active_model_version),
+        ("ensure_active_model_version", "existing", lambda: manager.ensure_active_model_version(MODEL_VERSION, "synthetic")),
+        ("add_model_trial", "", lambda: manager.add_model_trial(CANDIDATE_VERSION, [largest])),
+        ("get_comments_missing_version", "512", lambda: manager.get_comments_missing_version(CANDIDATE_VERSION)),
+        ("get_comments_missing_version", "512, trial", lambda: manager.get_comments_missing_version(CANDIDATE_VERSION, subreddits=[largest])),
+        ("compare_model_versions", "all", lambda: manager.compare_model_versions(MODEL_VERSION, CANDIDATE_VERSION)),
+        ("compare_model_versions", "largest", lambda: manager.compare_model_versions(MODEL_VERSION, CANDIDATE_VERSION, largest)),
+        ("get_cached_sentiment", "512", lambda: manager.get_cached_sentiment(CACHE_MODEL_ID, list(CACHED_HASHES))),
+        ("save_cached_sentiment", "512", lambda: manager.save_cached_sentiment(CACHE_MODEL_ID, CACHED_HASHES)),
+        ("get_sentiment_deltas", "512", lambda: manager.get_sentiment_deltas(labeled_ids)),
+        ("compare_subreddits_sentiment", "daily, 3 subreddits", lambda: manager.compare_subreddits_sentiment(list(subreddits.values()), "daily")),
+        ("compare_subreddits_sentiment", "daily, 20 subreddits", lambda: manager.compare_subreddits_sentiment(top_20, "daily")),
+        # what the comparison would cost without it: one query per subreddit
+        ("get_daily_sentiment", "20 subreddits, sequential", lambda: [manager.get_daily_sentiment(s) for s in top_20]),
+        ("get_backlog_sizes", "", manager.get_backlog_sizes),
+        ("start_pipeline_run", "", lambda: manager.start_pipeline_run("db_suite")),
+        ("finish_pipeline_run", "", lambda: manager.finish_pipeline_run(run_id)),
+        ("save_stage_metrics", "3 stages", lambda: manager.save_stage_metrics(run_id, metrics)),
+        ("get_pipeline_runs", "", manager.get_pipeline_runs),
+        ("get_stage_metrics", "24h", manager.get_stage_metrics),
+        ("save_api_usage", "1 row", lambda: manager.save_api_usage(run_id, usage)),
+        ("get_api_usage", "24h", manager.get_api_usage),
+    ]
+    for size, subreddit in subreddits.items():
+        cases += [
+            ("count_posts", size, lambda s=subreddit: manager.count_posts(s)),
+            ("count_comments", size, lambda s=subreddit: manager.count_comments(s, labeled=True)),
+            ("get_comments_sentiment_info", size, lambda s=subreddit: manager.get_comments_sentiment_info(s)),
+            ("get_hourly_sentiment", size, lambda s=subreddit: manager.get_hourly_sentiment(s)),
+            ("get_hourly_sentiment", f"{size}, 90 days, 300 points", lambda s=subreddit: manager.get_hourly_sentiment(s, days=90, max_points=300)),
+            ("get_daily_sentiment", size, lambda s=subreddit: manager.get_daily_sentiment(s)),
+            ("get_weekly_sentiment", size, lambda s=subreddit: manager.get_weekly_sentiment(s)),
+            ("get_monthly_sentiment", size, lambda s=subreddit: manager.get_monthly_sentiment(s)),
+            ("get_posts_count_by_fetch_type", size, lambda s=subreddit: manager.get_posts_count_by_fetch_type(s)),
+        ]
+    return cases, snapshot
+
+
+def cleanup(manager: RedditDBManager, snapshot: dict):
+    """Undo what the write cases added or overwrote, so the next tier and runs start from the same state"""
+    restore_sentiments(manager, snapshot)
+    with Session(manager.engine) as session:
+        run_ids = select(PipelineRun.id).where(PipelineRun.name == "db_suite")
+        session.exec(delete(StageMetric).where(StageMetric.run_id.in_(run_ids)))
+        session.exec(delete(ApiUsage).where(ApiUsage.run_id.in_(run_ids)))
+        session.exec(delete(PipelineRun).where(PipelineRun.name == "db_suite"))
+        session.exec(delete(SubredditLease).where(SubredditLease.worker_id == "db_suite"))
+        session.exec(delete(SentimentTrial).where(SentimentTrial.model_version == CANDIDATE_VERSION))
+        session.exec(delete(CommentSentiment).where(CommentSentiment.model_version == CANDIDATE_VERSION))
+        session.exec(delete(SentimentModelVersion).where(SentimentModelVersion.name == CANDIDATE_VERSION))
+        session.exec(delete(CachedSentiment).where(
+            CachedSentiment.model_id == CACHE_MODEL_ID, CachedSentiment.text_hash.in_(list(CACHED_HASHES))
+        ))
+        by_priority = {}
+        for row in snapshot["priorities"]:
+            by_priority.setdefault(row["priority"], []).append(row["name"])
+        for priority, names in by_priority.items():
+            session.exec(update(Subreddit).where(Subreddit.name.in_(names)).values(priority=priority))
+        session.commit()
+
+
+def result_size(result) -> int:
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return 0 if result is None else 1
+
+
+def time_case(call: Callable, repeat: int) -> dict:
+    start = time.perf_counter()
+    result = call()
+    first_ms = (time.perf_counter() - start) * 1000
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "first_ms": first_ms,
+        "median_ms": statistics.median(timings) if timings else first_ms,
+        "max_ms": max(timings) if timings else first_ms,
+        "result_size": result_size(result),
+    }
+
+
+def run_tier(db_url: str, tier: str, repeat: int, generate_data: bool, workers: int, seed: int) -> dict:
+    dataset = None
+    if generate_data:
+        print(f"Generating the {tier} tier...")
+        dataset = generate(db_url, TIERS[tier], workers=workers, seed=seed)
+        print(f"  {dataset['posts']} posts, {dataset['comments']} comments in {dataset['load_seconds']:.0f} s")
+    manager = RedditDBManager(db_url)
+    with Session(manager.engine) as session:
+        n_comments = session.exec(select(func.count()).select_from(Comment)).one()
+        n_subreddits = session.exec(select(func.count()).select_from(Subreddit)).one()
+
+    cases, snapshot = build_cases(manager)
+    timed = {method for method, _, _ in cases}
+    public = {name for name in dir(RedditDBManager) if not name.startswith("_") and callable(getattr(RedditDBManager, name))}
+    missing = sorted(public - timed - set(NOT_TIMED))
+
+    results = []
+    try:
+        for method, variant, call in cases:
+            try:
+                result = {"method": method, "variant": variant, **time_case(call, repeat)}
+            except Exception as e:
+                result = {"method": method, "variant": variant, "error": f"{type(e).__name__}: {e}"}
+            results.append(result)
+            if "error" in result:
+                print(f"  {method:<34} {variant:<32} ERROR {result['error']}")
+            else:
+                print(f"  {method:<34} {variant:<32} first {result['first_ms']:9.1f} ms  "
+                      f"median {result['median_ms']:9.1f} ms  max {result['max_ms']:9.1f} ms  ({result['result_size']} rows)")
+    finally:
+        cleanup(manager, snapshot)
+    for method in missing:
+        print(f"  {method:<34} MISSING: no case in benchmarks/db_suite.py")
+    return {
+        "tier": tier,
+        "comments": int(n_comments),
+        "subreddits": int(n_subreddits),
+        "dataset": dataset,
+        "results": results,
+        "not_timed": NOT_TIMED,
+        "missing": missing,
+    }
+
+
+def compare(report: dict, baseline_path: Path):
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nComparison with {baseline_path} (commit {baseline['commit']}):")
+    old = {
+        (tier["tier"], r["method"], r["variant"]): r
+        for tier in baseline["tiers"] for r in tier["results"] if "error" not in r
+    }
+    for tier in report["tiers"]:
+        for r in tier["results"]:
+            previous = old.get((tier["tier"], r["method"], r["variant"]))
+            if previous is None or "error" in r:
+                continue
+            change = r["median_ms"] / previous["median_ms"] - 1 if previous["median_ms"] else 0.0
+            flag = "  <-- REGRESSION" if change > REGRESSION_THRESHOLD else ""
+            print(f"{tier['tier']:>5} {r['method']:<34} {r['variant']:<32} {change:+.1%}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiers", nargs="+", choices=TIERS, default=["100k", "1m"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-generate", action="store_true", help="time the dataset already in the database (one tier)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="generator processes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    db_url = bench_database_url()
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count()},
+        "repeat": args.repeat,
+        "tiers": [],
+    }
+    for tier in args.tiers:
+        print(f"Tier {tier}:")
+        report["tiers"].append(run_tier(db_url, tier, args.repeat, not args.skip_generate, args.workers, args.seed))
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    output_path = RESULTS_DIR / f"db-{commit}.json"
+    output_path.write_text(json.dumps(report, indent=2, default=str))
+    print(f"Results saved to {output_path}")
+
+    if args.baseline:
+        compare(report, args.baseline)
@@ -0,0 +1,152 @@
+"""
+Import-time profile of the entry points: the API, the pipeline stages and the dashboard pages.
+
+Every entry point runs in fresh interpreters (--repeat times), which only run its top-level
+import statements, read from its source, with the sys.path it runs with (src/ or web_app/).
+Scripts doing their work at import are not run; the API module is imported whole, since
+its module-level setup is part of its start. For each one it reports the median import
+time, the heavy libraries it loads (pandas, torch, ...) and, from python -X importtime, the
+slowest top-level imports. Results are saved as JSON (one file per commit) and can be
+compared with a previous run.
+
+    python benchmarks/import_profile.py
+    python benchmarks/import_profile.py --only api pipelines/ingestion_worker --top 5
+    python benchmarks/import_profile.py --baseline benchmarks/results/startup-<commit>.json
+
+Entry points whose imports fail (a missing optional dependency) are reported with the error.
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from inference_suite import RESULTS_DIR, git_commit
+
+ROOT = Path(__file__).resolve().parent.parent
+REGRESSION_THRESHOLD = 0.10 # flag entry points more than 10% slower to import than the baseline
+HEAVY = ["pandas", "numpy", "pyarrow", "torch", "transformers", "onnxruntime", "pyspark", "matplotlib", "seaborn",
+         "plotly", "streamlit", "praw", "prefect", "sqlalchemy"]
+# entry point -> (source file, sys.path entry, import the whole module)
+ENTRY_POINTS = {
+    "api": ("src/app.py", "src", True),
+    "pipeline": ("perfect.py", "src", False),
+    **{f"pipelines/{path.stem}": (f"src/pipelines/{path.name}", "src", False)
+       for path in sorted((ROOT / "src" / "pipelines").glob("*.py"))},
+    "dashboard": ("web_app/dashboard.py", "web_app", False),
+    **{f"pages/{path.stem}": (f"web_app/pages/{path.name}", "web_app", False)
+       for path in sorted((ROOT / "web_app" / "pages").glob("*.py"))},
+}
+CHILD = """
+import sys, time, json
+sys.stderr.write("import_profile: start\\n")
+start = time.perf_counter()
+exec(compile({code!r}, {name!r}, "exec"), {{"__name__": "import_profile"}})
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def import_code(source: str, whole_module: bool) -> str:
+    """The statements a fresh interpreter runs for an entry point"""
+    if whole_module:
+        return f"import {Path(source).stem}"
+    tree = ast.parse((ROOT / source).read_text(), filename=source)
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def run_child(code: str, name: str, path_entry: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT / path_entry), os.getenv("PYTHONPATH")]))}
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c",
+               CHILD.format(code=code, name=name, heavy=HEAVY)]
+    return subprocess.run(command, capture_output=True, text=True, cwd=ROOT / path_entry, env=env)
+
+
+def slowest_imports(stderr: str, top: int) -> list[dict]:
+    """Top-level imports with the largest cumulative time, from the python -X importtime output"""
+    imports = []
+    # what the interpreter and the profiling code imported before the entry point is not counted
+    for line in stderr.partition("import_profile: start\n")[2].splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match and len(match.group(3)) <= 1:
+            imports.append({"module": match.group(4), "cumulative_ms": int(match.group(2)) / 1000})
+    return sorted(imports, key=lambda item: item["cumulative_ms"], reverse=True)[:top]
+
+
+def profile(name: str, repeat: int, top: int) -> dict:
+    source, path_entry, whole_module = ENTRY_POINTS[name]
+    code = import_code(source, whole_module)
+    timings, heavy = [], []
+    for _ in range(repeat):
+        result = run_child(code, name, path_entry)
+        if result.returncode != 0:
+            return {"entry_point": name, "source": source, "error": result.stderr.strip().splitlines()[-1]}
+        output = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(output["seconds"] * 1000)
+        heavy = output["heavy"]
+    traced = run_child(code, name, path_entry, importtime=True)
+    return {
+        "entry_point": name,
+        "source": source,
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "heavy_modules": heavy,
+        "slowest_imports": slowest_imports(traced.stderr, top),
+    }
+
+
+def compare(report: dict, baseline_path: Path):
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nComparison with {baseline_path} (commit {baseline['commit']}):")
+    old = {r["entry_point"]: r for r in baseline["results"] if "error" not in r}
+    for r in report["results"]:
+        previous = old.get(r["entry_point"])
+        if previous is None or "error" in r:
+            continue
+        change = r["median_ms"] / previous["median_ms"] - 1
+        flag = "  <-- REGRESSION" if change > REGRESSION_THRESHOLD else ""
+        added = sorted(set(r["heavy_modules"]) - set(previous["heavy_modules"]))
+        removed = sorted(set(previous["heavy_modules"]) - set(r["heavy_modules"]))
+        modules = "".join([f"  +{', +'.join(added)}" if added else "", f"  -{', -'.join(removed)}" if removed else ""])
+        print(f"  {r['entry_point']:<34} {previous['median_ms']:8.0f} -> {r['median_ms']:8.0f} ms  {change:+.1%}{flag}{modules}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=ENTRY_POINTS, help="entry points to profile (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per entry point")
+    parser.add_argument("--top", type=int, default=3, help="slowest top-level imports to show")
+    parser.add_argument("--baseline", type=Path, help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count()},
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "results": [],
+    }
+    for name in args.only or ENTRY_POINTS:
+        result = profile(name, args.repeat, args.top)
+        report["results"].append(result)
+        if "error" in result:
+            print(f"{name:<34} ERROR {result['error']}")
+            continue
+        slowest = ", ".join(f"{i['module']} {i['cumulative_ms']:.0f} ms" for i in result["slowest_imports"])
+        print(f"{name:<34} {result['median_ms']:8.0f} ms  heavy: {', '.join(result['heavy_modules']) or '-'}  slowest: {slowest}")
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    output_path = RESULTS_DIR / f"startup-{commit}.json"
+    output_path.write_text(json.dumps(report, indent=2))
+    print(f"Results saved to {output_path}")
+
+    if args.baseline:
+        compare(report, args.baseline)
@@ -0,0 +1,49 @@
+"""
+Sweep InferencePool layouts (replicas x threads per replica) on the available cores and
+report the throughput of each one, to pick SENTIMENT_REPLICAS / SENTIMENT_THREADS_PER_REPLICA.
+
+Run from the project root (the model must be downloadable or already cached):
+    python benchmarks/inference_pool.py
+"""
+import os
+import time
+
+from sentiment_model.inference_pool import InferencePool
+from sentiment_model.sentiment_model import SentimentModel
+from corpus import synthetic_comments
+
+N_COMMENTS = 2048
+
+
+def layouts(n_cores: int) -> list[tuple[int, int]]:
+    """All (replicas, threads) pairs with power of two threads that fit in n_cores"""
+    result = []
+    threads = 1
+    while threads <= n_cores:
+        replicas = 1
+        while replicas * threads <= n_cores:
+            result.append((replicas, threads))
+            replicas *= 2
+        threads *= 2
+    return result
+
+
+if __name__ == "__main__":
+    n_cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"Sweeping layouts on {n_cores} cores with {N_COMMENTS} comments")
+    model = SentimentModel(backend="torch")
+
+    results = []
+    for replicas, threads in layouts(n_cores):
+        pool = InferencePool(model, n_replicas=replicas, threads_per_replica=threads)
+        pool.predict(synthetic_comments(replicas * 8, seed=1)) # warm up the replicas
+        start_time = time.time()
+        pool.predict(synthetic_comments(N_COMMENTS))
+        elapsed = time.time() - start_time
+        pool.close()
+
+        results.append((N_COMMENTS / elapsed, replicas, threads))
+        print(f"{replicas:>3} replicas x {threads:>2} threads: {N_COMMENTS / elapsed:8.1f} comments/s")
+
+    best, replicas, threads = max(results)
+    print(f"Best layout: SENTIMENT_REPLICAS={replicas} SENTIMENT_THREADS_PER_REPLICA={threads} ({best:.1f} comments/s)")
@@ -0,0 +1,141 @@
+"""
+Reproducible SentimentModel inference benchmark.
+
+For every combination of backend, batch size and torch thread count it reports
+comments/sec, p50/p99 batch latency, peak RSS and padding ratio on the synthetic
+corpus, and saves the results as JSON (one file per commit) so regressions can be
+spotted by comparing against a previous run.
+
+Each configuration runs in a fresh process, so peak RSS is not shared between them.
+Once the model is in the local Hugging Face cache no network is needed (--offline).
+
+    python benchmarks/inference_suite.py --offline
+    python benchmarks/inference_suite.py --baseline benchmarks/results/inference-<commit>.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from corpus import DEFAULT_PROFILE, length_profile_from_db, synthetic_comments
+
+RESULTS_DIR = Path(__file__).parent / "results"
+REGRESSION_THRESHOLD = 0.10 # flag configs more than 10% slower than the baseline
+
+
+def run_config(backend: str, batch_size: int, threads: int, n_comments: int, seed: int, profile: dict = DEFAULT_PROFILE) -> dict:
+    """Benchmark one configuration, meant to run in its own process"""
+    import resource
+    import torch
+    from sentiment_model.sentiment_model import SentimentModel
+
+    torch.set_num_threads(threads)
+    # batch_size texts per batch at most, the token budget never splits them further;
+    # num_threads sets the onnx runtime threads, which ignore the torch setting
+    model = SentimentModel(backend=backend, max_batch_size=batch_size, max_batch_tokens=batch_size * 512, num_threads=threads)
+    inputs = synthetic_comments(n_comments, seed=seed, profile=profile)
+    model.predict(synthetic_comments(batch_size, seed=seed + 1, profile=profile)) # warm-up
+
+    start_time = time.perf_counter()
+    batches = model.tokenize(inputs)
+    padding_ratio = model.last_padding_ratio
+    latencies = []
+    for batch in batches:
+        batch_start = time.perf_counter()
+        model.predict_tokenized(inputs, [batch])
+        latencies.append((time.perf_counter() - batch_start) * 1000)
+    elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "backend": backend,
+        "batch_size": batch_size,
+        "threads": threads,
+        "n_comments": n_comments,
+        "comments_per_sec": n_comments / elapsed,
+        "p50_batch_latency_ms": statistics.median(latencies),
+        "p99_batch_latency_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, # KiB on Linux
+        "padding_ratio": padding_ratio,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: list[dict], baseline_path: Path):
+    baseline = json.loads(baseline_path.read_text())
+    key = lambda r: (r["backend"], r["batch_size"], r["threads"])
+    baseline_results = {key(r): r for r in baseline["results"]}
+    print(f"\nComparison with {baseline_path} (commit {baseline['commit']}):")
+    for r in results:
+        old = baseline_results.get(key(r))
+        if old is None:
+            continue
+        change = r["comments_per_sec"] / old["comments_per_sec"] - 1
+        flag = "  <-- REGRESSION" if change < -REGRESSION_THRESHOLD else ""
+        print(f"{r['backend']:>10} bs={r['batch_size']:<4} threads={r['threads']:<3} {change:+.1%}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8", "onnx"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[8, 32, 128])
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, 4, os.cpu_count()])
+    parser.add_argument("--n-comments", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--offline", action="store_true", help="only use the local Hugging Face cache")
+    parser.add_argument("--profile-from-db", type=int, metavar="N",
+                        help="fit the comment length profile on N random stored comments (DATABASE_URL)")
+    parser.add_argument("--baseline", type=Path, help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    if args.offline:
+        # inherited by the spawned configuration processes
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+    profile = DEFAULT_PROFILE
+    if args.profile_from_db:
+        from reddit_db.db_manager import RedditDBManager
+        profile = length_profile_from_db(RedditDBManager(), sample_size=args.profile_from_db)
+        print(f"Length profile fitted on {args.profile_from_db} stored comments: {profile}")
+
+    results = []
+    context = mp.get_context("spawn")
+    for backend in args.backends:
+        for batch_size in args.batch_sizes:
+            for threads in sorted(set(args.threads)):
+                with context.Pool(1) as pool:
+                    result = pool.apply(run_config, (backend, batch_size, threads, args.n_comments, args.seed, profile))
+                results.append(result)
+                print(f"{backend:>10} bs={batch_size:<4} threads={threads:<3} "
+                      f"{result['comments_per_sec']:8.1f} comments/s, "
+                      f"p50 {result['p50_batch_latency_ms']:7.1f} ms, p99 {result['p99_batch_latency_ms']:7.1f} ms, "
+                      f"rss {result['peak_rss_mb']:7.0f} MB, padding {result['padding_ratio']:.1%}")
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count()},
+        "corpus": {"n_comments": args.n_comments, "seed": args.seed, "profile": profile},
+        "results": results,
+    }
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    output_path = RESULTS_DIR / f"inference-{commit}.json"
+    output_path.write_text(json.dumps(report, indent=2))
+    print(f"Results saved to {output_path}")
+
+    if args.baseline:
+        compare(results, args.baseline)
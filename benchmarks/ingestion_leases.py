@@ -0,0 +1,169 @@
+"""
+Local multi-worker harness for the subreddit lease table.
+
+Starts ingestion worker processes against the fake Reddit source (no credentials or
+network, posts are recorded instead of written) and a real Postgres (DATABASE_URL, use
+a development database: a few leasetest_* subreddits are added with the highest
+priority and removed at the end). Then checks that:
+- no subreddit was fetched by two workers at the same time,
+- no subreddit was fetched again before its refetch interval,
+- every subreddit was fetched,
+and reports the subreddit fetches per minute for each number of workers.
+--crash kills one worker in the middle of a fetch: its subreddit must be fetched again
+once the lease expires.
+
+    python benchmarks/ingestion_leases.py --workers 1 2 4 8
+"""
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import tempfile
+import time
+from collections import defaultdict
+
+from sqlmodel import Session, delete, func, select
+
+from reddit_db.db_manager import RedditDBManager
+from reddit_db.models import Subreddit, SubredditLease
+from reddit_ingestion.fake_reddit import FakeReddit
+from reddit_ingestion.lease_worker import LeasedIngestionWorker
+from reddit_ingestion.reddit_ingestion import RedditIngestor
+
+PREFIX = "leasetest_"
+LEASE_SECONDS = 3
+HEARTBEAT_INTERVAL = 1.0
+
+
+class RecordingIngestor(RedditIngestor):
+    """RedditIngestor on the fake source, recording the fetches instead of calling the backend API"""
+
+    def __init__(self, worker_id: str, events, crash_after: float = None, **kwargs):
+        super().__init__(**kwargs)
+        self.worker_id = worker_id
+        self.events = events
+        self.crash_at = time.time() + crash_after if crash_after is not None else None
+
+    def fetch_posts(self, subreddit_name: str):
+        start = time.time()
+        if self.crash_at is not None and start >= self.crash_at:
+            # die holding the lease, without releasing it
+            self.events.put(("crash", self.worker_id, subreddit_name, start, start))
+            os._exit(1)
+        super().fetch_posts(subreddit_name)
+        self.events.put(("fetch", self.worker_id, subreddit_name, start, time.time()))
+
+    def add_post_to_db(self, post):
+        return 201
+
+    def add_subreddit_to_db(self, subreddit_name):
+        return 201
+
+    def add_comment_to_db(self, comment):
+        return 201
+
+    def posts_fetch_type_count(self, subreddit_name):
+        return {}
+
+    def get_already_fetched_post_ids(self, subreddit_name):
+        return []
+
+
+def run_worker(worker_id: str, events, duration: float, refetch_seconds: int, latency: float, crash_after: float):
+    import threading
+    ingestor = RecordingIngestor(worker_id, events, crash_after=crash_after, reddit=FakeReddit(latency=latency))
+    worker = LeasedIngestionWorker(
+        RedditDBManager(), ingestor, worker_id=worker_id, lease_seconds=LEASE_SECONDS,
+        heartbeat_interval=HEARTBEAT_INTERVAL, refetch_seconds=refetch_seconds, idle_sleep=0.2,
+        retry_seconds=LEASE_SECONDS
+    )
+    stop_event = threading.Event()
+    threading.Timer(duration, stop_event.set).start()
+    worker.run(stop_event)
+
+
+def seed(db_manager: RedditDBManager, n_subreddits: int) -> list[str]:
+    names = [f"{PREFIX}{i}" for i in range(n_subreddits)]
+    with Session(db_manager.engine) as session:
+        top_priority = session.exec(select(func.max(Subreddit.priority))).one() or 0
+        for name in names:
+            session.merge(Subreddit(name=name, priority=top_priority + 1))
+        session.commit()
+    return names
+
+
+def cleanup(db_manager: RedditDBManager):
+    with Session(db_manager.engine) as session:
+        session.exec(delete(SubredditLease).where(SubredditLease.subreddit_name.startswith(PREFIX)))
+        session.exec(delete(Subreddit).where(Subreddit.name.startswith(PREFIX)))
+        session.commit()
+
+
+def check(events: list[tuple], names: list[str], refetch_seconds: int) -> list[str]:
+    problems = []
+    by_subreddit = defaultdict(list)
+    for kind, worker_id, subreddit, start, end in events:
+        by_subreddit[subreddit].append((start, end, worker_id, kind))
+    for subreddit, fetches in by_subreddit.items():
+        fetches.sort()
+        for (start_a, end_a, worker_a, kind_a), (start_b, _, worker_b, _) in zip(fetches, fetches[1:]):
+            # a crashed worker never released: the next fetch has to wait for the lease to expire
+            min_gap = LEASE_SECONDS if kind_a == "crash" else refetch_seconds
+            if start_b < end_a:
+                problems.append(f"{subreddit}: fetched by {worker_a} and {worker_b} at the same time")
+            elif start_b - end_a < min_gap - 0.5:
+                problems.append(f"{subreddit}: fetched again after {start_b - end_a:.1f} s (< {min_gap} s)")
+    missing = set(names) - {s for s, fetches in by_subreddit.items() if any(f[3] == "fetch" for f in fetches)}
+    if missing:
+        problems.append(f"never fetched: {sorted(missing)}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--subreddits", type=int, default=40)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per run")
+    parser.add_argument("--refetch-seconds", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake Reddit request")
+    parser.add_argument("--crash", action="store_true", help="kill one worker in the middle of a fetch")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATA_DIR", tempfile.gettempdir())
+    db_manager = RedditDBManager()
+    context = mp.get_context("spawn")
+    failed = False
+    for n_workers in args.workers:
+        cleanup(db_manager)
+        names = seed(db_manager, args.subreddits)
+        events_queue = context.Queue()
+        processes = [
+            context.Process(
+                target=run_worker,
+                args=(f"worker-{i}", events_queue, args.duration, args.refetch_seconds, args.latency,
+                      args.duration / 3 if args.crash and i == 0 else None)
+            )
+            for i in range(n_workers)
+        ]
+        for p in processes:
+            p.start()
+        # drain the queue while the workers run: a process does not exit before its queued
+        # events are consumed, so joining first could block forever
+        events = []
+        while any(p.is_alive() for p in processes) or not events_queue.empty():
+            try:
+                events.append(events_queue.get(timeout=0.5))
+            except queue.Empty:
+                continue
+        for p in processes:
+            p.join()
+        fetches = sum(1 for e in events if e[0] == "fetch")
+        problems = check(events, names, args.refetch_seconds)
+        print(f"{n_workers:>3} workers: {fetches} subreddit fetches, {fetches / args.duration * 60:.0f}/min, "
+              f"{len({e[2] for e in events if e[0] == 'fetch'})}/{len(names)} subreddits covered, "
+              f"{'OK' if not problems else f'{len(problems)} problems'}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        failed |= bool(problems)
+    cleanup(db_manager)
+    raise SystemExit(1 if failed else 0)
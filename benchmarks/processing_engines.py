@@ -0,0 +1,170 @@
+"""
+Compare the Spark and pandas processing engines on synthetic raw CSVs.
+
+--check runs both normalisations on the same files and fails on any difference.
+Without it, for every input size both engines process and save posts and comments
+from a cold start (JVM and session included for Spark, each run in a fresh process),
+and the crossover size is printed: use it as SPARK_MIN_INPUT_MB.
+
+    python benchmarks/processing_engines.py --check
+    python benchmarks/processing_engines.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import csv
+import math
+import multiprocessing as mp
+import random
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+
+from corpus import synthetic_comments
+
+SUBREDDITS = ["python", "datascience", "worldnews", "gaming", "AskReddit"]
+# a few of the raw values the normalisation has to deal with
+NOISY_TEXTS = ["  Mixed CASE\twith\ttabs  ", "line\nbreaks\r\nhere", "\"quoted\" text", "émojis 😂 and àccents", "see https://example.com/x ok"]
+
+
+def write_raw_csvs(data_path: Path, n_comments: int, seed: int = 42):
+    """Raw posts and comments CSVs like the ingestion writes, one post every 50 comments"""
+    rng = random.Random(seed)
+    n_posts = max(1, n_comments // 50)
+    start = int(datetime(2025, 1, 1).timestamp())
+    posts_dir = data_path / "raw" / "posts"
+    comments_dir = data_path / "raw" / "comments"
+    posts_dir.mkdir(parents=True, exist_ok=True)
+    comments_dir.mkdir(parents=True, exist_ok=True)
+
+    with open(posts_dir / "posts.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["post_id", "subreddit", "title", "author", "score", "num_comments", "created_utc",
+                         "selftext", "fetch_type", "author_comment_karma", "author_link_karma"])
+        for i in range(n_posts):
+            writer.writerow([f" p{i}", rng.choice(SUBREDDITS), rng.choice(NOISY_TEXTS), f"user{rng.randrange(1000)} ",
+                             rng.randrange(-10, 5000), rng.randrange(500), start + rng.randrange(90 * 86400),
+                             rng.choice(NOISY_TEXTS + [""]), "hot", rng.randrange(10**6), rng.choice(["", "12", "x"])])
+
+    with open(comments_dir / "comments.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["comment_id", "post_id", "parent_id", "author", "body", "score", "created_utc",
+                         "author_comment_karma", "author_link_karma"])
+        for comment in synthetic_comments(n_comments, seed=seed):
+            body = rng.choice(NOISY_TEXTS) if rng.random() < 0.1 else comment["body"]
+            post_id = f"p{rng.randrange(n_posts)}"
+            row = [f"c{comment['comment_id']}", post_id, f"t3_{post_id}", f"user{rng.randrange(1000)}", body,
+                   rng.randrange(-10, 500), start + rng.randrange(90 * 86400), rng.randrange(10**6), ""]
+            writer.writerow(row)
+            # some comments fetched twice, the engines keep one row each
+            if rng.random() < 0.01:
+                writer.writerow(row)
+
+
+def spark_session():
+    from pyspark.sql import SparkSession
+    # same time zone as the pandas engine default
+    return (
+        SparkSession.builder.master("local[*]").appName("ProcessingBenchmark")
+        .config("spark.sql.session.timeZone", "UTC")
+        .config("spark.sql.shuffle.partitions", "8")
+        .getOrCreate()
+    )
+
+
+def canonical(df: pd.DataFrame, key: str) -> list[tuple]:
+    """Rows with engine-independent values: nulls as None, integral floats as ints, dates as text"""
+    def value(v):
+        if v is None or v is pd.NA or (isinstance(v, float) and math.isnan(v)) or v is pd.NaT:
+            return None
+        if isinstance(v, float) and v.is_integer():
+            return int(v)
+        if isinstance(v, (datetime, date, pd.Timestamp)):
+            return str(pd.Timestamp(v))
+        return v if isinstance(v, str) else int(v)
+    columns = sorted(df.columns)
+    df = df.sort_values(key)
+    return [tuple(value(v) for v in row) for row in df[columns].astype(object).itertuples(index=False)]
+
+
+def check_equivalence(n_comments: int) -> bool:
+    from spark_processing.pandas_processing import PandasProcessor
+    from spark_processing.spark_processing import SparkProcessor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = Path(tmp)
+        write_raw_csvs(data_path, n_comments)
+        spark = SparkProcessor(data_path=data_path, spark=spark_session())
+        local = PandasProcessor(data_path=data_path)
+
+        ok = True
+        for kind, key in [("posts", "post_id"), ("comments", "comment_id")]:
+            read = getattr(spark, f"read_{kind}")
+            normalize = getattr(spark, f"_normalize_{kind}")
+            spark_df = normalize(spark._generic_normalize(read())).toPandas()
+            read = getattr(local, f"read_{kind}")
+            normalize = getattr(local, f"_normalize_{kind}")
+            local_df = normalize(local._generic_normalize(read()))
+
+            if sorted(spark_df.columns) != sorted(local_df.columns):
+                print(f"{kind}: different columns {sorted(spark_df.columns)} vs {sorted(local_df.columns)}")
+                ok = False
+                continue
+            spark_rows, local_rows = canonical(spark_df, key), canonical(local_df, key)
+            mismatches = [(a, b) for a, b in zip(spark_rows, local_rows) if a != b]
+            if len(spark_rows) != len(local_rows) or mismatches:
+                print(f"{kind}: {len(spark_rows)} vs {len(local_rows)} rows, {len(mismatches)} different")
+                for a, b in mismatches[:5]:
+                    print(f"  spark:  {a}\n  pandas: {b}")
+                ok = False
+            else:
+                print(f"{kind}: {len(local_rows)} rows identical")
+        spark.stop()
+    return ok
+
+
+def run_engine(engine: str, data_path: str) -> float:
+    """Process and save everything from a cold start, meant to run in its own process"""
+    start_time = time.perf_counter()
+    if engine == "spark":
+        from spark_processing.spark_processing import SparkProcessor
+        processor = SparkProcessor(data_path=data_path, spark=spark_session())
+    else:
+        from spark_processing.pandas_processing import PandasProcessor
+        processor = PandasProcessor(data_path=data_path)
+    processor.process_and_save_posts(incremental=False)
+    processor.process_and_save_comments(incremental=False)
+    processor.stop()
+    return time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only check that both engines give the same output")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000, 1_000_000],
+                        help="numbers of raw comments")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check_equivalence(min(args.sizes[0], 20_000)) else 1)
+
+    context = mp.get_context("spawn")
+    crossover = None
+    for n_comments in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_raw_csvs(Path(tmp), n_comments)
+            input_mb = sum(f.stat().st_size for f in Path(tmp, "raw").rglob("*.csv")) / 2**20
+            timings = {}
+            for engine in ["pandas", "spark"]:
+                with context.Pool(1) as pool:
+                    timings[engine] = pool.apply(run_engine, (engine, tmp))
+        print(f"{n_comments:>9} comments ({input_mb:8.1f} MB): pandas {timings['pandas']:7.2f} s, "
+              f"spark {timings['spark']:7.2f} s")
+        if crossover is None and timings["spark"] < timings["pandas"]:
+            crossover = input_mb
+
+    if crossover is None:
+        print("pandas was faster at every size, the crossover is above the largest input")
+    else:
+        print(f"Spark becomes faster around {crossover:.0f} MB of raw input (SPARK_MIN_INPUT_MB)")
@@ -0,0 +1,129 @@
+"""
+Reddit API quota accounting and scheduling against the fake Reddit source with a rate limit.
+
+Runs ingestion rounds (posts of every subreddit, then the comments of the new posts) on
+the fake source, which emits the rate-limit headers and rejects the requests over its
+budget, in simulated time (no credentials, network or database). Compares:
+- managed: RedditQuota, requests ordered and gated by yield, waiting for the window reset
+- unmanaged: every request made, in fetch count order, like before the quota accounting
+and checks that the requests recorded per operation match the ones the source served.
+
+    python benchmarks/reddit_quota.py --subreddits 30 --budget 600 --windows 3
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from reddit_ingestion.fake_reddit import FakeReddit, RateLimitExceeded
+from reddit_ingestion.quota import RedditQuota
+from reddit_ingestion.reddit_ingestion import RedditIngestor
+
+
+class UnmanagedQuota(RedditQuota):
+    """Records the requests, never skips nor waits"""
+
+    def allow(self, operation, subreddit=None):
+        return True
+
+    def expected_yield(self, operation, subreddit=None):
+        return None
+
+    def wait_for_budget(self, stop_event=None):
+        return
+
+
+class InMemoryIngestor(RedditIngestor):
+    """RedditIngestor keeping the posts in memory instead of calling the backend API"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.posts: dict[str, dict[str, str]] = defaultdict(dict) # subreddit -> post id -> fetch type
+        self.pending_comments: list[str] = []
+
+    def add_post_to_db(self, post):
+        self.posts[post["subreddit_name"]][post["post_id"]] = post["fetch_type"]
+        self.pending_comments.append(post["post_id"])
+        return 201
+
+    def add_subreddit_to_db(self, subreddit_name):
+        return 201
+
+    def add_comment_to_db(self, comment):
+        return 201
+
+    def posts_fetch_type_count(self, subreddit_name):
+        return dict(Counter(self.posts[subreddit_name.lower()].values()))
+
+    def get_post_subreddit(self, post_id):
+        return next((subreddit for subreddit, posts in self.posts.items() if post_id in posts), None)
+
+    def get_already_fetched_post_ids(self, subreddit_name):
+        # post ids are lowercased when saved, the fake ones are lowercase already
+        return list(self.posts[subreddit_name.lower()])
+
+
+def run(quota: RedditQuota, args) -> dict:
+    reddit = FakeReddit(latency=args.latency, budget=args.budget, window=args.window, time_scale=args.time_scale)
+    ingestor = InMemoryIngestor(reddit=reddit, quota=quota)
+    subreddits = [f"quotatest{i}" for i in range(args.subreddits)]
+    stop_event = threading.Event()
+    end = args.windows * args.window / args.time_scale
+    start = time.time()
+    while time.time() - start < end:
+        round_start = time.time()
+        for subreddit in subreddits:
+            quota.wait_for_budget(stop_event)
+            try:
+                ingestor.fetch_posts(subreddit)
+            except RateLimitExceeded:
+                ingestor.post_fetched_count = 0
+        post_ids, ingestor.pending_comments = ingestor.pending_comments, []
+        for post_id in post_ids:
+            quota.wait_for_budget(stop_event)
+            try:
+                ingestor.extract_comments_from_post(post_id)
+            except RateLimitExceeded:
+                pass
+        # the next round one ingestion interval later
+        time.sleep(max(args.interval / args.time_scale - (time.time() - round_start), 0))
+
+    served = Counter(operation for _, operation, _ in reddit.requests)
+    recorded = Counter()
+    for (operation, _), usage in quota.usage_totals().items():
+        recorded[operation] += usage["requests"]
+    return {
+        "requests": len(reddit.requests),
+        "rejected": reddit.rejected,
+        "posts": ingestor.posts_added,
+        "skipped": quota.skipped,
+        "served": served,
+        "recorded": recorded,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subreddits", type=int, default=30)
+    parser.add_argument("--budget", type=int, default=600, help="requests per rate-limit window")
+    parser.add_argument("--window", type=float, default=600.0, help="simulated seconds of a rate-limit window")
+    parser.add_argument("--windows", type=int, default=3, help="simulated windows per run")
+    parser.add_argument("--interval", type=float, default=60.0, help="simulated seconds between ingestion rounds")
+    parser.add_argument("--time-scale", type=float, default=120.0, help="simulated seconds per real second")
+    parser.add_argument("--latency", type=float, default=0.0, help="real seconds per fake Reddit request")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATA_DIR", tempfile.gettempdir())
+    failed = False
+    for name, quota in [("unmanaged", UnmanagedQuota()), ("managed", RedditQuota())]:
+        result = run(quota, args)
+        per_100 = result["posts"] / result["requests"] * 100 if result["requests"] else 0.0
+        print(f"{name:>10}: {result['requests']} requests, {result['rejected']} rejected (429), "
+              f"{result['skipped']} skipped by the scheduler, {result['posts']} new posts saved "
+              f"({per_100:.1f} per 100 requests)")
+        if result["served"] != result["recorded"]:
+            print(f"  accounting mismatch: served {dict(result['served'])}, recorded {dict(result['recorded'])}")
+            failed = True
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,72 @@
+"""
+Parity check and throughput/latency benchmark of the SentimentModel inference backends.
+The fp32 torch backend is the reference: every other backend must agree on the labels
+and stay close on the scores.
+
+Run from the project root (the model must be downloadable or already cached):
+    python benchmarks/sentiment_backends.py
+"""
+import statistics
+import time
+
+from sentiment_model.sentiment_model import BACKENDS, SentimentModel
+from corpus import synthetic_comments
+
+N_COMMENTS = 512
+N_LATENCY_RUNS = 20
+MIN_LABEL_AGREEMENT = 0.97
+MAX_MEAN_SCORE_DELTA = 0.02
+SCORE_KEYS = ["negative_score", "neutral_score", "positive_score"]
+
+
+def benchmark_backend(backend: str) -> tuple[list[dict], dict]:
+    model = SentimentModel(backend=backend)
+
+    start_time = time.time()
+    preds = model.predict(synthetic_comments(N_COMMENTS))
+    elapsed = time.time() - start_time
+
+    latencies = []
+    for comment in synthetic_comments(N_LATENCY_RUNS, seed=7):
+        start_time = time.perf_counter()
+        model.predict([comment])
+        latencies.append((time.perf_counter() - start_time) * 1000)
+
+    stats = {
+        "comments_per_sec": N_COMMENTS / elapsed,
+        "p50_latency_ms": statistics.median(latencies),
+        "max_latency_ms": max(latencies),
+    }
+    return preds, stats
+
+
+def parity(reference: list[dict], preds: list[dict]) -> dict:
+    agreement = sum(r["pred_label"] == p["pred_label"] for r, p in zip(reference, preds)) / len(reference)
+    deltas = [abs(r[k] - p[k]) for r, p in zip(reference, preds) for k in SCORE_KEYS]
+    return {
+        "label_agreement": agreement,
+        "mean_score_delta": statistics.mean(deltas),
+        "max_score_delta": max(deltas),
+    }
+
+
+if __name__ == "__main__":
+    reference = None
+    failed = []
+    for backend in BACKENDS:
+        preds, stats = benchmark_backend(backend)
+        print(f"[{backend}] {stats['comments_per_sec']:.1f} comments/s, "
+              f"single comment latency p50 {stats['p50_latency_ms']:.1f} ms / max {stats['max_latency_ms']:.1f} ms")
+        if reference is None:
+            reference = preds
+            continue
+
+        result = parity(reference, preds)
+        print(f"[{backend}] label agreement {result['label_agreement']:.1%}, "
+              f"score delta mean {result['mean_score_delta']:.4f} / max {result['max_score_delta']:.4f}")
+        if result["label_agreement"] < MIN_LABEL_AGREEMENT or result["mean_score_delta"] > MAX_MEAN_SCORE_DELTA:
+            failed.append(backend)
+
+    if failed:
+        raise SystemExit(f"Parity check failed for: {failed}")
+    print("Parity check passed for all backends.")
@@ -0,0 +1,54 @@
+"""
+Compare the old fixed max_length padding with the length-bucketed dynamic padding
+of SentimentModel.predict on a synthetic set of short, Reddit-like comments.
+
+Run from the project root (the model must be downloadable or already cached):
+    python benchmarks/sentiment_padding.py
+"""
+import time
+
+import torch
+
+from sentiment_model.sentiment_model import SentimentModel
+from corpus import synthetic_comments
+
+N_COMMENTS = 512
+
+
+def predict_fixed_padding(model: SentimentModel, inputs: list[dict], batch_size: int = 32) -> list[dict]:
+    """The previous predict implementation: fixed-size batches padded to 512 tokens"""
+    for i in range(0, len(inputs), batch_size):
+        batch_dicts = inputs[i:i + batch_size]
+        batch_tokenized = model.tokenizer(
+            [d['body'] for d in batch_dicts],
+            return_tensors="pt",
+            padding="max_length",
+            truncation=True,
+            max_length=512
+        )
+        batch_tokenized = {k: v.to(model.device) for k, v in batch_tokenized.items()}
+        with torch.no_grad():
+            scores = torch.nn.functional.softmax(model.model(**batch_tokenized).logits, dim=-1)
+        for d, score_vector in zip(batch_dicts, scores):
+            d['pred_label'] = ["negative", "neutral", "positive"][torch.argmax(score_vector).item()]
+    return inputs
+
+
+if __name__ == "__main__":
+    model = SentimentModel()
+
+    fixed_inputs = synthetic_comments(N_COMMENTS)
+    start_time = time.time()
+    predict_fixed_padding(model, fixed_inputs)
+    fixed_elapsed = time.time() - start_time
+    print(f"Fixed padding:   {fixed_elapsed:.2f} s ({N_COMMENTS / fixed_elapsed:.1f} comments/s)")
+
+    dynamic_inputs = synthetic_comments(N_COMMENTS)
+    start_time = time.time()
+    model.predict(dynamic_inputs)
+    dynamic_elapsed = time.time() - start_time
+    print(f"Dynamic padding: {dynamic_elapsed:.2f} s ({N_COMMENTS / dynamic_elapsed:.1f} comments/s, "
+          f"padding ratio {model.last_padding_ratio:.1%})")
+
+    agreement = sum(a["pred_label"] == b["pred_label"] for a, b in zip(fixed_inputs, dynamic_inputs)) / N_COMMENTS
+    print(f"Speed-up: {fixed_elapsed / dynamic_elapsed:.1f}x, label agreement: {agreement:.1%}")
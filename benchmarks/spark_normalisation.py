@@ -0,0 +1,79 @@
+"""
+Compare the previous chained withColumn/regexp_replace comment normalisation of
+SparkProcessor with the fused single-projection one, on a large synthetic input.
+
+Both plans are run to completion with the noop writer, so only reading and
+normalising is measured. The raw CSVs are generated once in --data-dir and reused.
+
+    python benchmarks/spark_normalisation.py --n-comments 10000000 --data-dir /tmp/normalisation-10m
+"""
+import argparse
+import time
+from pathlib import Path
+
+from pyspark.sql import DataFrame
+from pyspark.sql.functions import col, trim, lower, regexp_replace, length, size, split, dayofweek, from_unixtime, to_timestamp, to_date, date_format
+
+from processing_engines import spark_session, write_raw_csvs
+from spark_processing.spark_processing import SparkProcessor
+
+
+def chained_normalize(df: DataFrame) -> DataFrame:
+    """The previous _generic_normalize + _normalize_comments: one withColumn per step"""
+    for c in [c for c in df.columns if c.endswith("_id")]:
+        df = df.withColumn(c, col(c).cast("string"))
+        df = df.withColumn(c, trim(col(c)))
+    df = df.withColumn("author_comment_karma", col("author_comment_karma").cast("long"))
+    df = df.withColumn("author_link_karma", col("author_link_karma").cast("long"))
+    df = df.withColumn("created_utc", col("created_utc").cast("long"))
+    df = df.withColumn("created_ts", to_timestamp(from_unixtime(col("created_utc"))))
+    df = df.withColumn("created_date", to_date(col("created_ts")))
+    df = df.withColumn("created_time", date_format(col("created_ts"), "HH:mm"))
+    df = df.withColumn("author", trim(col("author")))
+    df = df.withColumn("score", col("score").cast("long"))
+
+    df = df.dropna(subset=["comment_id"]).dropDuplicates(["comment_id"])
+    df = df.withColumn("body", col("body").cast("string"))
+    df = df.withColumn("body", regexp_replace(col("body"), r"[\r\n\t]+", " "))
+    df = df.withColumn("body", regexp_replace(col("body"), r"\s+", " "))
+    df = df.withColumn("body", trim(col("body")))
+    df = df.withColumn("body", regexp_replace(col("body"), r"\"", "'"))
+    df = df.withColumn("body", regexp_replace(col("body"), r"[^\x00-\x7F]+", ""))
+    df = df.withColumn("body", lower(col("body")))
+    df = df.withColumn("body_len_chars", length(col("body")))
+    df = df.withColumn("body_len_words", size(split(col("body"), " ")))
+    df = df.withColumn("num_urls", size(split(col("body"), r"https?://\S+")))
+    df = df.withColumn("created_dayofweek", dayofweek(col("created_ts")))
+    return df
+
+
+def fused_normalize(processor: SparkProcessor, df: DataFrame) -> DataFrame:
+    return processor._normalize_comments(processor._generic_normalize(df))
+
+
+def run(df: DataFrame) -> float:
+    start_time = time.perf_counter()
+    df.write.format("noop").mode("overwrite").save()
+    return time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n-comments", type=int, default=10_000_000)
+    parser.add_argument("--data-dir", type=Path, default=Path("/tmp/spark-normalisation"))
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if not (args.data_dir / "raw" / "comments" / "comments.csv").exists():
+        print(f"Writing {args.n_comments} raw comments to {args.data_dir}...")
+        write_raw_csvs(args.data_dir, args.n_comments)
+
+    processor = SparkProcessor(data_path=args.data_dir, spark=spark_session())
+    raw = processor.read_comments()
+    run(raw) # warm-up, and the input in the OS cache for both plans
+
+    for name, plan in [("chained", lambda: chained_normalize(raw)), ("fused", lambda: fused_normalize(processor, raw))]:
+        timings = sorted(run(plan()) for _ in range(args.repeats))
+        print(f"{name:>8}: best {timings[0]:.1f} s, median {timings[len(timings) // 2]:.1f} s "
+              f"({args.n_comments / timings[0] / 1000:.0f}k comments/s)")
+    processor.stop()
@@ -0,0 +1,91 @@
+"""
+Trend payload downsampling: LTTB against plain decimation (every k-th bucket).
+
+Builds synthetic hourly trend rows (daily cycle, slow drift, noise and a few spikes, like
+a busy subreddit) for several ranges and reports, for max_points buckets: the JSON payload
+size, the downsampling time, and how well the shape survives, as the mean and max error of
+the downsampled series linearly interpolated back on every hour, and the share of the
+spikes still visible.
+
+    python benchmarks/trend_downsampling.py --days 30 90 365 --max-points 300
+"""
+import argparse
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from reddit_db.downsampling import TREND_SERIES, downsample_rows
+
+
+def hourly_rows(days: int, seed: int = 0) -> tuple[list[dict], list[int]]:
+    """Hourly trend rows and the indices of their spikes"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows, spikes = [], []
+    for h in range(days * 24):
+        positive = 0.35 + 0.08 * math.sin(2 * math.pi * h / 24) + 0.05 * math.sin(2 * math.pi * h / (24 * 30)) + rng.gauss(0, 0.02)
+        negative = 0.30 - 0.06 * math.sin(2 * math.pi * h / 24) + rng.gauss(0, 0.02)
+        if rng.random() < 0.002:
+            # a thread blowing up
+            negative += 0.35
+            spikes.append(h)
+        positive, negative = min(max(positive, 0.0), 1.0), min(max(negative, 0.0), 1.0)
+        rows.append({
+            "hour": str(start + timedelta(hours=h)),
+            "avg_positive": positive,
+            "avg_neutral": max(1.0 - positive - negative, 0.0),
+            "avg_negative": negative,
+            "n_comments": rng.randint(5, 200),
+        })
+    return rows, spikes
+
+
+def decimate(rows: list[dict], max_points: int) -> list[dict]:
+    step = math.ceil(len(rows) / max_points)
+    return rows[::step]
+
+
+def shape_error(rows: list[dict], kept: list[dict]) -> tuple[float, float]:
+    """Mean and max absolute error of the kept points interpolated back on every row"""
+    index = {row["hour"]: i for i, row in enumerate(rows)}
+    positions = [index[row["hour"]] for row in kept]
+    errors = []
+    for key in TREND_SERIES:
+        for left, right in zip(positions, positions[1:]):
+            for i in range(left, right + 1):
+                t = (i - left) / (right - left)
+                value = rows[left][key] + t * (rows[right][key] - rows[left][key])
+                errors.append(abs(value - rows[i][key]))
+    return sum(errors) / len(errors), max(errors)
+
+
+def spikes_kept(rows: list[dict], kept: list[dict], spikes: list[int], window: int = 1) -> float:
+    """Share of the spikes with a kept point within window hours"""
+    if not spikes:
+        return 1.0
+    index = {row["hour"]: i for i, row in enumerate(rows)}
+    positions = {index[row["hour"]] for row in kept}
+    return sum(any(s + d in positions for d in range(-window, window + 1)) for s in spikes) / len(spikes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", nargs="+", type=int, default=[30, 90, 365])
+    parser.add_argument("--max-points", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'days':>5} {'method':>9} {'points':>7} {'payload KB':>11} {'ms':>8} {'mean err':>9} {'max err':>8} {'spikes':>7}")
+    for days in args.days:
+        rows, spikes = hourly_rows(days)
+        full_kb = len(json.dumps(rows)) / 1024
+        print(f"{days:>5} {'full':>9} {len(rows):>7} {full_kb:>11.1f} {'':>8} {'':>9} {'':>8} {'':>7}")
+        for name, method in [("decimate", lambda: decimate(rows, args.max_points)),
+                             ("lttb", lambda: downsample_rows(rows, "hour", TREND_SERIES, args.max_points))]:
+            start = time.perf_counter()
+            kept = method()
+            ms = (time.perf_counter() - start) * 1000
+            mean_error, max_error = shape_error(rows, kept)
+            print(f"{days:>5} {name:>9} {len(kept):>7} {len(json.dumps(kept)) / 1024:>11.1f} {ms:>8.1f} "
+                  f"{mean_error:>9.4f} {max_error:>8.3f} {spikes_kept(rows, kept, spikes):>7.0%}")
@@ -1,41 +1,37 @@
-from prefect import flow, task
-import subprocess
-import time
-from datetime import datetime
+from prefect import flow
+import signal
 from dotenv import load_dotenv
 import os
-from pathlib import Path
+import sys
 
-load_dotenv()
-root_dir = os.getenv("ROOT")
-root_dir = Path(root_dir) 
-pipelines_dir = root_dir / "src" / "pipelines"
-
-# ----------------
-# TASK DEFINITIONS
-# ----------------
-@task(retries=10, retry_delay_seconds=60, timeout_seconds=900)
-def run_fetch_data():
-    print(f"[{datetime.now()}] Running fetch_data.py")
-    fetch_path = pipelines_dir / "fetch_data.py"
-    subprocess.run(["python", str(fetch_path)], check=True)
+from orchestration.orchestrator import PipelineOrchestrator
+from reddit_db.db_manager import RedditDBManager
+from sentiment_model.worker import RESTART_EXIT_CODE, serve_health
 
-@task
-def run_sentiment_loading():
-    print(f"[{datetime.now()}] Running sentiment_loading.py")
-    sentiment_path = pipelines_dir / "sentiment_loading.py"
-    subprocess.run(["python", str(sentiment_path)], check=True)
+load_dotenv()
 
 # ----------------
 # FLOW DEFINITIONS
 # ----------------
 @flow
-def main_loop():
-    while True:
-        start_time = time.time()
-        run_fetch_data()
-        run_sentiment_loading()
-        print(f"Cycle completed in {time.time() - start_time:.2f} seconds.")
+def main_loop(orchestrator: PipelineOrchestrator):
+    """Ingestion, comment extraction and sentiment scoring run concurrently in this process
+    until SIGTERM / SIGINT, see PipelineOrchestrator for the per-stage settings."""
+    orchestrator.run()
 
 if __name__ == "__main__":
-    main_loop()
+    db_manager = RedditDBManager()
+    db_manager.init_schema()
+    orchestrator = PipelineOrchestrator(db_manager)
+    # signal handlers can only be installed from the main thread
+    signal.signal(signal.SIGTERM, orchestrator.stop)
+    signal.signal(signal.SIGINT, orchestrator.stop)
+
+    health_port = int(os.getenv("SENTIMENT_WORKER_PORT", "8001"))
+    server = serve_health(orchestrator, health_port)
+    print(f"Health endpoint on port {health_port}")
+    main_loop(orchestrator)
+    server.shutdown()
+    # the sentiment model changed and could not be reloaded in this process
+    if orchestrator.restart_required:
+        sys.exit(RESTART_EXIT_CODE)
@@ -1,16 +1,25 @@
-import uvicorn 
-from fastapi import Depends, FastAPI, HTTPException
+import asyncio
+import json
+import time
+from collections import defaultdict
+from typing import Literal, Optional
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from reddit_db.models import Post, Comment, Subreddit
 from reddit_db.db_manager import RedditDBManager
 from sqlmodel import Session, select
 
 app = FastAPI()
+# no connection at import: the engine and the schema check come with the startup hook
 db_manager = RedditDBManager()
-engine = db_manager.engine
+
+@app.on_event("startup")
+def init_db():
+    db_manager.init_schema()
 
 def get_session():
-    with Session(engine) as session:
+    with Session(db_manager.engine) as session:
         yield session
 
 # ------------ db operations ------------
@@ -59,6 +68,16 @@ def get_posts(session: Session = Depends(get_session)):
     print(f"Retrieved {len(posts)} posts from the database.")
     return posts
 
+@app.get("/posts/count/")
+def count_posts(subreddit: Optional[str] = None):
+    """Get the number of posts, of one subreddit if given"""
+    return {"subreddit": subreddit, "posts_count": db_manager.count_posts(subreddit)}
+
+@app.get("/comments/count/")
+def count_comments(subreddit: Optional[str] = None, labeled: Optional[bool] = None):
+    """Get the number of comments, of one subreddit and with or without a sentiment label if given"""
+    return {"subreddit": subreddit, "comments_count": db_manager.count_comments(subreddit, labeled)}
+
 @app.get("/posts/ids/{subreddit_name}", response_model=list[str])
 def get_posts_ids(subreddit_name: str, session: Session = Depends(get_session)):
     """Get all post ids for a given subreddit"""
@@ -66,6 +85,14 @@ def get_posts_ids(subreddit_name: str, session: Session = Depends(get_session)):
     post_ids = [post.post_id for post in posts]
     return post_ids
 
+@app.get("/posts/{post_id}/subreddit")
+def get_post_subreddit(post_id: str, session: Session = Depends(get_session)):
+    """Get the subreddit of a post"""
+    post = session.get(Post, post_id)
+    if post is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return {"post_id": post_id, "subreddit": post.subreddit_name}
+
 @app.get("/posts/count/fetch_type/{subreddit_name}", response_model=dict[str, int])
 def get_posts_count_by_fetch_type(subreddit_name: str, session: Session = Depends(get_session)):
     """Get count of posts by fetch type for a given subreddit"""
@@ -85,10 +112,7 @@ def get_comments_sentiment(subreddit_name: str):
 @app.get("/data/subreddits/posts_count/{subreddit_name}")
 def get_subreddit_posts_count(subreddit_name: str):
     """Get the count of posts for a given subreddit"""
-    count = db_manager.calculate_subreddits_post_counts()
-    if count is None:
-        raise HTTPException(status_code=404, detail="Subreddit not found or no posts available")
-    return {"subreddit": subreddit_name, "posts_count": count[subreddit_name]}
+    return {"subreddit": subreddit_name, "posts_count": db_manager.count_posts(subreddit_name)}
 
 @app.get("/data/subreddits/subreddit_status/{subreddit_name}")
 def get_subreddits_priorities(subreddit_name: str):
@@ -99,31 +123,145 @@ def get_subreddits_priorities(subreddit_name: str):
     return status
 
 @app.get("/data/sentiment/hourly/{subreddit_name}")
-def get_hourly_sentiment(subreddit_name: str):
-    """Get sentiment data aggregated hourly for a given subreddit"""
-    data = db_manager.get_hourly_sentiment(subreddit_name)
+def get_hourly_sentiment(subreddit_name: str, days: Optional[int] = None, max_points: Optional[int] = Query(None, ge=3)):
+    """Get sentiment data aggregated hourly for a given subreddit, of the last days (default per granularity),
+    downsampled to at most max_points buckets"""
+    data = db_manager.get_hourly_sentiment(subreddit_name, days=days, max_points=max_points)
     if data is None:
         raise HTTPException(status_code=404, detail="Subreddit not found or no posts available")
     return data
 @app.get("/data/sentiment/daily/{subreddit_name}")
-def get_daily_sentiment(subreddit_name: str):
-    """Get sentiment data aggregated daily for a given subreddit"""
-    data = db_manager.get_daily_sentiment(subreddit_name)
+def get_daily_sentiment(subreddit_name: str, days: Optional[int] = None, max_points: Optional[int] = Query(None, ge=3)):
+    """Get sentiment data aggregated daily for a given subreddit, of the last days (default per granularity),
+    downsampled to at most max_points buckets"""
+    data = db_manager.get_daily_sentiment(subreddit_name, days=days, max_points=max_points)
     if data is None:
         raise HTTPException(status_code=404, detail="Subreddit not found or no posts available")
     return data
 @app.get("/data/sentiment/weekly/{subreddit_name}")
-def get_weekly_sentiment(subreddit_name: str):
-    """Get sentiment data aggregated weekly for a given subreddit"""
-    data = db_manager.get_weekly_sentiment(subreddit_name)
+def get_weekly_sentiment(subreddit_name: str, days: Optional[int] = None, max_points: Optional[int] = Query(None, ge=3)):
+    """Get sentiment data aggregated weekly for a given subreddit, of the last days (default per granularity),
+    downsampled to at most max_points buckets"""
+    data = db_manager.get_weekly_sentiment(subreddit_name, days=days, max_points=max_points)
     if data is None:
         raise HTTPException(status_code=404, detail="Subreddit not found or no posts available")
     return data
 
 @app.get("/data/sentiment/monthly/{subreddit_name}")
-def get_monthly_sentiment(subreddit_name: str):
-    """Get sentiment data aggregated monthly for a given subreddit"""
-    data = db_manager.get_monthly_sentiment(subreddit_name)
+def get_monthly_sentiment(subreddit_name: str, days: Optional[int] = None, max_points: Optional[int] = Query(None, ge=3)):
+    """Get sentiment data aggregated monthly for a given subreddit, of the last days (default per granularity),
+    downsampled to at most max_points buckets"""
+    data = db_manager.get_monthly_sentiment(subreddit_name, days=days, max_points=max_points)
     if data is None:
         raise HTTPException(status_code=404, detail="Subreddit not found or no posts available")
     return data
+
+MAX_COMPARED_SUBREDDITS = 20
+
+@app.get("/data/sentiment/compare/{freq}")
+def compare_subreddits_sentiment(
+    freq: Literal["hourly", "daily", "weekly", "monthly"],
+    subreddits: list[str] = Query(...),
+    days: Optional[int] = None,
+    max_points: Optional[int] = Query(None, ge=3)
+):
+    """Get the sentiment series of several subreddits (repeat ?subreddits=) aggregated by freq, from one query,
+    with each subreddit's averages over the whole range"""
+    subreddits = list(dict.fromkeys(subreddits))
+    if len(subreddits) > MAX_COMPARED_SUBREDDITS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_COMPARED_SUBREDDITS} subreddits can be compared")
+    return db_manager.compare_subreddits_sentiment(subreddits, freq, days=days, max_points=max_points)
+
+# ------------ Sentiment model versions ------------
+@app.get("/models/")
+def get_model_versions():
+    """Get the registered sentiment model versions, the active one and their trials"""
+    return db_manager.get_model_versions()
+
+@app.get("/models/compare/{baseline}/{candidate}")
+def compare_model_versions(baseline: str, candidate: str, subreddit: Optional[str] = None):
+    """Compare the scores of two model versions, optionally on one subreddit"""
+    comparison = db_manager.compare_model_versions(baseline, candidate, subreddit=subreddit)
+    if not comparison["compared_comments"]:
+        raise HTTPException(status_code=404, detail="No comments scored by both model versions")
+    return comparison
+
+# ------------ Pipeline telemetry ------------
+@app.get("/metrics/runs/")
+def get_pipeline_runs(limit: int = 50):
+    """Get the latest pipeline runs"""
+    return db_manager.get_pipeline_runs(limit=limit)
+
+@app.get("/metrics/stages/")
+def get_stage_metrics(hours: int = 24, stage: Optional[str] = None):
+    """Get the per-stage throughput and backlog of the last hours, oldest first"""
+    return db_manager.get_stage_metrics(hours=hours, stage=stage)
+
+@app.get("/metrics/api/")
+def get_api_usage(hours: int = 24):
+    """Get the Reddit API requests per operation and subreddit of the last hours, with their yield and the budget left"""
+    return db_manager.get_api_usage(hours=hours)
+
+# ------------ Live updates ------------
+class SentimentDelta(BaseModel):
+    subreddit: str
+    label_counts: dict[str, int]
+    buckets: list[dict]
+
+# subreddit -> queues of the connected dashboard sessions
+# NOTE: subscribers live in this process, so the backend must run with a single worker
+sentiment_subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+SUBSCRIBER_QUEUE_SIZE = 256
+KEEP_ALIVE_SECONDS = 15
+# sequence number of the last published delta, starting from the clock so it keeps growing across restarts
+last_sentiment_seq = time.time_ns()
+
+@app.middleware("http")
+async def stamp_sentiment_seq(request: Request, call_next):
+    """Sentiment data responses carry the sequence number of the last delta published before their
+    query ran: those deltas are already counted in the response, the dashboard skips them"""
+    seq = last_sentiment_seq
+    response = await call_next(request)
+    if request.url.path.startswith("/data/sentiment/"):
+        response.headers["X-Sentiment-Seq"] = str(seq)
+    return response
+
+@app.post("/events/sentiment")
+async def publish_sentiment_deltas(deltas: list[SentimentDelta]):
+    """Broadcast sentiment deltas produced by the sentiment pipeline to the connected dashboards"""
+    global last_sentiment_seq
+    delivered = 0
+    for delta in deltas:
+        # deltas are published after their comments are committed
+        last_sentiment_seq += 1
+        event = {**delta.model_dump(), "seq": last_sentiment_seq}
+        for queue in list(sentiment_subscribers.get(delta.subreddit, ())):
+            try:
+                queue.put_nowait(event)
+                delivered += 1
+            except asyncio.QueueFull:
+                # slow consumer, it will catch up with a manual refresh
+                pass
+    return {"delivered": delivered}
+
+@app.get("/stream/sentiment/{subreddit_name}")
+async def stream_sentiment(subreddit_name: str, request: Request):
+    """Server-sent events stream of sentiment deltas for a given subreddit"""
+    queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    sentiment_subscribers[subreddit_name].add(queue)
+
+    async def event_stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    delta = await asyncio.wait_for(queue.get(), timeout=KEEP_ALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: sentiment\ndata: {json.dumps(delta)}\n\n"
+        finally:
+            sentiment_subscribers[subreddit_name].discard(queue)
+            if not sentiment_subscribers[subreddit_name]:
+                sentiment_subscribers.pop(subreddit_name, None)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
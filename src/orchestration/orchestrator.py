@@ -0,0 +1,333 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+from reddit_ingestion.lease_worker import LeasedIngestionWorker, default_worker_id
+from reddit_ingestion.quota import REDDIT_QUOTA, RedditQuota
+from reddit_ingestion.reddit_ingestion import RedditIngestor
+from sentiment_model.labeler import SentimentLabeler, active_sentiment_model
+from sentiment_model.worker import SentimentWorker
+
+from .telemetry import PipelineTelemetry
+
+
+class StageCounters:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.rows_processed = 0
+        self.api_calls = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.queued = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float, rows_processed: int = 0, api_calls: int = 0, error: bool = False):
+        with self.lock:
+            self.items += 1
+            self.rows_processed += rows_processed
+            self.api_calls += api_calls
+            self.errors += int(error)
+            self.busy_seconds += seconds
+
+    def totals(self) -> dict:
+        return {"rows_processed": self.rows_processed, "api_calls": self.api_calls, "errors": self.errors}
+
+    def as_dict(self) -> dict:
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "rows_processed": self.rows_processed,
+            "api_calls": self.api_calls,
+            "errors": self.errors,
+            "busy_seconds": self.busy_seconds,
+            "queued": self.queued,
+        }
+
+
+class PipelineOrchestrator:
+    """
+    Runs the whole pipeline in one long-lived process, with the stages working concurrently:
+
+    - ingestion: ingestion_workers threads fetch new posts of the highest priority subreddits,
+      leasing one at a time through the subreddit_lease table (shared with the ingestion
+      workers of other processes or nodes), each subreddit at most every ingestion_interval seconds
+    - comments: comment_workers threads extract the comments of the posts without comments
+      (the work table), woken up as soon as a subreddit has been ingested
+    - sentiment: the SentimentWorker staged pipeline, woken up as soon as comments are written.
+      When another model version is activated, a single model is reloaded in place; with
+      inference replicas, which cannot be forked while the other stages run, the orchestrator
+      stops with restart_required set, for the supervisor to restart it (RESTART_EXIT_CODE)
+
+    Every worker keeps its own RedditIngestor, the model and the DB engine are loaded once.
+    The ingestors share the Reddit API budget (quota): when it runs low they only spend it on
+    the highest yield requests, when it is exhausted the workers wait for the window reset.
+    stop() lets every stage finish its current item; the sentiment stage writes its claimed batches.
+    """
+
+    def __init__(
+        self,
+        db_manager,
+        ingestion_workers: int = int(os.getenv("INGESTION_WORKERS", "1")),
+        comment_workers: int = int(os.getenv("COMMENT_WORKERS", "4")),
+        ingestion_interval: float = float(os.getenv("INGESTION_INTERVAL", "60")),
+        comment_retry_interval: float = 3600.0,
+        metrics_interval: float = float(os.getenv("METRICS_INTERVAL", "60")),
+        ingestor_factory: Callable[[], RedditIngestor] = RedditIngestor,
+        quota: RedditQuota = REDDIT_QUOTA,
+        reload_attempts: int = 3,
+        reload_retry_seconds: float = 30.0
+    ):
+        self.db_manager = db_manager
+        # the Reddit API budget, shared by the ingestors of every stage
+        self.quota = quota
+        self.metrics_interval = metrics_interval
+        self.ingestion_interval = ingestion_interval
+        self.comment_retry_interval = comment_retry_interval
+        self.ingestor_factory = ingestor_factory
+
+        self.stop_event = threading.Event()
+        self.posts_ready = threading.Event()
+        self.post_queue = queue.Queue()
+        # post ids queued or attempted, with the time of the attempt: posts whose comments could
+        # not be fetched (or have none) stay in the work table and are retried later
+        self.post_attempts: dict[str, float] = {}
+        self.post_attempts_lock = threading.Lock()
+
+        self.counters = {
+            "ingestion": StageCounters("ingestion", ingestion_workers),
+            "comments": StageCounters("comments", comment_workers),
+        }
+        self.sentiment_worker: Optional[SentimentWorker] = None
+        # totals of the sentiment workers replaced by a model reload
+        self.sentiment_base = {"rows_processed": 0, "errors": 0}
+        self.reload_attempts = reload_attempts
+        self.reload_retry_seconds = reload_retry_seconds
+        self.sentiment_error: Optional[str] = None
+        self.restart_required = False
+        self.threads: list[threading.Thread] = []
+
+    def stop(self, *_):
+        print("Stopping the pipeline after the current items...")
+        self.stop_event.set()
+        self.posts_ready.set()
+        sentiment_worker = self.sentiment_worker
+        if sentiment_worker is not None:
+            sentiment_worker.stop()
+
+    def status(self) -> dict:
+        self.counters["comments"].queued = self.post_queue.qsize()
+        # read once: the sentiment stage sets it to None while reloading the model
+        sentiment_worker = self.sentiment_worker
+        return {
+            "status": "stopping" if self.stop_event.is_set() else "running",
+            "stages": {name: counters.as_dict() for name, counters in self.counters.items()},
+            "sentiment": sentiment_worker.status() if sentiment_worker else None,
+            "sentiment_error": self.sentiment_error,
+            "restart_required": self.restart_required,
+            "reddit_quota": self.quota.snapshot(),
+        }
+
+    def _get(self, q: queue.Queue):
+        while not self.stop_event.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
+
+    ### Ingestion stage ###
+    def _new_ingestor(self) -> RedditIngestor:
+        ingestor = self.ingestor_factory()
+        ingestor.quota = self.quota
+        return ingestor
+
+    def _ingestion_worker(self, index: int):
+        worker = LeasedIngestionWorker(
+            self.db_manager,
+            self._new_ingestor(),
+            worker_id=f"{default_worker_id()}-{index}",
+            refetch_seconds=int(self.ingestion_interval)
+        )
+        counters = self.counters["ingestion"]
+        while not self.stop_event.is_set():
+            self.quota.wait_for_budget(self.stop_event)
+            if self.stop_event.is_set():
+                break
+            start_time = time.time()
+            posts_added, api_calls, errors = worker.ingestor.posts_added, worker.ingestor.api_calls, worker.errors
+            try:
+                subreddit = worker.ingest_one()
+            except Exception as e:
+                print(f"Error claiming a subreddit: {e}")
+                worker.errors += 1
+                subreddit = None
+            if subreddit is None:
+                self.stop_event.wait(worker.idle_sleep)
+                continue
+            counters.record(
+                time.time() - start_time,
+                rows_processed=worker.ingestor.posts_added - posts_added,
+                api_calls=worker.ingestor.api_calls - api_calls,
+                error=worker.errors > errors
+            )
+            if worker.errors > errors:
+                self.stop_event.wait(worker.idle_sleep)
+                continue
+            self.posts_ready.set()
+
+    ### Comment extraction stage ###
+    def _schedule_posts(self):
+        """Queue the posts without comments, whenever a subreddit has been ingested"""
+        while not self.stop_event.is_set():
+            self.posts_ready.wait(self.ingestion_interval)
+            self.posts_ready.clear()
+            if self.stop_event.is_set():
+                break
+            try:
+                post_ids = self.db_manager.get_posts_without_comments()
+            except Exception as e:
+                print(f"Could not read the posts without comments: {e}")
+                continue
+            now = time.time()
+            with self.post_attempts_lock:
+                self.post_attempts = {
+                    post_id: attempted for post_id, attempted in self.post_attempts.items()
+                    if now - attempted < self.comment_retry_interval
+                }
+                for post_id in post_ids:
+                    if now - self.post_attempts.get(post_id, 0.0) < self.comment_retry_interval:
+                        continue
+                    self.post_attempts[post_id] = now
+                    self.post_queue.put(post_id)
+
+    def _comment_worker(self):
+        ingestor = self._new_ingestor()
+        counters = self.counters["comments"]
+        while (post_id := self._get(self.post_queue)) is not None:
+            self.quota.wait_for_budget(self.stop_event)
+            start_time = time.time()
+            comments_added, api_calls = ingestor.comments_added, ingestor.api_calls
+            error = False
+            try:
+                ingestor.extract_comments_from_post(post_id)
+            except Exception as e:
+                print(f"Error fetching comments for post {post_id}: {e}")
+                error = True
+            counters.record(
+                time.time() - start_time,
+                rows_processed=ingestor.comments_added - comments_added,
+                api_calls=ingestor.api_calls - api_calls,
+                error=error
+            )
+            sentiment_worker = self.sentiment_worker
+            if sentiment_worker is not None:
+                sentiment_worker.wake()
+
+    ### Sentiment stage ###
+    def _replicated(self) -> bool:
+        return int(os.getenv("SENTIMENT_REPLICAS", "1")) > 1
+
+    def _load_sentiment_worker(self) -> SentimentWorker:
+        model = active_sentiment_model(self.db_manager)
+        if self._replicated():
+            from sentiment_model.inference_pool import InferencePool
+            model = InferencePool(model)
+        return SentimentWorker(SentimentLabeler(self.db_manager, model=model))
+
+    def _reload_sentiment_worker(self) -> bool:
+        """Load the active model version in place of the old one, retrying failed loads"""
+        for attempt in range(1, self.reload_attempts + 1):
+            try:
+                self.sentiment_worker = self._load_sentiment_worker()
+                self.sentiment_error = None
+                return True
+            except Exception as e:
+                self.sentiment_error = f"model reload failed (attempt {attempt}/{self.reload_attempts}): {e}"
+                print(self.sentiment_error)
+                if self.stop_event.wait(self.reload_retry_seconds * attempt):
+                    return False
+        return False
+
+    def _restart(self):
+        """Stop every stage, for the supervisor to start a fresh process"""
+        self.restart_required = True
+        self.stop()
+
+    def _sentiment_stage(self):
+        while not self.stop_event.is_set():
+            try:
+                self.sentiment_worker.run()
+            except Exception as e:
+                self.sentiment_error = f"sentiment worker failed: {e}"
+                print(self.sentiment_error)
+                self._restart()
+            # the inference pool has replica processes to stop, a single model nothing
+            if hasattr(self.sentiment_worker.labeler.model, "close"):
+                self.sentiment_worker.labeler.model.close()
+            if not self.sentiment_worker.restart_required or self.stop_event.is_set():
+                break
+            # another model version was activated. Forking the replicas now, with the other
+            # stages' threads running, could deadlock them: restart the process instead
+            if self._replicated():
+                print("Restarting the pipeline to load the new sentiment model...")
+                self._restart()
+                break
+            print("Reloading the sentiment model...")
+            self.sentiment_base = self._sentiment_totals()
+            self.sentiment_worker = None
+            if not self._reload_sentiment_worker():
+                self._restart()
+                break
+
+    def _sentiment_totals(self) -> dict:
+        worker = self.sentiment_worker
+        return {
+            "rows_processed": self.sentiment_base["rows_processed"] + (worker.labeler.processed if worker else 0),
+            "api_calls": 0,
+            "errors": self.sentiment_base["errors"] + (worker.errors if worker else 0),
+        }
+
+    ### Telemetry ###
+    def totals(self) -> dict[str, dict]:
+        return {
+            "ingestion": self.counters["ingestion"].totals(),
+            "comments": self.counters["comments"].totals(),
+            "sentiment": self._sentiment_totals(),
+        }
+
+    def _report_metrics(self, telemetry: PipelineTelemetry):
+        while not self.stop_event.wait(self.metrics_interval):
+            telemetry.report(self.totals(), self.quota)
+
+    def _start(self, name: str, target: Callable):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def run(self):
+        # the model (and the inference replicas, which are forked) first, before any other thread
+        self.sentiment_worker = self._load_sentiment_worker()
+
+        self._start("sentiment", self._sentiment_stage)
+        self._start("post-scheduler", self._schedule_posts)
+        for i in range(self.counters["ingestion"].workers):
+            self._start(f"ingestion-{i}", lambda i=i: self._ingestion_worker(i))
+        for i in range(self.counters["comments"].workers):
+            self._start(f"comments-{i}", self._comment_worker)
+        print(f"Pipeline started: {self.counters['ingestion'].workers} ingestion workers, "
+              f"{self.counters['comments'].workers} comment workers, sentiment worker")
+
+        telemetry = PipelineTelemetry(self.db_manager, "orchestrator")
+        self._start("telemetry", lambda: self._report_metrics(telemetry))
+
+        while not self.stop_event.is_set():
+            self.stop_event.wait(1.0)
+        for thread in self.threads:
+            thread.join()
+        telemetry.report(self.totals(), self.quota)
+        telemetry.finish("stopped")
+        print("Pipeline stopped.")
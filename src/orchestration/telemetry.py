@@ -0,0 +1,76 @@
+from datetime import datetime
+from typing import Optional
+
+
+class PipelineTelemetry:
+    """
+    Records a pipeline_run and, at every report(), one stage_metric row per stage with what
+    the stage did since the previous report plus the current backlogs.
+    Telemetry is best effort: database errors are printed, never raised into the pipeline.
+    """
+
+    def __init__(self, db_manager, name: str):
+        self.db_manager = db_manager
+        self.run_id: Optional[int] = None
+        try:
+            self.run_id = db_manager.start_pipeline_run(name)
+        except Exception as e:
+            print(f"Could not record the pipeline run: {e}")
+        self.window_start = datetime.utcnow()
+        self.last_totals: dict[str, dict] = {}
+        self.last_usage: dict[tuple, dict] = {}
+
+    def report(self, totals: dict[str, dict], quota=None):
+        """
+        totals: running totals per stage, with the rows_processed, api_calls and errors keys
+        quota: the RedditQuota of the ingestors, its requests per operation are recorded in api_usage
+        """
+        if self.run_id is None:
+            return
+        now = datetime.utcnow()
+        usage_totals = quota.usage_totals() if quota is not None else {}
+        try:
+            backlog = self.db_manager.get_backlog_sizes()
+            metrics = []
+            for stage, counters in totals.items():
+                previous = self.last_totals.get(stage, {})
+                metrics.append({
+                    "stage": stage,
+                    "started_datetime": self.window_start,
+                    "ended_datetime": now,
+                    **{key: value - previous.get(key, 0) for key, value in counters.items()},
+                    **backlog,
+                })
+            self.db_manager.save_stage_metrics(self.run_id, metrics)
+
+            usage = []
+            for (operation, subreddit), counters in usage_totals.items():
+                previous = self.last_usage.get((operation, subreddit), {})
+                requests = counters["requests"] - previous.get("requests", 0)
+                if requests == 0:
+                    continue
+                usage.append({
+                    "operation": operation,
+                    "subreddit_name": subreddit,
+                    "started_datetime": self.window_start,
+                    "ended_datetime": now,
+                    "requests": requests,
+                    "items": counters["items"] - previous.get("items", 0),
+                    "ratelimit_remaining": quota.remaining,
+                    "ratelimit_used": quota.used,
+                })
+            self.db_manager.save_api_usage(self.run_id, usage)
+        except Exception as e:
+            print(f"Could not record the stage metrics: {e}")
+            return
+        self.last_totals.update({stage: dict(counters) for stage, counters in totals.items()})
+        self.last_usage = usage_totals
+        self.window_start = now
+
+    def finish(self, status: str = "completed"):
+        if self.run_id is None:
+            return
+        try:
+            self.db_manager.finish_pipeline_run(self.run_id, status)
+        except Exception as e:
+            print(f"Could not record the end of the pipeline run: {e}")
@@ -1,11 +1,14 @@
 import time
 from reddit_ingestion.reddit_ingestion import RedditIngestor
+from reddit_ingestion.lease_worker import LeasedIngestionWorker
 from reddit_db.db_manager import RedditDBManager
+from orchestration.telemetry import PipelineTelemetry
 from dotenv import load_dotenv
 import os
 
 db_manager = RedditDBManager()
 ingestor = RedditIngestor()
+telemetry = PipelineTelemetry(db_manager, "fetch_data")
 
 load_dotenv()
 data_dir = os.getenv("DATA_DIR")
@@ -14,19 +17,31 @@ print(f"Data directory: {data_dir}")
 top_subreddits = db_manager.get_highest_priority_subreddits()
 print(f"Subreddit with highest priority: {top_subreddits}")
 start_time = time.time()
-for subreddit in top_subreddits:
-    print(f"Fetching data for subreddit: {subreddit}")
-    ingestor.fetch_posts(subreddit)
+# subreddits are leased, so fetch_data.py and the ingestion workers running elsewhere never fetch the same one
+worker = LeasedIngestionWorker(db_manager, ingestor)
+refetch_seconds = worker.refetch_seconds
+while top_subreddits:
+    # the subreddits fetched since the start of this run are never claimed again, however long it takes
+    worker.refetch_seconds = max(refetch_seconds, int(time.time() - start_time) + 1)
+    subreddit = worker.ingest_one()
+    # nothing left to claim (the rest is leased by other workers), or the priorities changed meanwhile
+    if subreddit is None or subreddit not in top_subreddits:
+        break
+    top_subreddits.remove(subreddit)
 elapsed = time.time() - start_time
 print(f"Completed fetching posts for subreddits in {elapsed:.2f} seconds")
+telemetry.report({"ingestion": {"rows_processed": ingestor.posts_added, "api_calls": ingestor.api_calls, "errors": worker.errors}}, ingestor.quota)
+api_calls = ingestor.api_calls
 
 posts_to_fetch = db_manager.get_posts_without_comments()
 print(f"Number of posts without comments: {len(posts_to_fetch)}")
 start_time = time.time()
 for post in posts_to_fetch:
+    ingestor.quota.wait_for_budget()
     print(f"Fetching comments for post: {post}")
     ingestor.extract_comments_from_post(post)
 
 elapsed = time.time() - start_time
 print(f"Completed fetching comments for posts in {elapsed:.2f} seconds")
-elapsed = time.time() - start_time
+telemetry.report({"comments": {"rows_processed": ingestor.comments_added, "api_calls": ingestor.api_calls - api_calls, "errors": 0}}, ingestor.quota)
+telemetry.finish()
@@ -0,0 +1,51 @@
+"""
+Standalone ingestion worker: fetches the new posts of the highest priority subreddits,
+sharing them with every other ingestion worker through the subreddit_lease table.
+Run as many as needed (e.g. `docker compose up --scale ingestion=4`), each subreddit is
+fetched by one worker at a time and at most every INGESTION_INTERVAL seconds.
+
+    python src/pipelines/ingestion_worker.py
+
+Every METRICS_INTERVAL seconds it records its posts, Reddit API requests per operation and
+the budget left, like the orchestrator.
+
+SIGTERM / SIGINT stop the worker once the current subreddit has been fetched.
+"""
+import os
+import signal
+import threading
+
+from dotenv import load_dotenv
+
+from orchestration.telemetry import PipelineTelemetry
+from reddit_db.db_manager import RedditDBManager
+from reddit_ingestion.lease_worker import LeasedIngestionWorker
+from reddit_ingestion.reddit_ingestion import RedditIngestor
+
+load_dotenv()
+
+if __name__ == "__main__":
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    db_manager = RedditDBManager()
+    db_manager.init_schema()
+    worker = LeasedIngestionWorker(db_manager, RedditIngestor())
+    telemetry = PipelineTelemetry(db_manager, "ingestion_worker")
+    metrics_interval = float(os.getenv("METRICS_INTERVAL", "60"))
+
+    def totals() -> dict[str, dict]:
+        ingestor = worker.ingestor
+        return {"ingestion": {"rows_processed": ingestor.posts_added, "api_calls": ingestor.api_calls, "errors": worker.errors}}
+
+    def report_metrics():
+        while not stop_event.wait(metrics_interval):
+            telemetry.report(totals(), worker.ingestor.quota)
+
+    threading.Thread(target=report_metrics, name="telemetry", daemon=True).start()
+    print(f"Ingestion worker {worker.worker_id} started")
+    worker.run(stop_event)
+    telemetry.report(totals(), worker.ingestor.quota)
+    telemetry.finish("stopped")
+    print(f"Ingestion worker {worker.worker_id} stopped after {worker.fetched} subreddits ({worker.errors} errors)")
@@ -1,5 +1,5 @@
 from reddit_db.db_manager import RedditDBManager
-from reddit_db.models import Post, Comment
+from reddit_db.bulk_loader import BulkLoader
 import os
 from dotenv import load_dotenv
 from pathlib import Path
@@ -7,19 +7,17 @@ from pathlib import Path
 load_dotenv()
 base_dir = os.getenv("DATA_DIR")
 base_dir = Path(base_dir)
-posts_dir = base_dir / "processed" / "posts"
-comments_dir = base_dir / "processed" / "comments"
-
-post_files = [f for f in posts_dir.glob("*.csv")]
-comment_files = [f for f in comments_dir.glob("*.csv")]
+processed_dir = base_dir / "processed"
 
 manager = RedditDBManager()
 
-for post_file in post_files:
-    manager.load_from_csv(post_file, Post)
-
-for comment_file in comment_files:
-    manager.load_from_csv(comment_file, Comment)
+# COPY into staging tables + upsert, resumes from the checkpoint if a previous load was interrupted
+loader = BulkLoader(manager, checkpoint_path=processed_dir / "manifests" / "db_load.json")
+for kind, stats in loader.load(processed_dir).items():
+    print(f"Loaded {stats['rows']} {kind} from {stats['files']} files in {stats['seconds']:.2f} seconds "
+          f"({stats['rows_per_sec']:.0f} rows/s, {stats['upserted']} inserted or updated)")
+    if stats.get("orphans"):
+        print(f"{stats['orphans']} comments are waiting for their post in comment_orphan")
 
 raw_posts_dir = base_dir / "raw" / "posts"
 raw_comments_dir = base_dir / "raw" / "comments"
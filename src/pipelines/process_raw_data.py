@@ -1,4 +1,4 @@
-from spark_processing.spark_processing import SparkProcessor
+from spark_processing.engine import select_processor
 from dotenv import load_dotenv
 import os
 from pathlib import Path
@@ -6,12 +6,14 @@ from pathlib import Path
 load_dotenv()
 data_path = Path(os.getenv("DATA_DIR"))
 
-hadoop_home = r"C:\hadoop"
+# only the raw files not in the manifests are processed, and appended to the output
+incremental = os.getenv("SPARK_INCREMENTAL", "true").lower() == "true"
 
-sp = SparkProcessor(data_path=data_path, hadoop_home=hadoop_home)
+# small batches run in-process with pandas, Spark is only started for large inputs (PROCESSING_ENGINE)
+sp = select_processor(data_path, incremental=incremental)
 saved_folder = sp.process_and_save_posts()
 saved_folder_comments = sp.process_and_save_comments()
 
 print("Processing completed! Check the files in:", saved_folder)
 
-sp.spark.stop()
+sp.stop()
@@ -0,0 +1,83 @@
+"""
+Score the stored comments with a registered model version, without touching the active scores.
+
+    # trial a cheaper model on two subreddits and keep scoring their new comments
+    python src/pipelines/sentiment_backfill.py distilbert-student-v1 --subreddits python datascience --follow
+
+    # backfill every comment, compare with the active version and switch over
+    python src/pipelines/sentiment_backfill.py distilbert-student-v1 --activate
+
+Runs alongside the sentiment worker; it is resumable, since it only claims comments the
+version has not scored yet.
+"""
+import argparse
+import signal
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from reddit_db.db_manager import RedditDBManager
+from sentiment_model.labeler import SentimentLabeler
+from sentiment_model.registry import MODEL_REGISTRY, get_model_spec
+from sentiment_model.sentiment_model import SentimentModel
+from sentiment_model.staged_pipeline import StagedSentimentPipeline
+
+load_dotenv()
+
+# activation retries when comments were labeled by the active version during the backfill
+MAX_ACTIVATION_ATTEMPTS = 5
+
+parser = argparse.ArgumentParser(description="Backfill the scores of a sentiment model version")
+parser.add_argument("model_version", choices=list(MODEL_REGISTRY))
+parser.add_argument("--subreddits", nargs="+", help="only score these subreddits (trial)")
+parser.add_argument("--follow", action="store_true", help="keep scoring new comments until stopped")
+parser.add_argument("--activate", action="store_true", help="make the version active once the backfill is complete")
+args = parser.parse_args()
+
+db_manager = RedditDBManager()
+active_version = db_manager.get_active_model_version()
+db_manager.register_model_version(args.model_version, get_model_spec(args.model_version)["hf_model"])
+if args.subreddits:
+    db_manager.add_model_trial(args.model_version, args.subreddits)
+
+labeler = SentimentLabeler(
+    db_manager,
+    model=SentimentModel(model_version=args.model_version),
+    backfill=True,
+    subreddits=args.subreddits
+)
+pipeline = StagedSentimentPipeline(labeler, claim_size=512)
+
+stop_event = threading.Event()
+signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+start_time = time.time()
+pipeline.run(stop_event, idle_wait=(lambda: stop_event.wait(30)) if args.follow else None)
+elapsed = time.time() - start_time
+print(pipeline.report())
+print(f"Backfilled {labeler.processed} comments with {args.model_version} in {elapsed:.2f} seconds "
+      f"({labeler.processed / elapsed if elapsed else 0:.1f} comments/s, "
+      f"model {labeler.cache.misses / labeler.inference_seconds if labeler.inference_seconds else 0:.1f} comments/s)")
+
+if active_version is not None and active_version != args.model_version:
+    subreddits = args.subreddits or [None]
+    for subreddit in subreddits:
+        print(db_manager.compare_model_versions(active_version, args.model_version, subreddit=subreddit))
+
+if args.activate and not stop_event.is_set():
+    for attempt in range(1, MAX_ACTIVATION_ATTEMPTS + 1):
+        try:
+            db_manager.activate_model_version(args.model_version)
+            print(f"{args.model_version} is now the active model version, the sentiment worker will reload it.")
+            break
+        except ValueError as e:
+            # comments labeled by the active version while the backfill ran: score them too and retry
+            print(f"Cannot activate yet ({e}), backfilling them (attempt {attempt}/{MAX_ACTIVATION_ATTEMPTS})...")
+            labeler.subreddits = None # activation needs every labeled comment, not only the trial ones
+            StagedSentimentPipeline(labeler, claim_size=512).run(stop_event)
+            if stop_event.is_set():
+                break
+    else:
+        raise SystemExit(f"{args.model_version} was not activated: new comments keep arriving, run --activate again")
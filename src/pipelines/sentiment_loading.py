@@ -1,30 +1,30 @@
 from reddit_db.db_manager import RedditDBManager
-from sentiment_model.sentiment_model import SentimentModel
+from sentiment_model.labeler import SentimentLabeler
+from sentiment_model.staged_pipeline import StagedSentimentPipeline
+from orchestration.telemetry import PipelineTelemetry
+from dotenv import load_dotenv
 import time
 
+load_dotenv()
+
 db_manager = RedditDBManager()
-model = SentimentModel()
+labeler = SentimentLabeler(db_manager)
+telemetry = PipelineTelemetry(db_manager, "sentiment_loading")
 
-db_batch_size = 128
-model_batch_size = model.batch_size
-comments_to_process = db_manager.get_unlabeled_comments(limit=512)
-print(f"Found {len(comments_to_process)} comments to process...")
+# fetch, tokenization, inference and write-back overlap until the backlog is drained
+pipeline = StagedSentimentPipeline(labeler, claim_size=512)
 
 start_time = time.time()
-temp_predictions = []
-for i in range(0, len(comments_to_process), model_batch_size):
-    batch = comments_to_process[i:i + model_batch_size]
-    preds = model.predict(batch)
-    temp_predictions.extend(preds)
-
-    if len(temp_predictions) >= db_batch_size:
-        db_manager.update_comments_with_sentiment(temp_predictions)
-        print(f"Loaded {len(temp_predictions)} predictions to the database...")
-        temp_predictions = []
-
-if temp_predictions:
-    db_manager.update_comments_with_sentiment(temp_predictions)
-    print(f"Loaded remaining {len(temp_predictions)} predictions to the database...")
-
+try:
+    pipeline.run()
+except Exception:
+    telemetry.report({"sentiment": {"rows_processed": labeler.processed, "api_calls": 0, "errors": 1}})
+    telemetry.finish("failed")
+    raise
 elapsed = time.time() - start_time
-print(f"Completed sentiment analysis in {elapsed:.2f} seconds.")
+telemetry.report({"sentiment": {"rows_processed": labeler.processed, "api_calls": 0, "errors": 0}})
+telemetry.finish()
+print(pipeline.report())
+print(f"Prefilter {labeler.prefilter.summary()}")
+print(f"Cache hit rate {labeler.cache.hit_rate:.1%}")
+print(f"Completed sentiment analysis of {labeler.processed} comments in {elapsed:.2f} seconds.")
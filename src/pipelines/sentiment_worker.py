@@ -0,0 +1,43 @@
+"""
+Long-running sentiment worker: loads the model once and keeps draining the unlabeled
+comments backlog, backing off while there is nothing to do.
+
+    python src/pipelines/sentiment_worker.py
+
+GET http://localhost:$SENTIMENT_WORKER_PORT/health returns the worker status and throughput.
+SIGTERM / SIGINT stop the worker once the batches already claimed have been written.
+"""
+import os
+import signal
+import sys
+
+from dotenv import load_dotenv
+
+from reddit_db.db_manager import RedditDBManager
+from sentiment_model.inference_pool import InferencePool
+from sentiment_model.labeler import SentimentLabeler, active_sentiment_model
+from sentiment_model.worker import RESTART_EXIT_CODE, SentimentWorker, serve_health
+
+load_dotenv()
+
+if __name__ == "__main__":
+    db_manager = RedditDBManager()
+    db_manager.init_schema()
+    model = active_sentiment_model(db_manager)
+    if int(os.getenv("SENTIMENT_REPLICAS", "1")) > 1:
+        # replicas are forked now, before the parent runs any inference
+        model = InferencePool(model)
+        print(f"Inference pool: {model.n_replicas} replicas x {model.threads_per_replica} threads")
+    worker = SentimentWorker(SentimentLabeler(db_manager, model=model))
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+
+    health_port = int(os.getenv("SENTIMENT_WORKER_PORT", "8001"))
+    server = serve_health(worker, health_port)
+    print(f"Sentiment worker started, health endpoint on port {health_port}")
+    worker.run()
+    server.shutdown()
+    if isinstance(model, InferencePool):
+        model.close()
+    if worker.restart_required:
+        sys.exit(RESTART_EXIT_CODE)
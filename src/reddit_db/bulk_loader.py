@@ -0,0 +1,274 @@
+import io
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterator
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# processed column -> table column, in the staging table order
+POST_COLUMNS = {
+    "post_id": "post_id",
+    "title": "title",
+    "author": "author",
+    "score": "score",
+    "created_utc": "created_utc",
+    "created_ts": "created_datetime",
+    "fetch_type": "fetch_type",
+    "subreddit": "subreddit_name",
+}
+COMMENT_COLUMNS = {
+    "comment_id": "comment_id",
+    "post_id": "post_id",
+    "author": "author",
+    "body": "body",
+    "score": "score",
+    "created_utc": "created_utc",
+    "created_ts": "created_datetime",
+}
+
+POST_STAGING = """
+CREATE TEMP TABLE post_staging (
+    post_id text, title text, author text, score bigint, created_utc bigint,
+    created_datetime timestamp, fetch_type text, subreddit_name text
+) ON COMMIT DROP
+"""
+COMMENT_STAGING = """
+CREATE TEMP TABLE comment_staging (
+    comment_id text, post_id text, author text, body text, score bigint, created_utc bigint,
+    created_datetime timestamp
+) ON COMMIT DROP
+"""
+
+# Set-based upserts from the staging tables. Rows already in the table are only rewritten
+# when their score changed, so loading the same chunk twice is a no-op.
+POST_UPSERT = """
+INSERT INTO subreddit (name, priority)
+SELECT DISTINCT subreddit_name, 0 FROM post_staging WHERE subreddit_name IS NOT NULL
+ON CONFLICT (name) DO NOTHING;
+
+INSERT INTO post (post_id, title, author, score, created_utc, created_datetime, fetch_type, subreddit_name)
+SELECT DISTINCT ON (post_id)
+    post_id, COALESCE(title, ''), COALESCE(author, ''), COALESCE(score, 0), created_utc, created_datetime,
+    COALESCE(fetch_type, ''), subreddit_name
+FROM post_staging
+WHERE post_id IS NOT NULL AND subreddit_name IS NOT NULL AND created_utc IS NOT NULL
+ORDER BY post_id
+ON CONFLICT (post_id) DO UPDATE SET score = EXCLUDED.score
+WHERE post.score IS DISTINCT FROM EXCLUDED.score
+"""
+# Comments whose post is not in the database yet are kept here, not dropped, and moved into
+# comment by the next load that finds their post.
+COMMENT_ORPHAN = """
+CREATE TABLE IF NOT EXISTS comment_orphan (
+    comment_id text PRIMARY KEY, post_id text, author text, body text, score bigint, created_utc bigint,
+    created_datetime timestamp
+)
+"""
+COMMENT_UPSERT = """
+INSERT INTO comment_orphan (comment_id, post_id, author, body, score, created_utc, created_datetime)
+SELECT DISTINCT ON (s.comment_id)
+    s.comment_id, s.post_id, s.author, s.body, s.score, s.created_utc, s.created_datetime
+FROM comment_staging s
+WHERE s.comment_id IS NOT NULL AND s.created_utc IS NOT NULL
+    AND NOT EXISTS (SELECT 1 FROM post p WHERE p.post_id = s.post_id)
+ORDER BY s.comment_id
+ON CONFLICT (comment_id) DO UPDATE SET score = EXCLUDED.score;
+
+INSERT INTO comment (comment_id, post_id, author, body, score, created_utc, created_datetime)
+SELECT DISTINCT ON (s.comment_id)
+    s.comment_id, s.post_id, COALESCE(s.author, ''), COALESCE(s.body, ''), COALESCE(s.score, 0),
+    s.created_utc, s.created_datetime
+FROM comment_staging s
+JOIN post p ON p.post_id = s.post_id
+WHERE s.comment_id IS NOT NULL AND s.created_utc IS NOT NULL
+ORDER BY s.comment_id
+ON CONFLICT (comment_id) DO UPDATE SET score = EXCLUDED.score
+WHERE comment.score IS DISTINCT FROM EXCLUDED.score
+"""
+ORPHAN_RETRY = """
+WITH adopted AS (
+    DELETE FROM comment_orphan o USING post p WHERE p.post_id = o.post_id RETURNING o.*
+)
+INSERT INTO comment (comment_id, post_id, author, body, score, created_utc, created_datetime)
+SELECT comment_id, post_id, COALESCE(author, ''), COALESCE(body, ''), COALESCE(score, 0), created_utc, created_datetime
+FROM adopted
+ON CONFLICT (comment_id) DO UPDATE SET score = EXCLUDED.score
+WHERE comment.score IS DISTINCT FROM EXCLUDED.score
+"""
+
+
+class LoadCheckpoint:
+    """
+    JSON record of how many chunks of each processed file are in the database, saved after
+    every committed chunk. A run restarts from the first chunk not loaded yet; a file whose
+    size or mtime changed is loaded again from the start.
+    """
+
+    def __init__(self, checkpoint_path: Path):
+        self.checkpoint_path = Path(checkpoint_path)
+        self.entries: dict[str, dict] = {}
+        if self.checkpoint_path.exists():
+            self.entries = json.loads(self.checkpoint_path.read_text())
+
+    def _describe(self, path: Path) -> dict:
+        stat = Path(path).stat()
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def progress(self, path: Path) -> dict:
+        info = self._describe(path)
+        entry = self.entries.get(str(path))
+        if entry and entry["size"] == info["size"] and entry["mtime"] == info["mtime"]:
+            return entry
+        return {**info, "chunks": 0, "complete": False}
+
+    def save(self, path: Path, chunks: int, complete: bool = False):
+        self.entries[str(path)] = {**self._describe(path), "chunks": chunks, "complete": complete}
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.entries, indent=2))
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+class BulkLoader:
+    """
+    Load the processed posts and comments (partitioned Parquet or CSV) into Postgres.
+
+    Each chunk of chunk_rows rows is streamed with COPY FROM STDIN into a temporary staging
+    table and upserted into post / comment with one INSERT ... SELECT ... ON CONFLICT, in its
+    own transaction. The checkpoint makes the load resumable, the upserts make it idempotent.
+    Comments whose post is not in the database are parked in comment_orphan and loaded by
+    a later run, once their post is there.
+    """
+
+    def __init__(self, db_manager, checkpoint_path: Path, chunk_rows: int = 50_000):
+        self.db_manager = db_manager
+        self.checkpoint = LoadCheckpoint(checkpoint_path)
+        self.chunk_rows = chunk_rows
+
+    def _chunks(self, path: Path, columns: dict, partition_values: dict) -> Iterator[pa.Table]:
+        if path.suffix == ".csv":
+            # the Spark and pandas CSV output has quoted newlines in the text columns
+            reader = pa_csv.open_csv(
+                path,
+                read_options=pa_csv.ReadOptions(block_size=1 << 24),
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            )
+            batches = iter(reader)
+        else:
+            batches = pq.ParquetFile(path).iter_batches(batch_size=self.chunk_rows)
+
+        pending = []
+        pending_rows = 0
+        for batch in batches:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows >= self.chunk_rows:
+                yield self._to_staging(pa.Table.from_batches(pending), columns, partition_values)
+                pending, pending_rows = [], 0
+        if pending:
+            yield self._to_staging(pa.Table.from_batches(pending), columns, partition_values)
+
+    @staticmethod
+    def _to_staging(table: pa.Table, columns: dict, partition_values: dict) -> pa.Table:
+        """Select the staging columns, filling the ones encoded in the partition directories"""
+        arrays = []
+        for source in columns:
+            if source in table.column_names:
+                arrays.append(table.column(source))
+            else:
+                arrays.append(pa.array([partition_values.get(source)] * table.num_rows, type=pa.string()))
+        return pa.Table.from_arrays(arrays, names=list(columns.values()))
+
+    @staticmethod
+    def _files(output_dir: Path) -> list[tuple[Path, dict]]:
+        """Processed files with the values of their hive partition directories"""
+        files = sorted(output_dir.rglob("*.parquet")) or sorted(output_dir.rglob("*.csv"))
+        result = []
+        for path in files:
+            partition_values = {}
+            for part in path.relative_to(output_dir).parent.parts:
+                key, _, value = part.partition("=")
+                partition_values[key] = None if value == "__HIVE_DEFAULT_PARTITION__" else value
+            result.append((path, partition_values))
+        return result
+
+    def _copy_chunk(self, cursor, staging_table: str, staging_ddl: str, upsert: str, table: pa.Table) -> int:
+        buffer = io.BytesIO()
+        pa_csv.write_csv(table, buffer, write_options=pa_csv.WriteOptions(include_header=False))
+        buffer.seek(0)
+        cursor.execute(staging_ddl)
+        cursor.copy_expert(f"COPY {staging_table} ({', '.join(table.column_names)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(upsert)
+        return cursor.rowcount
+
+    def _retry_orphans(self, connection) -> int:
+        """Move the parked comments whose post was loaded since into comment"""
+        with connection.cursor() as cursor:
+            cursor.execute(COMMENT_ORPHAN)
+            cursor.execute(ORPHAN_RETRY)
+            adopted = max(cursor.rowcount, 0)
+        connection.commit()
+        if adopted:
+            print(f"Loaded {adopted} comments whose post arrived after them")
+        return adopted
+
+    def load_dir(self, output_dir: Path, kind: str) -> dict:
+        """Load every processed file of kind "posts" or "comments", return the load stats"""
+        columns, staging_table, staging_ddl, upsert = {
+            "posts": (POST_COLUMNS, "post_staging", POST_STAGING, POST_UPSERT),
+            "comments": (COMMENT_COLUMNS, "comment_staging", COMMENT_STAGING, COMMENT_UPSERT),
+        }[kind]
+        stats = {"files": 0, "rows": 0, "upserted": 0, "seconds": 0.0}
+        start_time = time.perf_counter()
+
+        connection = self.db_manager.engine.raw_connection()
+        try:
+            if kind == "comments":
+                stats["upserted"] += self._retry_orphans(connection)
+            for path, partition_values in self._files(Path(output_dir)):
+                progress = self.checkpoint.progress(path)
+                if progress["complete"]:
+                    continue
+                chunk_index = 0
+                for table in self._chunks(path, columns, partition_values):
+                    chunk_index += 1
+                    if chunk_index <= progress["chunks"]:
+                        continue
+                    chunk_start = time.perf_counter()
+                    with connection.cursor() as cursor:
+                        upserted = self._copy_chunk(cursor, staging_table, staging_ddl, upsert, table)
+                    connection.commit()
+                    self.checkpoint.save(path, chunk_index)
+
+                    stats["rows"] += table.num_rows
+                    stats["upserted"] += max(upserted, 0)
+                    elapsed = time.perf_counter() - chunk_start
+                    print(f"Loaded {table.num_rows} {kind} from {path.name} chunk {chunk_index} "
+                          f"({table.num_rows / elapsed if elapsed else 0:.0f} rows/s)")
+                self.checkpoint.save(path, chunk_index, complete=True)
+                stats["files"] += 1
+            if kind == "comments":
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT count(*) FROM comment_orphan")
+                    stats["orphans"] = cursor.fetchone()[0]
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+        stats["seconds"] = time.perf_counter() - start_time
+        stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+        return stats
+
+    def load(self, processed_dir: Path) -> dict:
+        """Load posts, then comments (which reference them)"""
+        processed_dir = Path(processed_dir)
+        return {
+            "posts": self.load_dir(processed_dir / "posts", "posts"),
+            "comments": self.load_dir(processed_dir / "comments", "comments"),
+        }
@@ -1,20 +1,53 @@
-import pandas as pd
-import numpy as np
-from .models import Post, Comment, Subreddit 
+from .downsampling import TREND_SERIES, downsample_rows
+from .models import (
+    Post, Comment, Subreddit, CachedSentiment, SentimentModelVersion, SentimentTrial, CommentSentiment,
+    PipelineRun, StageMetric, ApiUsage, SubredditLease, SENTIMENT_LABELS
+)
 from sqlmodel import SQLModel, Session, create_engine, select, inspect
 import os
+import threading
 from dotenv import load_dotenv, dotenv_values
-from sqlalchemy import func, case
+from sqlalchemy import func, case, update, literal
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert
 from typing import Dict, Optional, List
 from datetime import datetime, timedelta, timezone
 
 load_dotenv(".env")
 
+# trend granularity -> date_trunc unit (and key of the rows), default range in days
+TREND_FREQUENCIES = {"hourly": ("hour", 4), "daily": ("day", 30), "weekly": ("week", 90), "monthly": ("month", 365)}
+
 
 class RedditDBManager:
-    def __init__(self, db_url=os.getenv("DATABASE_URL")):
-        self.engine = create_engine(db_url)
-        SQLModel.metadata.create_all(bind=self.engine)
+    """
+    The engine is only created on first use, and the tables are created (if missing) at the
+    same time unless create_schema is False, so importing a module that builds a manager
+    does not connect to the database. init_schema() does it up front, to fail fast.
+    """
+
+    def __init__(self, db_url=os.getenv("DATABASE_URL"), create_schema: bool = True):
+        self.db_url = db_url
+        self.create_schema = create_schema
+        self._engine = None
+        self._engine_lock = threading.Lock()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._engine_lock:
+                if self._engine is None:
+                    engine = create_engine(self.db_url)
+                    if self.create_schema:
+                        SQLModel.metadata.create_all(bind=engine)
+                    self._engine = engine
+        return self._engine
+
+    def init_schema(self):
+        """Connect and create the missing tables now rather than on first use."""
+        engine = self.engine
+        if not self.create_schema:
+            SQLModel.metadata.create_all(bind=engine)
 
     def reset_database(self):
         """Delete all data in the database and recreate tables."""
@@ -32,6 +65,24 @@ class RedditDBManager:
             results = session.exec(stmt).all()
             return dict(results)
 
+    def count_posts(self, subreddit: Optional[str] = None) -> int:
+        """Return the number of posts, of one subreddit if given."""
+        with Session(self.engine) as session:
+            stmt = select(func.count()).select_from(Post)
+            if subreddit is not None:
+                stmt = stmt.where(Post.subreddit_name == subreddit)
+            return int(session.exec(stmt).one())
+
+    def count_comments(self, subreddit: Optional[str] = None, labeled: Optional[bool] = None) -> int:
+        """Return the number of comments, of one subreddit and with or without a sentiment label if given."""
+        with Session(self.engine) as session:
+            stmt = select(func.count()).select_from(Comment)
+            if subreddit is not None:
+                stmt = stmt.join(Post, Post.post_id == Comment.post_id).where(Post.subreddit_name == subreddit)
+            if labeled is not None:
+                stmt = stmt.where(Comment.pred_label != None if labeled else Comment.pred_label == None)
+            return int(session.exec(stmt).one())
+
     ### Priority related methods ###
     def get_highest_priority_subreddits(self) -> list[str]:
         """Return a list of subreddit names with the highest priority."""
@@ -44,6 +95,75 @@ class RedditDBManager:
             top_subreddits = [sub.name for sub in subreddits if sub.priority == highest_priority]
             return top_subreddits
 
+    ### Ingestion lease related methods ###
+    def claim_subreddit_lease(self, worker_id: str, lease_seconds: int = 300, refetch_seconds: int = 60) -> Optional[str]:
+        """Lease one of the highest priority subreddits to an ingestion worker and return its name.
+        Only subreddits with no live lease, not fetched in the last refetch_seconds, can be claimed,
+        least recently fetched first. The claim is a single upsert whose condition is rechecked on
+        the locked row, so concurrent workers never get the same subreddit. Times are database times."""
+        now = func.now()
+        lease_until = now + timedelta(seconds=lease_seconds)
+        refetch_before = now - timedelta(seconds=refetch_seconds)
+        with Session(self.engine) as session:
+            top_priority = select(func.max(Subreddit.priority)).scalar_subquery()
+            candidates = session.exec(
+                select(Subreddit.name)
+                .outerjoin(SubredditLease, SubredditLease.subreddit_name == Subreddit.name)
+                .where(Subreddit.priority == top_priority)
+                .where((SubredditLease.subreddit_name == None) | (SubredditLease.leased_until < now))
+                .where((SubredditLease.last_fetched_datetime == None) | (SubredditLease.last_fetched_datetime < refetch_before))
+                .order_by(SubredditLease.last_fetched_datetime.asc().nulls_first())
+            ).all()
+
+            for subreddit_name in candidates:
+                stmt = insert(SubredditLease).values(
+                    subreddit_name=subreddit_name, worker_id=worker_id, leased_until=lease_until, heartbeat_datetime=now
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["subreddit_name"],
+                    set_={"worker_id": worker_id, "leased_until": lease_until, "heartbeat_datetime": now},
+                    where=(SubredditLease.leased_until < now) & (
+                        (SubredditLease.last_fetched_datetime == None) | (SubredditLease.last_fetched_datetime < refetch_before)
+                    ),
+                ).returning(SubredditLease.subreddit_name)
+                claimed = session.exec(stmt).first()
+                session.commit()
+                if claimed is not None:
+                    return subreddit_name
+            return None
+
+    def heartbeat_subreddit_lease(self, worker_id: str, subreddit_name: str, lease_seconds: int = 300) -> bool:
+        """Extend a lease, return False if the worker does not hold it anymore (it expired and was claimed again)."""
+        with Session(self.engine) as session:
+            stmt = (
+                update(SubredditLease)
+                .where(SubredditLease.subreddit_name == subreddit_name, SubredditLease.worker_id == worker_id)
+                .values(leased_until=func.now() + timedelta(seconds=lease_seconds), heartbeat_datetime=func.now())
+                .returning(SubredditLease.subreddit_name)
+            )
+            extended = session.exec(stmt).first()
+            session.commit()
+            return extended is not None
+
+    def release_subreddit_lease(self, worker_id: str, subreddit_name: str, fetched: bool = True, retry_seconds: int = 0):
+        """End a lease; a fetched subreddit is not claimed again before refetch_seconds.
+        A failed fetch keeps the lease for retry_seconds more, so it is not retried right away."""
+        values = {"leased_until": func.now() + timedelta(seconds=0 if fetched else retry_seconds)}
+        if fetched:
+            values["last_fetched_datetime"] = func.now()
+        with Session(self.engine) as session:
+            session.exec(
+                update(SubredditLease)
+                .where(SubredditLease.subreddit_name == subreddit_name, SubredditLease.worker_id == worker_id)
+                .values(**values)
+            )
+            session.commit()
+
+    def get_subreddit_leases(self) -> list[dict]:
+        with Session(self.engine) as session:
+            leases = session.exec(select(SubredditLease).order_by(SubredditLease.subreddit_name)).all()
+            return [lease.model_dump() for lease in leases]
+
     def get_subreddits_priorities(self) -> list[dict]:
         """Return a list of dictionaries with subreddit names and their priorities."""
         with Session(self.engine) as session:
@@ -84,10 +204,14 @@ class RedditDBManager:
                 session.add(subreddit)
             session.commit()
     
-    def get_unlabeled_comments(self, limit: int = 512) -> list[dict[str, str]]:
-        """Return a batch of comments where pred_label is None."""
+    def get_unlabeled_comments(self, limit: int = 512, exclude_ids: Optional[set[str]] = None) -> list[dict[str, str]]:
+        """Return a batch of comments where pred_label is None.
+        exclude_ids skips comments already claimed but not written back yet (e.g. in flight in a pipeline)."""
         with Session(self.engine) as session:
-            stmt = select(Comment).where(Comment.pred_label == None).limit(limit)
+            stmt = select(Comment).where(Comment.pred_label == None)
+            if exclude_ids:
+                stmt = stmt.where(Comment.comment_id.not_in(exclude_ids))
+            stmt = stmt.limit(limit)
             comments = session.exec(stmt).all()
             return [{"comment_id": comment.comment_id, "body": comment.body} for comment in comments]
     
@@ -103,13 +227,32 @@ class RedditDBManager:
             )
             return [post_id for post_id in results]
 
-    def update_comments_with_sentiment(self, predictions: list[dict]):
+    def update_comments_with_sentiment(self, predictions: list[dict], model_version: Optional[str] = None):
         """
         Update Comment rows with the output from SentimentModel.
         Each dict in `predictions` must contain:
         comment_id, negative_score, neutral_score, positive_score, pred_label
+        If model_version is given, the scores are also stored in CommentSentiment, in the same transaction,
+        and the Comment rows are only updated if that version is still the active one (a worker may be
+        finishing a batch with the previous model right after a switch-over).
         """
         with Session(self.engine) as session:
+            if model_version is not None:
+                # the share lock on the active version row makes activate_model_version wait for
+                # this transaction, and this one for a running activation
+                active = session.exec(
+                    select(SentimentModelVersion.name).where(SentimentModelVersion.is_active == True)
+                    .with_for_update(read=True)
+                ).first()
+                if active is None:
+                    # an activation committed while this waited: read the new active version
+                    active = session.exec(
+                        select(SentimentModelVersion.name).where(SentimentModelVersion.is_active == True)
+                    ).first()
+                if active != model_version:
+                    self._upsert_comment_sentiments(session, model_version, predictions)
+                    session.commit()
+                    return
             for pred in predictions:
                 comment = session.get(Comment, pred['comment_id'])
                 if comment:
@@ -118,8 +261,316 @@ class RedditDBManager:
                     comment.positive_score = pred['positive_score']
                     comment.pred_label = pred['pred_label']
                     session.add(comment)  # opzionale, ma sicuro
+            if model_version is not None:
+                session.flush()
+                self._upsert_comment_sentiments(session, model_version, predictions)
             session.commit()
-        
+
+    ### Model version related methods ###
+    def _upsert_comment_sentiments(self, session: Session, model_version: str, predictions: list[dict]):
+        if not predictions:
+            return
+        rows = [
+            {
+                "comment_id": pred["comment_id"],
+                "model_version": model_version,
+                "negative_score": pred["negative_score"],
+                "neutral_score": pred["neutral_score"],
+                "positive_score": pred["positive_score"],
+                "pred_label": pred["pred_label"],
+            }
+            for pred in predictions
+        ]
+        stmt = insert(CommentSentiment).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["comment_id", "model_version"],
+            set_={
+                "negative_score": stmt.excluded.negative_score,
+                "neutral_score": stmt.excluded.neutral_score,
+                "positive_score": stmt.excluded.positive_score,
+                "pred_label": stmt.excluded.pred_label,
+            },
+        )
+        session.exec(stmt)
+
+    def save_comment_sentiments(self, model_version: str, predictions: list[dict]):
+        """Store the scores of a model version without touching the Comment rows (backfills and trials)."""
+        with Session(self.engine) as session:
+            self._upsert_comment_sentiments(session, model_version, predictions)
+            session.commit()
+
+    def register_model_version(self, name: str, hf_model: str) -> SentimentModelVersion:
+        """Add a model version if it is not registered yet."""
+        with Session(self.engine) as session:
+            version = session.get(SentimentModelVersion, name)
+            if version is None:
+                version = SentimentModelVersion(name=name, hf_model=hf_model)
+                session.add(version)
+                session.commit()
+                session.refresh(version)
+            return version
+
+    def get_model_versions(self) -> list[dict]:
+        """Return the registered model versions with the number of comments scored by each one."""
+        with Session(self.engine) as session:
+            stmt = (
+                select(SentimentModelVersion, func.count(CommentSentiment.comment_id))
+                .join(CommentSentiment, CommentSentiment.model_version == SentimentModelVersion.name, isouter=True)
+                .group_by(SentimentModelVersion.name)
+            )
+            results = session.exec(stmt).all()
+            trials = session.exec(select(SentimentTrial)).all()
+            return [
+                {
+                    "name": version.name,
+                    "hf_model": version.hf_model,
+                    "is_active": version.is_active,
+                    "activated_datetime": version.activated_datetime,
+                    "scored_comments": count,
+                    "trial_subreddits": [t.subreddit_name for t in trials if t.model_version == version.name],
+                }
+                for version, count in results
+            ]
+
+    def get_active_model_version(self) -> Optional[str]:
+        with Session(self.engine) as session:
+            version = session.exec(select(SentimentModelVersion).where(SentimentModelVersion.is_active == True)).first()
+            return version.name if version else None
+
+    def ensure_active_model_version(self, name: str, hf_model: str) -> str:
+        """
+        Return the active model version. If there is none yet, make `name` the active one:
+        the scores already in Comment are assumed to come from it and are copied to CommentSentiment.
+        """
+        active = self.get_active_model_version()
+        if active is not None:
+            return active
+        self.register_model_version(name, hf_model)
+        with Session(self.engine) as session:
+            seed = select(
+                Comment.comment_id, literal(name), Comment.negative_score, Comment.neutral_score,
+                Comment.positive_score, Comment.pred_label
+            ).where(Comment.pred_label != None)
+            session.exec(
+                insert(CommentSentiment)
+                .from_select(
+                    ["comment_id", "model_version", "negative_score", "neutral_score", "positive_score", "pred_label"],
+                    seed
+                )
+                .on_conflict_do_nothing()
+            )
+            version = session.get(SentimentModelVersion, name)
+            version.is_active = True
+            version.activated_datetime = datetime.now(timezone.utc)
+            session.add(version)
+            session.commit()
+        return name
+
+    def add_model_trial(self, model_version: str, subreddits: list[str]):
+        """Mark the subreddits a model version is being trialled on."""
+        with Session(self.engine) as session:
+            for subreddit in subreddits:
+                if session.get(SentimentTrial, (model_version, subreddit)) is None:
+                    session.add(SentimentTrial(model_version=model_version, subreddit_name=subreddit))
+            session.commit()
+
+    def get_comments_missing_version(
+        self,
+        model_version: str,
+        limit: int = 512,
+        subreddits: Optional[list[str]] = None,
+        exclude_ids: Optional[set[str]] = None
+    ) -> list[dict[str, str]]:
+        """Return a batch of comments not scored by a model version yet, optionally only in some subreddits."""
+        with Session(self.engine) as session:
+            scored = (
+                select(CommentSentiment.comment_id)
+                .where(CommentSentiment.comment_id == Comment.comment_id)
+                .where(CommentSentiment.model_version == model_version)
+            )
+            stmt = select(Comment.comment_id, Comment.body).where(~scored.exists())
+            if subreddits:
+                stmt = stmt.join(Post, Comment.post_id == Post.post_id).where(Post.subreddit_name.in_(subreddits))
+            if exclude_ids:
+                stmt = stmt.where(Comment.comment_id.not_in(exclude_ids))
+            results = session.exec(stmt.limit(limit)).all()
+            return [{"comment_id": comment_id, "body": body} for comment_id, body in results]
+
+    def activate_model_version(self, model_version: str, force: bool = False):
+        """
+        Make a backfilled model version the active one, atomically: its scores are copied into the
+        Comment rows and the active flag is switched in a single transaction, so readers see either
+        the old or the new version, never a mix.
+        Refuses if some labeled comments have no score for this version yet, unless force=True.
+        """
+        with Session(self.engine) as session:
+            # waits for the in-flight update_comments_with_sentiment writes of the current version,
+            # and blocks new ones until the switch-over is committed
+            session.exec(
+                select(SentimentModelVersion.name).where(SentimentModelVersion.is_active == True).with_for_update()
+            ).all()
+            version = session.get(SentimentModelVersion, model_version)
+            if version is None:
+                raise ValueError(f"Model version {model_version} is not registered")
+
+            scored = (
+                select(CommentSentiment.comment_id)
+                .where(CommentSentiment.comment_id == Comment.comment_id)
+                .where(CommentSentiment.model_version == model_version)
+            )
+            missing = session.exec(
+                select(func.count(Comment.comment_id))
+                .where(Comment.pred_label != None)
+                .where(~scored.exists())
+            ).one()
+            if missing and not force:
+                raise ValueError(f"{missing} labeled comments have no {model_version} scores yet, run the backfill first")
+
+            session.exec(
+                update(Comment)
+                .where(Comment.comment_id == CommentSentiment.comment_id)
+                .where(CommentSentiment.model_version == model_version)
+                .values(
+                    negative_score=CommentSentiment.negative_score,
+                    neutral_score=CommentSentiment.neutral_score,
+                    positive_score=CommentSentiment.positive_score,
+                    pred_label=CommentSentiment.pred_label,
+                )
+            )
+            session.exec(update(SentimentModelVersion).values(is_active=False))
+            version.is_active = True
+            version.activated_datetime = datetime.now(timezone.utc)
+            session.add(version)
+            session.exec(SentimentTrial.__table__.delete().where(SentimentTrial.model_version == model_version))
+            session.commit()
+
+    def compare_model_versions(self, baseline: str, candidate: str, subreddit: Optional[str] = None) -> dict:
+        """
+        Compare the scores of two model versions on the comments both have scored.
+        There is no ground truth, so the label agreement with the baseline is the accuracy proxy.
+        """
+        base = aliased(CommentSentiment)
+        cand = aliased(CommentSentiment)
+        with Session(self.engine) as session:
+            q = (
+                session.query(
+                    func.count(base.comment_id),
+                    func.sum(case((base.pred_label == cand.pred_label, 1), else_=0)),
+                    func.avg(func.abs(base.positive_score - cand.positive_score)),
+                    func.avg(func.abs(base.neutral_score - cand.neutral_score)),
+                    func.avg(func.abs(base.negative_score - cand.negative_score)),
+                )
+                .join(cand, base.comment_id == cand.comment_id)
+                .filter(base.model_version == baseline)
+                .filter(cand.model_version == candidate)
+                .filter(base.pred_label.in_(SENTIMENT_LABELS))
+                .filter(cand.pred_label.in_(SENTIMENT_LABELS))
+            )
+            if subreddit is not None:
+                q = (
+                    q.join(Comment, Comment.comment_id == base.comment_id)
+                    .join(Post, Comment.post_id == Post.post_id)
+                    .filter(Post.subreddit_name == subreddit)
+                )
+            count, agreeing, delta_pos, delta_neu, delta_neg = q.one()
+            return {
+                "baseline": baseline,
+                "candidate": candidate,
+                "subreddit": subreddit,
+                "compared_comments": count,
+                "label_agreement": agreeing / count if count else None,
+                "mean_abs_delta_positive": float(delta_pos) if delta_pos is not None else None,
+                "mean_abs_delta_neutral": float(delta_neu) if delta_neu is not None else None,
+                "mean_abs_delta_negative": float(delta_neg) if delta_neg is not None else None,
+            }
+
+    ### Inference cache related methods ###
+    def get_cached_sentiment(self, model_id: str, text_hashes: list[str]) -> dict[str, tuple[float, float, float]]:
+        """Return the cached (negative, neutral, positive) scores of the given text hashes for a model."""
+        if not text_hashes:
+            return {}
+        with Session(self.engine) as session:
+            stmt = (
+                select(CachedSentiment)
+                .where(CachedSentiment.model_id == model_id)
+                .where(CachedSentiment.text_hash.in_(text_hashes))
+            )
+            rows = session.exec(stmt).all()
+            return {
+                row.text_hash: (row.negative_score, row.neutral_score, row.positive_score)
+                for row in rows
+            }
+
+    def save_cached_sentiment(self, model_id: str, scores: dict[str, tuple[float, float, float]]):
+        """Store (negative, neutral, positive) scores by text hash, keeping existing entries."""
+        if not scores:
+            return
+        rows = [
+            {
+                "text_hash": text_hash,
+                "model_id": model_id,
+                "negative_score": negative,
+                "neutral_score": neutral,
+                "positive_score": positive,
+            }
+            for text_hash, (negative, neutral, positive) in scores.items()
+        ]
+        with Session(self.engine) as session:
+            session.exec(insert(CachedSentiment).values(rows).on_conflict_do_nothing())
+            session.commit()
+
+    def get_sentiment_deltas(self, comment_ids: list[str]) -> list[dict]:
+        """
+        Return per-subreddit deltas for a batch of freshly labeled comments.
+        Used to push live updates to the dashboard after update_comments_with_sentiment.
+
+        Output: List of dicts, one per subreddit, each dict contains:
+        - subreddit
+        - label_counts (dict pred_label -> number of new comments)
+        - buckets (list of hourly buckets with hour, n_comments, sum_positive, sum_neutral, sum_negative)
+        """
+        if not comment_ids:
+            return []
+
+        with Session(self.engine) as session:
+            hour = func.date_trunc("hour", Comment.created_datetime)
+            q = (
+                session.query(
+                    Post.subreddit_name,
+                    hour.label("hour"),
+                    Comment.pred_label,
+                    func.count(Comment.comment_id),
+                    func.sum(Comment.positive_score),
+                    func.sum(Comment.neutral_score),
+                    func.sum(Comment.negative_score),
+                )
+                .join(Post, Comment.post_id == Post.post_id)
+                .filter(Comment.comment_id.in_(comment_ids))
+                .filter(Comment.pred_label.in_(SENTIMENT_LABELS))
+                .group_by(Post.subreddit_name, hour, Comment.pred_label)
+            )
+            results = session.exec(q).all()
+
+        deltas = {}
+        for subreddit, bucket_hour, label, count, sum_pos, sum_neu, sum_neg in results:
+            delta = deltas.setdefault(subreddit, {"subreddit": subreddit, "label_counts": {}, "buckets": {}})
+            delta["label_counts"][label] = delta["label_counts"].get(label, 0) + int(count)
+            bucket = delta["buckets"].setdefault(str(bucket_hour), {
+                "hour": str(bucket_hour),
+                "n_comments": 0,
+                "sum_positive": 0.0,
+                "sum_neutral": 0.0,
+                "sum_negative": 0.0,
+            })
+            bucket["n_comments"] += int(count)
+            bucket["sum_positive"] += float(sum_pos or 0.0)
+            bucket["sum_neutral"] += float(sum_neu or 0.0)
+            bucket["sum_negative"] += float(sum_neg or 0.0)
+
+        for delta in deltas.values():
+            delta["buckets"] = sorted(delta["buckets"].values(), key=lambda b: b["hour"])
+        return list(deltas.values())
+
     def get_comments_sentiment_info(self, subreddit_name: str) -> Optional[List[Dict]]:
         """
         Return sentiment info for all comments in a subreddit in JSON-serializable format.
@@ -138,7 +589,7 @@ class RedditDBManager:
                 select(Comment, Post.post_id)
                 .join(Post, Comment.post_id == Post.post_id)
                 .where(Post.subreddit_name == subreddit_name)
-                .where(Comment.pred_label != None)
+                .where(Comment.pred_label.in_(SENTIMENT_LABELS))
             )
             results = session.exec(stmt).all()
 
@@ -160,7 +611,7 @@ class RedditDBManager:
             return data
 
 
-    def get_hourly_sentiment(self, subreddit: str) -> list[dict]:
+    def get_hourly_sentiment(self, subreddit: str, days: Optional[int] = None, max_points: Optional[int] = None) -> list[dict]:
         """
         Return hourly aggregated sentiment data for a given subreddit.
         Output: List of dicts, each dict contains:
@@ -168,37 +619,42 @@ class RedditDBManager:
         - avg_positive
         - avg_neutral
         - avg_negative
-        Data is limited to the last 4 days.
+        - n_comments
+        Data is limited to the last days (4 by default), at most max_points rows
+        (downsampled with LTTB) if given.
         """
 
         with Session(self.engine) as session:
-            limit_date = datetime.now(timezone.utc) - timedelta(days=4)
+            limit_date = datetime.now(timezone.utc) - timedelta(days=days or 4)
             q = (
                 session.query(
                     func.date_trunc("hour", Comment.created_datetime).label("hour"),
                     func.avg(Comment.positive_score).label("avg_positive"),
                     func.avg(Comment.neutral_score).label("avg_neutral"),
                     func.avg(Comment.negative_score).label("avg_negative"),
+                    func.count(Comment.comment_id).label("n_comments"),
                 )
                 .join(Post, Comment.post_id == Post.post_id)
                 .filter(Post.subreddit_name == subreddit)
-                .filter(Comment.pred_label != None)
+                .filter(Comment.pred_label.in_(SENTIMENT_LABELS))
                 .filter(Comment.created_datetime >= limit_date)
                 .group_by(func.date_trunc("hour", Comment.created_datetime))
                 .order_by("hour")
             )
             results = session.exec(q).all()
-            return [
+            rows = [
                 {
                     "hour": str(r[0]),
                     "avg_positive": float(r[1]) if r[1] is not None else None,
                     "avg_neutral": float(r[2]) if r[2] is not None else None,
                     "avg_negative": float(r[3]) if r[3] is not None else None,
+                    "n_comments": int(r[4]),
                 }
                 for r in results
             ]
+            return downsample_rows(rows, "hour", TREND_SERIES, max_points)
 
-    def get_daily_sentiment(self, subreddit: str) -> list[dict]:
+    def get_daily_sentiment(self, subreddit: str, days: Optional[int] = None, max_points: Optional[int] = None) -> list[dict]:
         """
         Return daily aggregated sentiment data for a given subreddit.
         Output: List of dicts, each dict contains:
@@ -206,37 +662,42 @@ class RedditDBManager:
         - avg_positive
         - avg_neutral
         - avg_negative
+        - n_comments
 
-        Data is limited to the last 30 days.
+        Data is limited to the last days (30 by default), at most max_points rows
+        (downsampled with LTTB) if given.
         """
         with Session(self.engine) as session:
-            limit_date = datetime.now(timezone.utc) - timedelta(days=30)
+            limit_date = datetime.now(timezone.utc) - timedelta(days=days or 30)
             q = (
                 session.query(
                     func.date_trunc("day", Comment.created_datetime).label("day"),
                     func.avg(Comment.positive_score).label("avg_positive"),
                     func.avg(Comment.neutral_score).label("avg_neutral"),
                     func.avg(Comment.negative_score).label("avg_negative"),
+                    func.count(Comment.comment_id).label("n_comments"),
                 )
                 .join(Post, Comment.post_id == Post.post_id)
                 .filter(Post.subreddit_name == subreddit)
-                .filter(Comment.pred_label != None)
+                .filter(Comment.pred_label.in_(SENTIMENT_LABELS))
                 .filter(Comment.created_datetime >= limit_date)
                 .group_by(func.date_trunc("day", Comment.created_datetime))
                 .order_by("day")
             )
             results = session.exec(q).all()
-            return [
+            rows = [
                 {
                     "day": str(r[0].date()),
                     "avg_positive": float(r[1]) if r[1] is not None else None,
                     "avg_neutral": float(r[2]) if r[2] is not None else None,
                     "avg_negative": float(r[3]) if r[3] is not None else None,
+                    "n_comments": int(r[4]),
                 }
                 for r in results
             ]
+            return downsample_rows(rows, "day", TREND_SERIES, max_points)
 
-    def get_weekly_sentiment(self, subreddit: str) -> list[dict]:
+    def get_weekly_sentiment(self, subreddit: str, days: Optional[int] = None, max_points: Optional[int] = None) -> list[dict]:
         """
         Return weekly aggregated sentiment data for a given subreddit.
         Output: List of dicts, each dict contains:
@@ -244,37 +705,42 @@ class RedditDBManager:
         - avg_positive
         - avg_neutral
         - avg_negative
+        - n_comments
 
-        Data is limited to the last 90 days.
+        Data is limited to the last days (90 by default), at most max_points rows
+        (downsampled with LTTB) if given.
         """
         with Session(self.engine) as session:
-            limit_date = datetime.now(timezone.utc) - timedelta(days=90)
+            limit_date = datetime.now(timezone.utc) - timedelta(days=days or 90)
             q = (
                 session.query(
                     func.date_trunc("week", Comment.created_datetime).label("week"),
                     func.avg(Comment.positive_score).label("avg_positive"),
                     func.avg(Comment.neutral_score).label("avg_neutral"),
                     func.avg(Comment.negative_score).label("avg_negative"),
+                    func.count(Comment.comment_id).label("n_comments"),
                 )
                 .join(Post, Comment.post_id == Post.post_id)
                 .filter(Post.subreddit_name == subreddit)
-                .filter(Comment.pred_label != None)
+                .filter(Comment.pred_label.in_(SENTIMENT_LABELS))
                 .filter(Comment.created_datetime >= limit_date)
                 .group_by(func.date_trunc("week", Comment.created_datetime))
                 .order_by("week")
             )
             results = session.exec(q).all()
-            return [
+            rows = [
                 {
                     "week": str(r[0].date()),
                     "avg_positive": float(r[1]) if r[1] is not None else None,
                     "avg_neutral": float(r[2]) if r[2] is not None else None,
                     "avg_negative": float(r[3]) if r[3] is not None else None,
+                    "n_comments": int(r[4]),
                 }
                 for r in results
             ]
+            return downsample_rows(rows, "week", TREND_SERIES, max_points)
 
-    def get_monthly_sentiment(self, subreddit: str) -> list[dict]:
+    def get_monthly_sentiment(self, subreddit: str, days: Optional[int] = None, max_points: Optional[int] = None) -> list[dict]:
         """
         Return monthly aggregated sentiment data for a given subreddit.
         Output: List of dicts, each dict contains:
@@ -283,10 +749,13 @@ class RedditDBManager:
         - avg_positive
         - avg_negative
         - avg_neutral
+        - n_comments
+
+        Data is limited to the last days (365 by default), at most max_points rows
+        (downsampled with LTTB) if given.
         """
         with Session(self.engine) as session:
-            # Limite: ultimi 12 mesi
-            limit_date = datetime.now(timezone.utc) - timedelta(days=365)
+            limit_date = datetime.now(timezone.utc) - timedelta(days=days or 365)
             
             q = (
                 session.query(
@@ -294,10 +763,11 @@ class RedditDBManager:
                     func.avg(Comment.positive_score).label("avg_positive"),
                     func.avg(Comment.neutral_score).label("avg_neutral"),
                     func.avg(Comment.negative_score).label("avg_negative"),
+                    func.count(Comment.comment_id).label("n_comments"),
                 )
                 .join(Post, Comment.post_id == Post.post_id)
                 .filter(Post.subreddit_name == subreddit)
-                .filter(Comment.pred_label != None)
+                .filter(Comment.pred_label.in_(SENTIMENT_LABELS))
                 .filter(Comment.created_datetime >= limit_date)
                 .group_by(func.date_trunc("month", Comment.created_datetime))
                 .order_by("month")
@@ -305,15 +775,78 @@ class RedditDBManager:
             
             results = session.exec(q).all()
             
-            return [
+            rows = [
                 {
                     "month": str(r[0].date()),
                     "avg_positive": float(r[1]) if r[1] is not None else None,
                     "avg_neutral": float(r[2]) if r[2] is not None else None,
                     "avg_negative": float(r[3]) if r[3] is not None else None,
+                    "n_comments": int(r[4]),
                 }
                 for r in results
             ]
+            return downsample_rows(rows, "month", TREND_SERIES, max_points)
+
+    def compare_subreddits_sentiment(
+        self, subreddits: list[str], freq: str, days: Optional[int] = None, max_points: Optional[int] = None
+    ) -> dict[str, dict]:
+        """
+        Return the aggregated sentiment of several subreddits at once, with one query grouped
+        by subreddit and bucket, so the cost does not grow with the number of subreddits.
+        freq: hourly, daily, weekly or monthly; days defaults to the range of the single
+        subreddit methods. Output:
+        - series: subreddit -> rows like the get_<freq>_sentiment ones (downsampled to
+          max_points each if given), subreddits without data get no rows
+        - averages: subreddit -> average scores and number of comments over the whole range,
+          computed before the downsampling, which keeps the peaks and would bias them
+        """
+        unit, default_days = TREND_FREQUENCIES[freq]
+        with Session(self.engine) as session:
+            limit_date = datetime.now(timezone.utc) - timedelta(days=days or default_days)
+            bucket = func.date_trunc(unit, Comment.created_datetime)
+            q = (
+                session.query(
+                    Post.subreddit_name,
+                    bucket.label(unit),
+                    func.avg(Comment.positive_score).label("avg_positive"),
+                    func.avg(Comment.neutral_score).label("avg_neutral"),
+                    func.avg(Comment.negative_score).label("avg_negative"),
+                    func.count(Comment.comment_id).label("n_comments"),
+                )
+                .join(Post, Comment.post_id == Post.post_id)
+                .filter(Post.subreddit_name.in_(subreddits))
+                .filter(Comment.pred_label.in_(SENTIMENT_LABELS))
+                .filter(Comment.created_datetime >= limit_date)
+                .group_by(Post.subreddit_name, bucket)
+                .order_by(Post.subreddit_name, bucket)
+            )
+            results = session.exec(q).all()
+
+        series: dict[str, list[dict]] = {subreddit: [] for subreddit in subreddits}
+        for r in results:
+            series[r[0]].append({
+                unit: str(r[1]) if unit == "hour" else str(r[1].date()),
+                "avg_positive": float(r[2]) if r[2] is not None else None,
+                "avg_neutral": float(r[3]) if r[3] is not None else None,
+                "avg_negative": float(r[4]) if r[4] is not None else None,
+                "n_comments": int(r[5]),
+            })
+
+        averages: dict[str, dict] = {}
+        for subreddit, rows in series.items():
+            n_comments = sum(row["n_comments"] for row in rows)
+            if not n_comments:
+                continue
+            # weighted by the comments of each bucket: the average of all the comments
+            averages[subreddit] = {
+                col: sum((row[col] or 0.0) * row["n_comments"] for row in rows) / n_comments
+                for col in ["avg_positive", "avg_neutral", "avg_negative"]
+            }
+            averages[subreddit]["n_comments"] = n_comments
+        return {
+            "series": {subreddit: downsample_rows(rows, unit, TREND_SERIES, max_points) for subreddit, rows in series.items()},
+            "averages": averages,
+        }
 
     def get_posts_count_by_fetch_type(self, subreddit: str) -> dict[str, int]:
         """Return a dict with fetch_type as keys and counts as values for a given subreddit."""
@@ -326,4 +859,129 @@ class RedditDBManager:
             results = session.exec(stmt).all()
             return {fetch_type: count for fetch_type, count in results}
 
+    ### Pipeline telemetry related methods ###
+    def start_pipeline_run(self, name: str) -> int:
+        """Record the start of a pipeline run and return its id."""
+        with Session(self.engine) as session:
+            run = PipelineRun(name=name)
+            session.add(run)
+            session.commit()
+            return run.id
 
+    def finish_pipeline_run(self, run_id: int, status: str = "completed"):
+        with Session(self.engine) as session:
+            run = session.get(PipelineRun, run_id)
+            if run is None:
+                return
+            run.ended_datetime = datetime.utcnow()
+            run.status = status
+            session.add(run)
+            session.commit()
+
+    def get_backlog_sizes(self) -> dict[str, int]:
+        """Return the number of comments waiting for a sentiment label and of posts waiting for their comments."""
+        with Session(self.engine) as session:
+            unlabeled = session.exec(select(func.count()).select_from(Comment).where(Comment.pred_label == None)).one()
+            uncommented = session.exec(select(func.count()).select_from(Post).where(~Post.comments.any())).one()
+            return {"unlabeled_backlog": int(unlabeled), "uncommented_backlog": int(uncommented)}
+
+    def save_stage_metrics(self, run_id: int, metrics: list[dict]):
+        """Store the stage_metric rows of a reporting window (dicts with the StageMetric fields)."""
+        if not metrics:
+            return
+        with Session(self.engine) as session:
+            session.add_all([StageMetric(run_id=run_id, **metric) for metric in metrics])
+            session.commit()
+
+    def get_pipeline_runs(self, limit: int = 50) -> list[dict]:
+        with Session(self.engine) as session:
+            runs = session.exec(select(PipelineRun).order_by(PipelineRun.started_datetime.desc()).limit(limit)).all()
+            return [
+                {
+                    "id": run.id,
+                    "name": run.name,
+                    "started_datetime": run.started_datetime.isoformat(),
+                    "ended_datetime": run.ended_datetime.isoformat() if run.ended_datetime else None,
+                    "status": run.status,
+                }
+                for run in runs
+            ]
+
+    def get_stage_metrics(self, hours: int = 24, stage: Optional[str] = None) -> list[dict]:
+        """Return the stage metrics of the last hours, oldest first, with their throughput."""
+        since = datetime.utcnow() - timedelta(hours=hours)
+        with Session(self.engine) as session:
+            stmt = (
+                select(StageMetric, PipelineRun.name)
+                .join(PipelineRun, PipelineRun.id == StageMetric.run_id)
+                .where(StageMetric.ended_datetime >= since)
+                .order_by(StageMetric.ended_datetime)
+            )
+            if stage is not None:
+                stmt = stmt.where(StageMetric.stage == stage)
+            results = session.exec(stmt).all()
+
+            metrics = []
+            for metric, run_name in results:
+                seconds = (metric.ended_datetime - metric.started_datetime).total_seconds()
+                metrics.append({
+                    "run_id": metric.run_id,
+                    "run_name": run_name,
+                    "stage": metric.stage,
+                    "started_datetime": metric.started_datetime.isoformat(),
+                    "ended_datetime": metric.ended_datetime.isoformat(),
+                    "rows_processed": metric.rows_processed,
+                    "rows_per_sec": metric.rows_processed / seconds if seconds > 0 else 0.0,
+                    "api_calls": metric.api_calls,
+                    "errors": metric.errors,
+                    "unlabeled_backlog": metric.unlabeled_backlog,
+                    "uncommented_backlog": metric.uncommented_backlog,
+                })
+            return metrics
+
+    def save_api_usage(self, run_id: int, usage: list[dict]):
+        """Store the api_usage rows of a reporting window (dicts with the ApiUsage fields)."""
+        if not usage:
+            return
+        with Session(self.engine) as session:
+            session.add_all([ApiUsage(run_id=run_id, **row) for row in usage])
+            session.commit()
+
+    def get_api_usage(self, hours: int = 24) -> dict:
+        """Return the Reddit API requests of the last hours per operation and subreddit, with their
+        yield (new items per request), and the rate-limit budget left over time."""
+        since = datetime.utcnow() - timedelta(hours=hours)
+        with Session(self.engine) as session:
+            results = session.exec(
+                select(
+                    ApiUsage.operation,
+                    ApiUsage.subreddit_name,
+                    func.sum(ApiUsage.requests),
+                    func.sum(ApiUsage.items),
+                )
+                .where(ApiUsage.ended_datetime >= since)
+                .group_by(ApiUsage.operation, ApiUsage.subreddit_name)
+                .order_by(func.sum(ApiUsage.requests).desc())
+            ).all()
+            budget = session.exec(
+                select(ApiUsage.ended_datetime, func.min(ApiUsage.ratelimit_remaining), func.max(ApiUsage.ratelimit_used))
+                .where(ApiUsage.ended_datetime >= since)
+                .group_by(ApiUsage.ended_datetime)
+                .order_by(ApiUsage.ended_datetime)
+            ).all()
+            return {
+                "operations": [
+                    {
+                        "operation": operation,
+                        "subreddit": subreddit,
+                        "requests": int(requests),
+                        "items": int(items),
+                        "yield": items / requests if requests else 0.0,
+                    }
+                    for operation, subreddit, requests, items in results
+                ],
+                "budget": [
+                    {"ended_datetime": ended.isoformat(), "remaining": remaining, "used": used}
+                    for ended, remaining, used in budget
+                ],
+            }
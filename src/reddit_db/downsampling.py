@@ -0,0 +1,55 @@
+"""
+Shape-preserving downsampling of the trend series sent to the dashboard.
+
+Largest-Triangle-Three-Buckets (Steinarsson, 2013): the first and last points are kept
+and every bucket in between keeps the point forming the largest triangle with the point
+kept in the previous bucket and the average of the next bucket, so peaks and dips survive
+where plain decimation would skip them. The trend rows carry several series on the same
+x (avg_positive, avg_neutral, avg_negative): the triangle areas of all the series are
+added up, so the rows kept are the same for every series.
+"""
+from datetime import datetime
+from typing import Optional, Sequence
+
+# the series of the trend rows, kept together when downsampling
+TREND_SERIES = ("avg_positive", "avg_neutral", "avg_negative")
+
+
+def lttb_indices(x: Sequence[float], ys: Sequence[Sequence[float]], max_points: int) -> list[int]:
+    """Indices of the points kept, in order; every point if there are at most max_points"""
+    n = len(x)
+    if n <= max_points:
+        return list(range(n))
+    if max_points < 3:
+        return [0, n - 1][:max_points]
+
+    every = (n - 2) / (max_points - 2)
+    selected = [0]
+    a = 0
+    for i in range(max_points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[end:next_end]) / (next_end - end)
+        avg_ys = [sum(y[end:next_end]) / (next_end - end) for y in ys]
+
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = 0.0
+            for y, avg_y in zip(ys, avg_ys):
+                area += abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def downsample_rows(rows: list[dict], x_key: str, y_keys: Sequence[str], max_points: Optional[int]) -> list[dict]:
+    """Keep at most max_points of the rows (sorted by x_key, an ISO date or datetime string), all of them if None"""
+    if max_points is None or len(rows) <= max_points:
+        return rows
+    x = [datetime.fromisoformat(row[x_key]).timestamp() for row in rows]
+    ys = [[row[key] or 0.0 for row in rows] for key in y_keys]
+    return [rows[i] for i in lttb_indices(x, ys, max_points)]
@@ -2,12 +2,26 @@ from sqlmodel import SQLModel, Field, Session, create_engine, select, Relationsh
 from typing import Optional, List
 from datetime import datetime
 
+# pred_label values that count in the sentiment aggregates.
+# Comments skipped by the sentiment prefilter are labeled EXCLUDED_LABEL instead.
+SENTIMENT_LABELS = ["negative", "neutral", "positive"]
+EXCLUDED_LABEL = "excluded"
+
 class Subreddit(SQLModel, table=True):
     name: str = Field(primary_key=True)
     priority: int = Field(default=0)
 
     posts: list["Post"] = Relationship(back_populates="subreddit")
 
+class SubredditLease(SQLModel, table=True):
+    # which ingestion worker owns a subreddit until leased_until, see RedditDBManager.claim_subreddit_lease
+    __tablename__ = "subreddit_lease"
+    subreddit_name: str = Field(foreign_key="subreddit.name", primary_key=True)
+    worker_id: str
+    leased_until: datetime
+    heartbeat_datetime: datetime
+    last_fetched_datetime: Optional[datetime] = None
+
 class Post(SQLModel, table=True):
     post_id: str = Field(primary_key=True)
     title: str 
@@ -38,3 +52,71 @@ class Comment(SQLModel, table=True):
     pred_label: Optional[str] = None
 
     post: Optional[Post] = Relationship(back_populates="comments")
+
+class CachedSentiment(SQLModel, table=True):
+    # sha256 of the normalized comment text, see sentiment_model.inference_cache
+    text_hash: str = Field(primary_key=True)
+    model_id: str = Field(primary_key=True)
+    negative_score: float
+    neutral_score: float
+    positive_score: float
+
+class SentimentModelVersion(SQLModel, table=True):
+    # name of a sentiment_model.registry entry, exactly one version is active at a time
+    name: str = Field(primary_key=True)
+    hf_model: str
+    is_active: bool = Field(default=False)
+    created_datetime: datetime = Field(default_factory=datetime.utcnow)
+    activated_datetime: Optional[datetime] = None
+
+class SentimentTrial(SQLModel, table=True):
+    # subreddits a non active model version is being trialled on
+    model_version: str = Field(foreign_key="sentimentmodelversion.name", primary_key=True)
+    subreddit_name: str = Field(foreign_key="subreddit.name", primary_key=True)
+
+class CommentSentiment(SQLModel, table=True):
+    # scores of every model version; the Comment score columns hold the ones of the active version
+    comment_id: str = Field(foreign_key="comment.comment_id", primary_key=True)
+    model_version: str = Field(foreign_key="sentimentmodelversion.name", primary_key=True)
+    negative_score: Optional[float] = None
+    neutral_score: Optional[float] = None
+    positive_score: Optional[float] = None
+    pred_label: str
+
+class PipelineRun(SQLModel, table=True):
+    # one run of a pipeline process: the orchestrator, or one of the scripts in src/pipelines
+    __tablename__ = "pipeline_run"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+    started_datetime: datetime = Field(default_factory=datetime.utcnow)
+    ended_datetime: Optional[datetime] = None
+    status: str = Field(default="running")
+
+class StageMetric(SQLModel, table=True):
+    # what a stage did during one reporting window of a run, and the backlogs at its end
+    __tablename__ = "stage_metric"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: int = Field(foreign_key="pipeline_run.id", index=True)
+    stage: str
+    started_datetime: datetime
+    ended_datetime: datetime = Field(index=True)
+    rows_processed: int = Field(default=0)
+    api_calls: int = Field(default=0)
+    errors: int = Field(default=0)
+    unlabeled_backlog: Optional[int] = None
+    uncommented_backlog: Optional[int] = None
+
+class ApiUsage(SQLModel, table=True):
+    # Reddit API requests of one operation during one reporting window of a run, the new items
+    # they brought and the rate-limit budget left at the end of the window
+    __tablename__ = "api_usage"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: int = Field(foreign_key="pipeline_run.id", index=True)
+    operation: str # listing/<fetch type> or comments
+    subreddit_name: Optional[str] = None
+    started_datetime: datetime
+    ended_datetime: datetime = Field(index=True)
+    requests: int = Field(default=0)
+    items: int = Field(default=0)
+    ratelimit_remaining: Optional[float] = None
+    ratelimit_used: Optional[int] = None
@@ -0,0 +1,163 @@
+"""
+Local stand-in for the Reddit API, with the parts of the praw interface RedditIngestor uses.
+
+Listings return deterministic posts (the same ids for the same subreddit, fetch type and
+position) after an optional simulated latency, and every request is logged, so harnesses
+can run many ingestion workers without credentials or network and check what they fetched.
+New posts enter the listings at a per fetch type rate (scaled by a per subreddit activity),
+so repeated fetches find fewer new posts on quiet subreddits and slow fetch types.
+With a budget, requests are counted in a rate-limit window exposed like praw's
+reddit.auth.limits (the X-Ratelimit-* headers), and requests over it are rejected.
+Submissions have no comments: RedditIngestor only keeps real praw comments.
+"""
+import threading
+import time
+import zlib
+from typing import Iterator, Optional
+
+# new posts per minute entering each listing of a subreddit with activity 1
+TURNOVER = {"new": 10.0, "rising": 4.0, "hot": 2.0, "controversial": 0.5, "top": 0.1}
+
+
+class RateLimitExceeded(Exception):
+    """Stand-in for the 429 Too Many Requests response"""
+
+
+def activity(subreddit: str) -> float:
+    """Deterministic activity factor of a subreddit, between 0.1 and 2"""
+    return 0.1 + (zlib.crc32(subreddit.encode()) % 1000) / 1000 * 1.9
+
+
+class FakeRedditor:
+    def __init__(self, name: str):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+class FakePost:
+    def __init__(self, subreddit: str, fetch_type: str, index: int, created_utc: int):
+        self.id = f"{subreddit}_{fetch_type}_{index}"
+        self.title = f"{fetch_type} post {index} of r/{subreddit}"
+        self.author = FakeRedditor(f"user{index % 97}")
+        self.subreddit = subreddit
+        self.score = (index * 37) % 1000
+        self.created_utc = created_utc
+
+
+class FakeComments(list):
+    def replace_more(self, limit: Optional[int] = None):
+        return []
+
+
+class FakeSubmission:
+    def __init__(self, post_id: str):
+        self.id = post_id
+        self.subreddit = post_id.rsplit("_", 2)[0]
+        self.comments = FakeComments()
+
+
+class FakeSubreddit:
+    def __init__(self, reddit: "FakeReddit", name: str):
+        self.reddit = reddit
+        self.display_name = name
+
+    def __str__(self):
+        return self.display_name
+
+    def _listing(self, fetch_type: str, limit: int) -> Iterator[FakePost]:
+        self.reddit.request(f"listing/{fetch_type}", self.display_name)
+        now = self.reddit.elapsed()
+        # the newest post of the listing, posts below it were already listed before
+        newest = int(now / 60 * TURNOVER[fetch_type] * activity(self.display_name))
+        created_utc = int(self.reddit.started_at + now)
+        for i in range(min(limit, self.reddit.posts_per_listing)):
+            yield FakePost(self.display_name, fetch_type, newest - i, created_utc - i * 60)
+
+    def new(self, limit: int = 100):
+        return self._listing("new", limit)
+
+    def hot(self, limit: int = 100):
+        return self._listing("hot", limit)
+
+    def rising(self, limit: int = 100):
+        return self._listing("rising", limit)
+
+    def top(self, limit: int = 100, time_filter: str = "all"):
+        return self._listing("top", limit)
+
+    def controversial(self, limit: int = 100, time_filter: str = "all"):
+        return self._listing("controversial", limit)
+
+
+class FakeAuth:
+    def __init__(self, reddit: "FakeReddit"):
+        self.reddit = reddit
+
+    @property
+    def limits(self) -> dict:
+        return self.reddit.limits()
+
+
+class FakeReddit:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        posts_per_listing: int = 100,
+        budget: Optional[int] = None,
+        window: float = 600.0,
+        time_scale: float = 1.0
+    ):
+        """budget: requests per rate-limit window of window seconds (unlimited if None),
+        time_scale: simulated seconds per real second, for the post turnover and the window"""
+        self.latency = latency
+        self.posts_per_listing = posts_per_listing
+        self.budget = budget
+        self.window = window
+        self.time_scale = time_scale
+        self.started_at = time.time()
+        self.requests: list[tuple[float, str, str]] = [] # (time, operation, target)
+        self.rejected = 0
+        self.window_start = 0.0
+        self.used = 0
+        self.auth = FakeAuth(self)
+        self.lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        """Simulated seconds since the start"""
+        return (time.time() - self.started_at) * self.time_scale
+
+    def _roll_window(self, now: float):
+        if now - self.window_start >= self.window:
+            self.window_start = now - (now - self.window_start) % self.window
+            self.used = 0
+
+    def limits(self) -> dict:
+        if self.budget is None:
+            return {"remaining": None, "reset_timestamp": None, "used": None}
+        with self.lock:
+            now = self.elapsed()
+            self._roll_window(now)
+            reset_in = (self.window_start + self.window - now) / self.time_scale
+            return {"remaining": float(self.budget - self.used), "reset_timestamp": time.time() + reset_in, "used": self.used}
+
+    def request(self, operation: str, target: str):
+        """Log a simulated API request, count it in the rate-limit window and wait for its latency"""
+        with self.lock:
+            if self.budget is not None:
+                self._roll_window(self.elapsed())
+                if self.used >= self.budget:
+                    self.rejected += 1
+                    raise RateLimitExceeded(f"{operation} {target}: rate limit of {self.budget} requests exceeded")
+                self.used += 1
+            self.requests.append((time.time(), operation, target))
+        if self.latency:
+            time.sleep(self.latency)
+
+    def subreddit(self, name: str) -> FakeSubreddit:
+        return FakeSubreddit(self, name)
+
+    def submission(self, id: str) -> FakeSubmission:
+        self.request("comments", id)
+        return FakeSubmission(id)
@@ -0,0 +1,100 @@
+import os
+import socket
+import threading
+from typing import Optional
+
+from .reddit_ingestion import RedditIngestor
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeasedIngestionWorker:
+    """
+    Ingestion worker that shares the subreddits with the other workers through the
+    subreddit_lease table: it claims one subreddit at a time, keeps the lease alive with a
+    heartbeat while fetching, and releases it when done. A worker that dies stops sending
+    heartbeats, so its lease expires after lease_seconds and another worker picks the
+    subreddit up. A failed fetch keeps the lease for retry_seconds, so a failing subreddit
+    is not retried back to back. Adding workers (threads, processes or containers) adds coverage.
+    """
+
+    def __init__(
+        self,
+        db_manager,
+        ingestor: RedditIngestor,
+        worker_id: Optional[str] = None,
+        lease_seconds: int = 300,
+        heartbeat_interval: float = 60.0,
+        refetch_seconds: int = int(os.getenv("INGESTION_INTERVAL", "60")),
+        idle_sleep: float = 5.0,
+        retry_seconds: int = 300
+    ):
+        self.db_manager = db_manager
+        self.ingestor = ingestor
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.refetch_seconds = refetch_seconds
+        self.idle_sleep = idle_sleep
+        self.retry_seconds = retry_seconds
+
+        self.fetched = 0
+        self.errors = 0
+        self.lost_leases = 0
+
+    def _heartbeat(self, subreddit: str, done: threading.Event):
+        while not done.wait(self.heartbeat_interval):
+            try:
+                if not self.db_manager.heartbeat_subreddit_lease(self.worker_id, subreddit, self.lease_seconds):
+                    # the fetch took longer than the lease: another worker may be fetching it too
+                    print(f"[{self.worker_id}] Lost the lease on r/{subreddit}")
+                    self.lost_leases += 1
+                    return
+            except Exception as e:
+                print(f"[{self.worker_id}] Heartbeat failed for r/{subreddit}: {e}")
+
+    def ingest_one(self) -> Optional[str]:
+        """Claim a subreddit and fetch its new posts, return its name or None if there was nothing to claim"""
+        subreddit = self.db_manager.claim_subreddit_lease(self.worker_id, self.lease_seconds, self.refetch_seconds)
+        if subreddit is None:
+            return None
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(subreddit, done), daemon=True)
+        heartbeat.start()
+        fetched = False
+        try:
+            print(f"[{self.worker_id}] Fetching data for subreddit: {subreddit}")
+            self.ingestor.fetch_posts(subreddit)
+            fetched = True
+            self.fetched += 1
+        except Exception as e:
+            print(f"[{self.worker_id}] Error fetching posts for subreddit {subreddit}: {e}")
+            self.errors += 1
+        finally:
+            done.set()
+            heartbeat.join()
+            self.db_manager.release_subreddit_lease(
+                self.worker_id, subreddit, fetched=fetched, retry_seconds=self.retry_seconds
+            )
+        return subreddit
+
+    def run(self, stop_event: threading.Event):
+        while not stop_event.is_set():
+            # no lease is held while waiting for the rate-limit window to reset
+            self.ingestor.quota.wait_for_budget(stop_event)
+            if stop_event.is_set():
+                break
+            errors = self.errors
+            try:
+                subreddit = self.ingest_one()
+            except Exception as e:
+                # e.g. the database restarting
+                print(f"[{self.worker_id}] Error claiming a subreddit: {e}")
+                self.errors += 1
+                subreddit = None
+            # nothing to claim, or the attempt failed (Reddit or the database down): back off
+            if subreddit is None or self.errors > errors:
+                stop_event.wait(self.idle_sleep)
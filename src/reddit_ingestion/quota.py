@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from typing import Optional
+
+
+class RedditQuota:
+    """
+    Accounting of the Reddit API rate-limit budget.
+
+    Every request is recorded per operation ("listing/<fetch type>" or "comments") and
+    subreddit, with the number of new items it brought, and the budget left is read from
+    the rate-limit headers (praw's reddit.auth.limits: remaining, used, reset_timestamp).
+    The yield of an operation is a moving average of its new items per request.
+
+    allow() is the scheduler: with plenty of budget everything runs, once less than
+    low_water of the window is left only the operations yielding at least the median of their
+    kind (listings or comments, whose items per request are not comparable) run, and the ones
+    never tried, and below reserve requests nothing runs until the window resets.
+    One instance is shared by the RedditIngestors of a process: they use the same credentials,
+    so the same budget.
+    """
+
+    def __init__(
+        self,
+        reserve: int = int(os.getenv("REDDIT_QUOTA_RESERVE", "20")),
+        low_water: float = float(os.getenv("REDDIT_QUOTA_LOW_WATER", "0.3")),
+        smoothing: float = 0.3
+    ):
+        self.reserve = reserve
+        self.low_water = low_water
+        self.smoothing = smoothing
+
+        self.remaining: Optional[float] = None
+        self.used: Optional[int] = None
+        self.reset_timestamp: Optional[float] = None
+        # (operation, subreddit) -> requests, items, yield
+        self.usage: dict[tuple[str, Optional[str]], dict] = {}
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def update_limits(self, limits: Optional[dict]):
+        if not limits or limits.get("remaining") is None:
+            return
+        with self.lock:
+            self.remaining = limits["remaining"]
+            self.used = limits.get("used")
+            self.reset_timestamp = limits.get("reset_timestamp")
+
+    def record(self, operation: str, subreddit: Optional[str], items: int, limits: Optional[dict] = None):
+        """Record one request and the number of new items it brought"""
+        self.update_limits(limits)
+        with self.lock:
+            usage = self.usage.setdefault((operation, subreddit), {"requests": 0, "items": 0, "yield": None})
+            usage["requests"] += 1
+            usage["items"] += items
+            if usage["yield"] is None:
+                usage["yield"] = float(items)
+            else:
+                usage["yield"] += self.smoothing * (items - usage["yield"])
+
+    def expected_yield(self, operation: str, subreddit: Optional[str] = None) -> Optional[float]:
+        """New items per request of the operation (on any subreddit if None), None if never tried"""
+        with self.lock:
+            if subreddit is not None:
+                usage = self.usage.get((operation, subreddit))
+                return usage["yield"] if usage else None
+            yields = [usage["yield"] for (op, _), usage in self.usage.items() if op == operation]
+        return sum(yields) / len(yields) if yields else None
+
+    def seconds_to_reset(self) -> float:
+        if self.reset_timestamp is None:
+            return 0.0
+        return max(self.reset_timestamp - time.time(), 0.0)
+
+    def _window_budget(self) -> Optional[float]:
+        if self.remaining is None or self.used is None:
+            return None
+        return self.remaining + self.used
+
+    def exhausted(self) -> bool:
+        return self.remaining is not None and self.remaining <= self.reserve and self.seconds_to_reset() > 0
+
+    def allow(self, operation: str, subreddit: Optional[str] = None) -> bool:
+        """Whether a request of the operation is worth its budget now"""
+        if self.remaining is None or self.seconds_to_reset() == 0:
+            # no headers yet, or a new window started
+            allowed = True
+        elif self.exhausted():
+            allowed = False
+        elif self.remaining >= self.low_water * (self._window_budget() or 0):
+            allowed = True
+        else:
+            expected = self.expected_yield(operation, subreddit)
+            kind = operation.split("/")[0]
+            with self.lock:
+                yields = sorted(usage["yield"] for (op, _), usage in self.usage.items() if op.split("/")[0] == kind)
+            allowed = expected is None or expected >= yields[len(yields) // 2]
+        if not allowed:
+            with self.lock:
+                self.skipped += 1
+        return allowed
+
+    def wait_for_budget(self, stop_event: Optional[threading.Event] = None):
+        """Block until the window resets if the budget is exhausted"""
+        if not self.exhausted():
+            return
+        seconds = self.seconds_to_reset()
+        print(f"Reddit API budget exhausted ({self.remaining:.0f} requests left), waiting {seconds:.0f} s for the reset")
+        if stop_event is not None:
+            stop_event.wait(seconds)
+        else:
+            time.sleep(seconds)
+
+    def usage_totals(self) -> dict[tuple[str, Optional[str]], dict]:
+        """Running totals of requests and new items per (operation, subreddit)"""
+        with self.lock:
+            return {key: {"requests": usage["requests"], "items": usage["items"]} for key, usage in self.usage.items()}
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            operations = [
+                {"operation": operation, "subreddit": subreddit, **usage}
+                for (operation, subreddit), usage in sorted(self.usage.items(), key=lambda item: (item[0][0], item[0][1] or ""))
+            ]
+            return {
+                "remaining": self.remaining,
+                "used": self.used,
+                "reset_in": self.seconds_to_reset(),
+                "skipped": self.skipped,
+                "operations": operations,
+            }
+
+
+# shared by the RedditIngestors of the process
+REDDIT_QUOTA = RedditQuota()
@@ -3,16 +3,18 @@ from dotenv import load_dotenv
 import os
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Union
-import pandas as pd
 from pathlib import Path
 import requests
+from .quota import REDDIT_QUOTA, RedditQuota
 load_dotenv()
 
 class RedditIngestor:
     def __init__(
         self,
         keyword: Union[str, List[str]] = None,
-        url = os.getenv("API_URL")
+        url = os.getenv("API_URL"),
+        reddit: Optional[praw.Reddit] = None,
+        quota: Optional[RedditQuota] = None
     ):
         load_dotenv()
         self.url = url
@@ -31,10 +33,18 @@ class RedditIngestor:
         self.post_fetched_count = 0
 
         self.comments_per_post_limit = 100 # max number of comments to save per post
-        self.posts_per_call_limit = 10 # number of posts to fetch per API call
+        # a listing costs one request for up to 100 posts: asking for fewer saves no budget
+        self.listing_limit = 100
 
         self.already_fetched_post_ids = []
 
+        # running totals for the pipeline telemetry
+        self.api_calls = 0 # Reddit API requests
+        self.posts_added = 0
+        self.comments_added = 0
+        # rate-limit accounting, shared by the ingestors of the process
+        self.quota = quota or REDDIT_QUOTA
+
         if isinstance(keyword, list):
             self.keyword = [kw.lower() for kw in keyword]
         elif isinstance(keyword, str):
@@ -42,7 +52,8 @@ class RedditIngestor:
         else:
             self.keyword = None
 
-        self.reddit = praw.Reddit(
+        # a ready client can be passed in, e.g. the fake Reddit source of the local harnesses
+        self.reddit = reddit or praw.Reddit(
             client_id=self.client_id,
             client_secret=self.client_secret,
             user_agent=self.user_agent
@@ -113,123 +124,75 @@ class RedditIngestor:
         response = requests.post(f"{self.url}/comments/", json=comment)
         return response.status_code
 
-    def fetch_new_posts(self, subreddit):
-        """Fetch new posts from a subreddit"""
-        posts = subreddit.new(limit=self.posts_per_call_limit)
-        for post in posts:
-            if post.id in self.already_fetched_post_ids:
-                print(f"Post {post.id} already fetched.")
-                continue
-            elif self.post_fetched_count >= self.post_fetched_limit:
+    def _limits(self) -> Optional[Dict[str, Any]]:
+        """Rate-limit headers of the last response (remaining, used, reset_timestamp)"""
+        auth = getattr(self.reddit, "auth", None)
+        return getattr(auth, "limits", None)
+
+    def _fetch_listing(self, subreddit, fetch_type: str, listing):
+        """Save the new posts of a listing, up to post_fetched_limit per subreddit per run"""
+        posts, new_posts = [], []
+        try:
+            posts = list(listing) # one API request
+            new_posts = [post for post in posts if post.id not in self.already_fetched_post_ids]
+        finally:
+            # a failed request spent budget too, with no new posts
+            self.api_calls += 1
+            self.quota.record(f"listing/{fetch_type}", str(subreddit).lower(), len(new_posts), self._limits())
+        print(f"{len(new_posts)} new {fetch_type} posts out of {len(posts)}")
+        for post in new_posts:
+            if self.post_fetched_count >= self.post_fetched_limit:
                 print(f"Post fetch limit reached: {self.post_fetched_count}")
                 break
 
-            post_data = self.post_to_dict(post, fetch_type="new")
+            post_data = self.post_to_dict(post, fetch_type=fetch_type)
             self.add_post_to_db(post_data)
             self.post_fetched_count += 1
-            print(f"Fetched new post: {post.id}, count per subreddit is {self.post_fetched_count}")
+            self.posts_added += 1
+            print(f"Fetched {fetch_type} post: {post.id}, count per subreddit is {self.post_fetched_count}")
+
+    def fetch_new_posts(self, subreddit):
+        """Fetch new posts from a subreddit"""
+        self._fetch_listing(subreddit, "new", subreddit.new(limit=self.listing_limit))
 
     def fetch_top_posts(self, subreddit):
         """Fetch top posts from a subreddit"""
-        posts = subreddit.top(limit=self.posts_per_call_limit, time_filter="year")
-        for post in posts:
-            if post.id in self.already_fetched_post_ids:
-                print(f"Post {post.id} already fetched.")
-                continue
-            elif self.post_fetched_count >= self.post_fetched_limit:
-                print(f"Post fetch limit reached: {self.post_fetched_count}")
-                break
+        self._fetch_listing(subreddit, "top", subreddit.top(limit=self.listing_limit, time_filter="year"))
 
-            post_data = self.post_to_dict(post, fetch_type="top")
-            self.add_post_to_db(post_data)
-            self.post_fetched_count += 1
-            print(f"Fetched top post: {post.id}, count per subreddit is {self.post_fetched_count}")
-        
     def fetch_hot_posts(self, subreddit):
         """Fetch hot posts from a subreddit"""
-        posts = subreddit.hot(limit=self.posts_per_call_limit)
-        for post in posts:
-            if post.id in self.already_fetched_post_ids:
-                print(f"Post {post.id} already fetched.")
-                continue
-            elif self.post_fetched_count >= self.post_fetched_limit:
-                print(f"Post fetch limit reached: {self.post_fetched_count}")
-                break
+        self._fetch_listing(subreddit, "hot", subreddit.hot(limit=self.listing_limit))
 
-            post_data = self.post_to_dict(post, fetch_type="hot")
-            self.add_post_to_db(post_data)
-            self.post_fetched_count += 1
-            print(f"Fetched hot post: {post.id}, count per subreddit is {self.post_fetched_count}")
-    
     def fetch_rising_posts(self, subreddit):
         """Fetch rising posts from a subreddit"""
-        posts = subreddit.rising(limit=self.posts_per_call_limit)
-        for post in posts:
-            if post.id in self.already_fetched_post_ids:
-                print(f"Post {post.id} already fetched.")
-                continue
-            elif self.post_fetched_count >= self.post_fetched_limit:
-                print(f"Post fetch limit reached: {self.post_fetched_count}")
-                break
-
-            post_data = self.post_to_dict(post, fetch_type="rising")
-            self.add_post_to_db(post_data)
-            self.post_fetched_count += 1
-            print(f"Fetched rising post: {post.id}, count per subreddit is {self.post_fetched_count}")
+        self._fetch_listing(subreddit, "rising", subreddit.rising(limit=self.listing_limit))
 
     def fetch_controversial_posts(self, subreddit):
         """Fetch controversial posts from a subreddit"""
-        posts = subreddit.controversial(limit=self.posts_per_call_limit, time_filter="year")
-        for post in posts:
-            if post.id in self.already_fetched_post_ids:
-                print(f"Post {post.id} already fetched.")
-                continue
-            elif self.post_fetched_count >= self.post_fetched_limit:
-                print(f"Post fetch limit reached: {self.post_fetched_count}")
-                break
-
-            post_data = self.post_to_dict(post, fetch_type="controversial")
-            self.add_post_to_db(post_data)
-            self.post_fetched_count += 1
-            print(f"Fetched controversial post: {post.id}, count per subreddit is {self.post_fetched_count}")
+        self._fetch_listing(subreddit, "controversial", subreddit.controversial(limit=self.listing_limit, time_filter="year"))
 
     def fetch_posts(self, subreddit_name: str):
         """Logic behind fetching posts from a subreddit"""
         subreddit = self.reddit.subreddit(subreddit_name)
-        self.already_fetched_post_ids = self.get_already_fetched_post_ids(subreddit_name)
-
-        # Get the count of posts by fetch type and sort them ascending
-        # The lowest count fetch type should be fetched first to balance the dataset 
+        self.already_fetched_post_ids = set(self.get_already_fetched_post_ids(subreddit_name))
         fetch_type_counts = self.posts_fetch_type_count(subreddit_name)
-        fetch_type_counts = sorted(fetch_type_counts.items(), key=lambda x: x[1])
-        fetch_type_counts = dict(fetch_type_counts)
         print(f"Fetch type counts for {subreddit_name}: {fetch_type_counts}")
 
-        # If there is a missing fetch_type, fetch it
-        if len(fetch_type_counts) < len(self.fetch_types):
-            print(len(fetch_type_counts), len(self.fetch_types))
-            missing_fetch_types = set(self.fetch_types.keys()) - set(fetch_type_counts.keys())
-            for fetch_type in missing_fetch_types:
-                if self.post_fetched_count >= self.post_fetched_limit:
-                    break
-                print(f"Fetching {fetch_type} posts for subreddit: {subreddit_name} (from missing fetch types)")
-                self.fetch_types[fetch_type](subreddit)
+        # The fetch types bringing the most new posts per request first, never tried ones before
+        # any other; on ties the lowest count fetch type first to balance the dataset
+        def priority(fetch_type: str):
+            expected = self.quota.expected_yield(f"listing/{fetch_type}", subreddit_name.lower())
+            return (-(expected if expected is not None else float("inf")), fetch_type_counts.get(fetch_type, 0))
 
-        for fetch_type, count in fetch_type_counts.items():
+        for fetch_type in sorted(self.fetch_types, key=priority):
             if self.post_fetched_count >= self.post_fetched_limit:
                 break
+            if not self.quota.allow(f"listing/{fetch_type}", subreddit_name.lower()):
+                print(f"Skipping {fetch_type} posts for subreddit: {subreddit_name} (low yield for the API budget left)")
+                continue
             print(f"Fetching {fetch_type} posts for subreddit: {subreddit_name} (post_fetched_count: {self.post_fetched_count})")
             self.fetch_types[fetch_type](subreddit)
 
-        # increase the post fetch limit if we didn't reach enough new posts this run, or decrease it if we fetched too many
-        # This helps to fetch older posts if there are no new posts available, or avoid rate limits 
-        if self.post_fetched_count < self.post_fetched_limit:
-            self.posts_per_call_limit += 5 if self.posts_per_call_limit < 99 else 0 # cap at 100 to avoid rate limits
-            print(f"Increasing posts_per_call_limit to {self.posts_per_call_limit}")
-        else:
-            self.posts_per_call_limit -= 1 if self.posts_per_call_limit > 10 else 0 # floor at 10 to avoid too few posts calls
-            print(f"Decreasing posts_per_call_limit to {self.posts_per_call_limit}")
-
         self.post_fetched_count = 0
 
     def posts_fetch_type_count(self, subreddit_name: str) -> Dict[str, int]:
@@ -248,16 +211,32 @@ class RedditIngestor:
             return response.json()
         return []
 
+    def get_post_subreddit(self, post_id: str) -> Optional[str]:
+        """Get the subreddit of a stored post, None if unknown"""
+        try:
+            response = requests.get(f"{self.url}/posts/{post_id}/subreddit")
+        except requests.exceptions.RequestException:
+            return None
+        if response.status_code == 200:
+            return response.json()["subreddit"]
+        return None
+
     def extract_comments_from_post(self, post_id):
         """Extract comments from a post object and save them to the database"""
         n_comments = 0
+        if not self.quota.allow("comments"):
+            print(f"Skipping comments for post {post_id} (low yield for the API budget left)")
+            return
         submission = self.reddit.submission(id=post_id)
+        self.api_calls += 1
         try:
             submission.comments.replace_more(limit=0)
             comments = list(submission.comments)
             comments = comments[:self.comments_per_post_limit]
         except Exception as e:
             print(f"Error fetching comments for post {post_id}: {e}")
+            # the submission was not loaded, its subreddit comes from the database
+            self.quota.record("comments", self.get_post_subreddit(post_id), 0, self._limits())
             return
         for comment in comments:
             if self.comment_check(comment):
@@ -267,6 +246,9 @@ class RedditIngestor:
                     n_comments += 1
                 except Exception as e:
                     print(f"Error extracting comments from post {post_id}: {e}")
+        self.comments_added += n_comments
+        subreddit = getattr(submission, "subreddit", None)
+        self.quota.record("comments", str(subreddit).lower() if subreddit else None, n_comments, self._limits())
         print(f"Extracted {n_comments} comments from post {post_id}")
 
 
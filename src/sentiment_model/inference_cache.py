@@ -0,0 +1,120 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Union
+
+LABELS = ["negative", "neutral", "positive"]
+# part of every key: entries of the former lowercasing normalization are never hit
+KEY_VERSION = "v2"
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace, so trivially different copies share a cache entry. The case is
+    kept: the tokenizers are case-sensitive, "GREAT" and "great" can score differently."""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(f"{KEY_VERSION}:{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class CacheLookup:
+    """Result of InferenceCache.lookup: cached scores and the distinct texts the model still has to score"""
+
+    def __init__(self, inputs, keys, scores, db_keys, to_predict):
+        self.inputs = inputs
+        self.keys = keys
+        self.scores = scores
+        self.db_keys = db_keys
+        self.to_predict = to_predict # text hash -> {"body": text}
+
+    @property
+    def texts_to_predict(self) -> List[Dict[str, str]]:
+        return list(self.to_predict.values())
+
+
+class InferenceCache:
+    """
+    Cache of (negative, neutral, positive) scores keyed by normalized text hash.
+    An in-memory LRU sits in front of the CachedSentiment table, entries are scoped
+    by model id so switching model or backend never reuses stale scores.
+    """
+
+    def __init__(self, db_manager, model_id: str, max_size: int = 100_000):
+        self.db_manager = db_manager
+        self.model_id = model_id
+        self.max_size = max_size
+        self.lru = OrderedDict()
+        self.lock = threading.Lock() # lookup and complete may run on different pipeline stages
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.memory_hits + self.db_hits + self.misses
+        return (self.memory_hits + self.db_hits) / total if total else 0.0
+
+    def _remember(self, key: str, scores: tuple[float, float, float]):
+        self.lru[key] = scores
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.max_size:
+            self.lru.popitem(last=False)
+
+    def lookup(self, inputs: List[Dict[str, str]]) -> CacheLookup:
+        """Resolve the inputs against both cache levels, collecting the distinct texts still to score"""
+        keys = [text_hash(d["body"]) for d in inputs]
+        scores = {}
+
+        with self.lock:
+            for key in set(keys):
+                if key in self.lru:
+                    self.lru.move_to_end(key)
+                    scores[key] = self.lru[key]
+
+        db_scores = self.db_manager.get_cached_sentiment(self.model_id, [k for k in set(keys) if k not in scores])
+        with self.lock:
+            for key, value in db_scores.items():
+                self._remember(key, value)
+        scores.update(db_scores)
+
+        to_predict = {}
+        for d, key in zip(inputs, keys):
+            if key not in scores and key not in to_predict:
+                to_predict[key] = {"body": d["body"]}
+        return CacheLookup(inputs, keys, scores, set(db_scores), to_predict)
+
+    def complete(self, lookup: CacheLookup, predictions: List[Dict]) -> List[Dict[str, Union[str, float]]]:
+        """Store the model predictions of lookup.to_predict and fill the scores of all the inputs"""
+        new_scores = {}
+        with self.lock:
+            for key, pred in zip(lookup.to_predict.keys(), predictions):
+                new_scores[key] = (pred["negative_score"], pred["neutral_score"], pred["positive_score"])
+                self._remember(key, new_scores[key])
+        self.db_manager.save_cached_sentiment(self.model_id, new_scores)
+        scores = {**lookup.scores, **new_scores}
+
+        counted = set()
+        for d, key in zip(lookup.inputs, lookup.keys):
+            # repeated texts of the same batch are served from memory after their first occurrence
+            if key in counted:
+                self.memory_hits += 1
+            elif key in new_scores:
+                self.misses += 1
+            elif key in lookup.db_keys:
+                self.db_hits += 1
+            else:
+                self.memory_hits += 1
+            counted.add(key)
+            d["negative_score"], d["neutral_score"], d["positive_score"] = scores[key]
+            d["pred_label"] = LABELS[max(range(3), key=lambda i: scores[key][i])]
+        return lookup.inputs
+
+    def predict(self, model, inputs: List[Dict[str, str]]) -> List[Dict[str, Union[str, float]]]:
+        """
+        Same contract as SentimentModel.predict: only texts missing from both cache
+        levels are sent to the model, and each distinct text only once.
+        """
+        lookup = self.lookup(inputs)
+        return self.complete(lookup, model.predict(lookup.texts_to_predict))
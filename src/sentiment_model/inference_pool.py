@@ -0,0 +1,104 @@
+import math
+import multiprocessing as mp
+import os
+from typing import List, Dict, Optional, Union
+
+import torch
+
+from .sentiment_model import SentimentModel
+
+# Set in the parent before forking, so every replica sees the same weights through copy-on-write
+_MODEL: Optional[SentimentModel] = None
+
+
+def _init_replica(counter, threads_per_replica: int, interop_threads: int, pin_cores: bool):
+    """Configure torch threading of a replica and pin it to its own block of cores"""
+    with counter.get_lock():
+        replica_index = counter.value
+        counter.value += 1
+
+    torch.set_num_threads(threads_per_replica)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        # can only be set once per process, keep the inherited value
+        pass
+
+    if pin_cores and hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        first = (replica_index * threads_per_replica) % len(cores)
+        os.sched_setaffinity(0, cores[first:first + threads_per_replica] or cores)
+
+
+def _predict_chunk(chunk: List[Dict[str, str]]) -> List[tuple]:
+    preds = _MODEL.predict(chunk)
+    return [(d["negative_score"], d["neutral_score"], d["positive_score"], d["pred_label"]) for d in preds]
+
+
+class InferencePool:
+    """
+    Multi-process inference: n_replicas forked copies of a SentimentModel, each running
+    threads_per_replica torch threads, fed from the shared task queue of a process pool.
+    The model is loaded once in the parent and shared copy-on-write with the replicas.
+
+    Same predict contract as SentimentModel, and tokenize / predict_tokenized so it can be
+    used as the model of a SentimentLabeler (tokenization then happens in the replicas).
+    Only the torch backends are supported: the parent must not run inference before forking.
+    """
+
+    def __init__(
+        self,
+        model: SentimentModel,
+        n_replicas: int = int(os.getenv("SENTIMENT_REPLICAS", "1")),
+        threads_per_replica: int = int(os.getenv("SENTIMENT_THREADS_PER_REPLICA", "1")),
+        interop_threads: int = 1,
+        pin_cores: bool = True,
+        chunks_per_replica: int = 4
+    ):
+        global _MODEL
+        if model.backend == "onnx":
+            raise ValueError("InferencePool only supports the torch backends")
+        if model.device != "cpu":
+            raise ValueError("InferencePool is meant for CPU inference")
+
+        _MODEL = model
+        self.model = model
+        self.model_id = model.model_id
+        self.model_version = model.model_version
+        self.n_replicas = n_replicas
+        self.threads_per_replica = threads_per_replica
+        self.chunks_per_replica = chunks_per_replica
+        self.pool = mp.get_context("fork").Pool(
+            processes=n_replicas,
+            initializer=_init_replica,
+            initargs=(mp.Value("i", 0), threads_per_replica, interop_threads, pin_cores)
+        )
+
+    def predict(self, inputs: List[Dict[str, str]]) -> List[Dict[str, Union[str, float]]]:
+        if not inputs:
+            return inputs
+        # similar lengths in the same chunk keep the padding low inside the replicas
+        order = sorted(range(len(inputs)), key=lambda i: len(inputs[i]["body"] or ""))
+        chunk_size = math.ceil(len(inputs) / (self.n_replicas * self.chunks_per_replica))
+        chunks = [order[i:i + chunk_size] for i in range(0, len(order), chunk_size)]
+
+        results = self.pool.map(_predict_chunk, [[{"body": inputs[i]["body"]} for i in chunk] for chunk in chunks])
+        for chunk, scores in zip(chunks, results):
+            for i, (negative, neutral, positive, label) in zip(chunk, scores):
+                d = inputs[i]
+                d["negative_score"] = negative
+                d["neutral_score"] = neutral
+                d["positive_score"] = positive
+                d["pred_label"] = label
+        return inputs
+
+    def tokenize(self, inputs: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        # the replicas tokenize their own chunks
+        return inputs
+
+    def predict_tokenized(self, inputs: List[Dict[str, str]], batches) -> List[Dict[str, Union[str, float]]]:
+        return self.predict(inputs)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
@@ -0,0 +1,122 @@
+import os
+import time
+from typing import TYPE_CHECKING, Optional
+
+import requests
+
+from .inference_cache import InferenceCache
+from .prefilter import TrivialCommentFilter
+from .registry import DEFAULT_MODEL_VERSION, get_model_spec
+
+if TYPE_CHECKING:
+    from .sentiment_model import SentimentModel
+
+
+def active_sentiment_model(db_manager, **kwargs) -> "SentimentModel":
+    """Load the active model version, registering the default one on the first run"""
+    # torch and transformers are only imported when a model is loaded
+    from .sentiment_model import SentimentModel
+
+    model_version = db_manager.ensure_active_model_version(
+        DEFAULT_MODEL_VERSION, get_model_spec(DEFAULT_MODEL_VERSION)["hf_model"]
+    )
+    return SentimentModel(model_version=model_version, **kwargs)
+
+
+class SentimentLabeler:
+    """
+    One labeling step of the sentiment pipeline: claim unlabeled comments, skip the trivial
+    ones, score the rest through the inference cache, write them back and publish the deltas.
+    Holds the model, so a long-running process pays the model load only once.
+
+    In backfill mode it claims the comments the model version has not scored yet (optionally
+    only in some subreddits) and stores the scores in CommentSentiment only, leaving the
+    Comment rows, which belong to the active version, untouched.
+    """
+
+    def __init__(
+        self,
+        db_manager,
+        model: Optional["SentimentModel"] = None,
+        db_batch_size: int = 128,
+        api_url: Optional[str] = os.getenv("API_URL"),
+        backfill: bool = False,
+        subreddits: Optional[list[str]] = None
+    ):
+        self.db_manager = db_manager
+        self.model = model or active_sentiment_model(db_manager)
+        self.model_version = self.model.model_version
+        self.backfill = backfill
+        self.subreddits = subreddits
+        self.cache = InferenceCache(db_manager, self.model.model_id)
+        self.prefilter = TrivialCommentFilter()
+        self.db_batch_size = db_batch_size
+        self.api_url = api_url
+
+        self.processed = 0
+        self.inference_seconds = 0.0
+        # set when another version got activated: this one no longer labels new comments
+        self.superseded_by: Optional[str] = None
+
+    def publish_sentiment_deltas(self, predictions: list[dict]):
+        """Push the per-subreddit deltas of a written batch to the API, so open dashboards update live"""
+        if not self.api_url:
+            return
+        deltas = self.db_manager.get_sentiment_deltas([pred["comment_id"] for pred in predictions])
+        if not deltas:
+            return
+        try:
+            requests.post(f"{self.api_url}/events/sentiment", json=deltas, timeout=5)
+        except requests.exceptions.RequestException as e:
+            # live updates are best effort, the dashboards still pick the data up on refresh
+            print(f"Could not publish sentiment deltas: {e}")
+
+    def claim(self, limit: int, exclude_ids: Optional[set[str]] = None) -> list[dict]:
+        """Return the next comments to label"""
+        if self.backfill:
+            return self.db_manager.get_comments_missing_version(
+                self.model_version, limit=limit, subreddits=self.subreddits, exclude_ids=exclude_ids
+            )
+        # after a switch-over this version's writes no longer label the Comment rows, so claiming
+        # would return the same comments again and again: stop and let the worker reload
+        active = self.db_manager.get_active_model_version()
+        if active is not None and active != self.model_version:
+            self.superseded_by = active
+            return []
+        return self.db_manager.get_unlabeled_comments(limit=limit, exclude_ids=exclude_ids)
+
+    def write_predictions(self, predictions: list[dict]):
+        for i in range(0, len(predictions), self.db_batch_size):
+            batch = predictions[i:i + self.db_batch_size]
+            if self.backfill:
+                self.db_manager.save_comment_sentiments(self.model_version, batch)
+            else:
+                self.db_manager.update_comments_with_sentiment(batch, model_version=self.model_version)
+                self.publish_sentiment_deltas(batch)
+            print(f"Loaded {len(batch)} {self.model_version} predictions to the database...")
+
+    def label(self, comments: list[dict]) -> list[dict]:
+        """Prefilter and score a set of comments, returning the predictions to write"""
+        to_model, excluded = self.prefilter.split(comments)
+
+        start_time = time.time()
+        # the whole work set goes through the cache at once, so the model can bucket the misses by length
+        predictions = self.cache.predict(self.model, to_model) + excluded
+        self.inference_seconds += time.time() - start_time
+        return predictions
+
+    def run_once(self, limit: int = 512) -> int:
+        """Label one batch of unlabeled comments, return how many were processed"""
+        comments = self.claim(limit)
+        if not comments:
+            return 0
+        print(f"Found {len(comments)} comments to process...")
+
+        predictions = self.label(comments)
+        print(f"Prefilter {self.prefilter.summary()}")
+        print(f"Cache: {self.cache.misses} inferred, {self.cache.memory_hits + self.cache.db_hits} "
+              f"from cache (hit rate {self.cache.hit_rate:.1%})")
+
+        self.write_predictions(predictions)
+        self.processed += len(predictions)
+        return len(predictions)
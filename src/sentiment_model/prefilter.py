@@ -0,0 +1,87 @@
+import os
+import re
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
+
+from reddit_db.models import EXCLUDED_LABEL
+
+URL_ONLY_PATTERN = re.compile(r"(\s*https?://\S+\s*)+")
+REMOVED_BODIES = {"[deleted]", "[removed]"}
+
+
+class TrivialCommentFilter:
+    """
+    Pre-classification stage of the sentiment pipeline.
+    Comments matching one of the enabled rules carry no sentiment worth a forward pass:
+    they are labeled EXCLUDED_LABEL, with no scores, and left out of the aggregates.
+
+    Rules (checked in this order, the first match is counted):
+    - empty: nothing left after stripping whitespace
+    - removed: "[deleted]" / "[removed]" bodies
+    - url_only: only links
+    - no_text: no letters or digits (emoji, punctuation)
+    - too_short: fewer than min_chars characters
+    """
+
+    RULES = ["empty", "removed", "url_only", "no_text", "too_short"]
+
+    def __init__(
+        self,
+        rules: Optional[List[str]] = None,
+        min_chars: int = 2
+    ):
+        if rules is None:
+            env_rules = os.getenv("PREFILTER_RULES")
+            rules = [r.strip() for r in env_rules.split(",") if r.strip()] if env_rules is not None else self.RULES
+        unknown = set(rules) - set(self.RULES)
+        if unknown:
+            raise ValueError(f"Unknown prefilter rules {sorted(unknown)}, expected some of {self.RULES}")
+        self.rules = [r for r in self.RULES if r in rules]
+        self.min_chars = min_chars
+
+        self.checked = 0
+        self.rule_counts = Counter()
+
+    def match(self, body: Optional[str]) -> Optional[str]:
+        """Return the first enabled rule matching the comment body, None if it needs the model"""
+        text = (body or "").strip()
+        checks = {
+            "empty": lambda: not text,
+            "removed": lambda: text.lower() in REMOVED_BODIES,
+            "url_only": lambda: URL_ONLY_PATTERN.fullmatch(text) is not None,
+            "no_text": lambda: not any(c.isalnum() for c in text),
+            "too_short": lambda: len(text) < self.min_chars,
+        }
+        for rule in self.rules:
+            if checks[rule]():
+                return rule
+        return None
+
+    def split(self, inputs: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], List[Dict]]:
+        """
+        Split comments into the ones to send to the model and the excluded ones.
+        Excluded comments are returned already labeled, ready for update_comments_with_sentiment.
+        """
+        to_model = []
+        excluded = []
+        for d in inputs:
+            self.checked += 1
+            rule = self.match(d["body"])
+            if rule is None:
+                to_model.append(d)
+                continue
+            self.rule_counts[rule] += 1
+            d["negative_score"] = None
+            d["neutral_score"] = None
+            d["positive_score"] = None
+            d["pred_label"] = EXCLUDED_LABEL
+            excluded.append(d)
+        return to_model, excluded
+
+    @property
+    def skip_rate(self) -> float:
+        return sum(self.rule_counts.values()) / self.checked if self.checked else 0.0
+
+    def summary(self) -> str:
+        counts = ", ".join(f"{rule}={self.rule_counts[rule]}" for rule in self.rules)
+        return f"skipped {sum(self.rule_counts.values())}/{self.checked} comments ({self.skip_rate:.1%}): {counts}"
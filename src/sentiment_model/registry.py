@@ -0,0 +1,26 @@
+# Named sentiment model versions. Scores are stored per version (CommentSentiment), so a new
+# version can be backfilled and compared before becoming the active one.
+# labels: the meaning of each logit of the model, in output order
+MODEL_REGISTRY = {
+    "twitter-roberta-v1": {
+        "hf_model": "cardiffnlp/twitter-roberta-base-sentiment",
+        "labels": ["negative", "neutral", "positive"],
+    },
+    "twitter-roberta-latest": {
+        "hf_model": "cardiffnlp/twitter-roberta-base-sentiment-latest",
+        "labels": ["negative", "neutral", "positive"],
+    },
+    # distilled, roughly half the FLOPs of the RoBERTa base models
+    "distilbert-student-v1": {
+        "hf_model": "lxyuan/distilbert-base-multilingual-cased-sentiments-student",
+        "labels": ["positive", "neutral", "negative"],
+    },
+}
+
+DEFAULT_MODEL_VERSION = "twitter-roberta-v1"
+
+
+def get_model_spec(model_version: str) -> dict:
+    if model_version not in MODEL_REGISTRY:
+        raise ValueError(f"Unknown model version {model_version}, expected one of {list(MODEL_REGISTRY)}")
+    return MODEL_REGISTRY[model_version]
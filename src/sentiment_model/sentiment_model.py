@@ -1,40 +1,193 @@
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import transformers
 import torch
-import pandas as pd
-from typing import List, Dict, Union
+import fcntl
+import os
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Union
+
+from .registry import DEFAULT_MODEL_VERSION, get_model_spec
+
+BACKENDS = ["torch", "torch-int8", "onnx"]
+ONNX_OPSET = 17
 
 class SentimentModel:
-    def __init__(self):
-        self.model_name = "cardiffnlp/twitter-roberta-base-sentiment"
+    """
+    Sentiment classifier for one of the model versions of the registry, with a selectable inference backend:
+    - torch: the fp32 PyTorch model (on GPU if available)
+    - torch-int8: PyTorch with dynamic int8 quantization of the Linear layers (CPU)
+    - onnx: an ONNX Runtime graph exported once and cached in onnx_cache_dir (CPU)
+    """
+    def __init__(
+        self,
+        model_version: str = DEFAULT_MODEL_VERSION,
+        max_batch_tokens: int = 16384,
+        max_batch_size: int = 256,
+        max_length: int = 512,
+        backend: str = os.getenv("SENTIMENT_BACKEND", "torch"),
+        onnx_cache_dir: str = os.getenv("ONNX_CACHE_DIR", "models/onnx"),
+        num_threads: Optional[int] = None
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+        self.backend = backend
+        self.model_version = model_version
+        spec = get_model_spec(model_version)
+        self.model_name = spec["hf_model"]
+        self.model_id = f"{model_version}:{backend}" # backends give slightly different scores
+        # position of the negative, neutral and positive logits in the model output
+        self.score_index = [spec["labels"].index(label) for label in ["negative", "neutral", "positive"]]
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
         self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
         self.model.eval()
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = "cuda" if torch.cuda.is_available() and backend == "torch" else "cpu"
         self.model.to(self.device)
-        self.batch_size = 32
 
-    def predict(self, inputs: List[Dict[str, str]]) -> List[Dict[str, Union[str, float]]]:
-        for i in range(0, len(inputs), self.batch_size):
-            batch_dicts = inputs[i:i + self.batch_size]
-            batch_texts = [d['body'] for d in batch_dicts]
-            batch_tokenized = self.tokenizer(
-                batch_texts,
-                return_tensors="pt",
-                padding="max_length",
-                truncation=True,
-                max_length=512
+        self.onnx_session = None
+        # onnx runtime threads, the torch setting of the process by default
+        self.num_threads = num_threads or torch.get_num_threads()
+        if backend == "torch-int8":
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif backend == "onnx":
+            self.onnx_session = self.load_onnx_session(Path(onnx_cache_dir))
+
+        # A batch is sized by its padded token count (n_texts * longest text) instead of a
+        # fixed number of texts: short comments are packed together, long ones get small batches.
+        # The default budget matches the old fixed 32 x 512 batches, so peak memory is unchanged.
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_length = max_length
+
+        self.last_padding_ratio = 0.0 # share of pad tokens in the last predict call
+
+    def export_onnx(self, onnx_path: Path):
+        """Export the PyTorch model to ONNX with dynamic batch and sequence axes"""
+        onnx_path.parent.mkdir(parents=True, exist_ok=True)
+        input_names = list(self.tokenizer.model_input_names)
+        dummy = self.tokenizer(["export"], return_tensors="pt")
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["logits"] = {0: "batch"}
+        torch.onnx.export(
+            self.model,
+            tuple(dummy[name] for name in input_names),
+            str(onnx_path),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET
+        )
+
+    def load_onnx_session(self, cache_dir: Path):
+        """
+        Load the ONNX Runtime session, exporting the model first if it is not cached yet.
+        The export goes to a temporary file renamed into place, under a file lock, so a crashed
+        export is never reused and concurrent processes export only once. Exports of another
+        opset or transformers version get their own cache entry.
+        """
+        import onnxruntime as ort
+
+        model_dir = cache_dir / self.model_name.replace("/", "__") / f"opset{ONNX_OPSET}-transformers{transformers.__version__}"
+        onnx_path = model_dir / "model.onnx"
+        if not onnx_path.exists():
+            model_dir.mkdir(parents=True, exist_ok=True)
+            with open(model_dir / "export.lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if not onnx_path.exists():
+                    print(f"Exporting {self.model_name} to {onnx_path}")
+                    tmp_path = model_dir / f"model.onnx.tmp-{os.getpid()}"
+                    try:
+                        self.export_onnx(tmp_path)
+                        os.replace(tmp_path, onnx_path)
+                    finally:
+                        tmp_path.unlink(missing_ok=True)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.num_threads
+        options.inter_op_num_threads = 1
+        return ort.InferenceSession(str(onnx_path), sess_options=options, providers=["CPUExecutionProvider"])
+
+    def forward(self, batch_tokenized: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """Return the softmax scores of a padded batch with the selected backend"""
+        if self.onnx_session is not None:
+            input_names = [i.name for i in self.onnx_session.get_inputs()]
+            logits = self.onnx_session.run(["logits"], {k: batch_tokenized[k].numpy() for k in input_names})[0]
+            return torch.nn.functional.softmax(torch.from_numpy(logits), dim=-1)
+
+        batch_tokenized = {k: v.to(self.device) for k, v in batch_tokenized.items()}
+        with torch.no_grad():
+            outputs = self.model(**batch_tokenized)
+            return torch.nn.functional.softmax(outputs.logits, dim=-1)
+
+    def token_budget_batches(self, lengths: List[int]) -> List[List[int]]:
+        """
+        Group input indexes into batches sorted by token length.
+        Each batch holds at most max_batch_size texts and max_batch_tokens padded tokens.
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batches = []
+        batch = []
+        for i in order:
+            # inputs are sorted, so the current text is the longest one of the batch
+            padded_tokens = (len(batch) + 1) * lengths[i]
+            if batch and (padded_tokens > self.max_batch_tokens or len(batch) >= self.max_batch_size):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def tokenize(self, inputs: List[Dict[str, str]]) -> List[Tuple[List[int], Dict[str, torch.Tensor]]]:
+        """
+        Tokenize the inputs once, bucket them by length and pad each batch to its longest text.
+        Returns (input indexes, padded batch) pairs, ready for predict_tokenized.
+        """
+        if not inputs:
+            return []
+
+        encodings = self.tokenizer(
+            [d['body'] for d in inputs],
+            truncation=True,
+            max_length=self.max_length
+        )
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+
+        batches = []
+        padded_tokens = 0
+        for batch_indexes in self.token_budget_batches(lengths):
+            batch_tokenized = self.tokenizer.pad(
+                [{k: encodings[k][i] for k in encodings.keys()} for i in batch_indexes],
+                padding="longest",
+                return_tensors="pt"
             )
-            batch_tokenized = {k: v.to(self.device) for k, v in batch_tokenized.items()}
+            padded_tokens += batch_tokenized["input_ids"].numel()
+            batches.append((batch_indexes, dict(batch_tokenized)))
+
+        self.last_padding_ratio = 1 - sum(lengths) / padded_tokens
+        return batches
 
-            with torch.no_grad():
-                outputs = self.model(**batch_tokenized)
-                scores = torch.nn.functional.softmax(outputs.logits, dim=-1)
+    def predict_tokenized(
+        self,
+        inputs: List[Dict[str, str]],
+        batches: List[Tuple[List[int], Dict[str, torch.Tensor]]]
+    ) -> List[Dict[str, Union[str, float]]]:
+        """Run the model on the output of tokenize and write the scores into the input dicts"""
+        for batch_indexes, batch_tokenized in batches:
+            scores = self.forward(batch_tokenized)
 
-            for d, score_vector in zip(batch_dicts, scores):
+            scores = scores[:, self.score_index]
+            for i, score_vector in zip(batch_indexes, scores):
+                d = inputs[i]
                 d['negative_score'] = score_vector[0].item()
                 d['neutral_score'] = score_vector[1].item()
                 d['positive_score'] = score_vector[2].item()
                 d['pred_label'] = ["negative", "neutral", "positive"][torch.argmax(score_vector).item()]
-
         return inputs
 
+    def predict(self, inputs: List[Dict[str, str]]) -> List[Dict[str, Union[str, float]]]:
+        """
+        Add negative_score, neutral_score, positive_score and pred_label to each input dict.
+        Inputs are tokenized once, bucketed by length and padded to the longest text of each
+        batch; the returned list keeps the original order.
+        """
+        return self.predict_tokenized(inputs, self.tokenize(inputs))
@@ -0,0 +1,185 @@
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+from .labeler import SentimentLabeler
+
+STAGES = ["fetch", "tokenize", "infer", "write"]
+_DONE = object()
+
+
+class StageStats:
+    """Time a stage spent working, waiting for input (starved) and waiting to hand over output (blocked)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.starved_seconds = 0.0
+        self.blocked_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "busy_seconds": self.busy_seconds,
+            "starved_seconds": self.starved_seconds,
+            "blocked_seconds": self.blocked_seconds,
+        }
+
+
+class StagedSentimentPipeline:
+    """
+    Producer/consumer version of SentimentLabeler.run_once: claiming from the DB, tokenization,
+    inference and write-back each run on their own thread, connected by bounded queues.
+    While the model scores a batch the next one is already being fetched and tokenized, and
+    the previous one written back.
+    """
+
+    def __init__(
+        self,
+        labeler: SentimentLabeler,
+        claim_size: int = 512,
+        queue_size: int = 2,
+        on_batch_written: Optional[Callable[[int, float], None]] = None
+    ):
+        self.labeler = labeler
+        self.claim_size = claim_size
+        self.queue_size = queue_size
+        self.on_batch_written = on_batch_written
+
+        self.stats = {name: StageStats(name) for name in STAGES}
+        self.in_flight = set() # claimed comment ids not written back yet
+        self.in_flight_lock = threading.Lock()
+        self.abort = threading.Event()
+        self.errors = []
+
+    def _get(self, q: queue.Queue, stats: StageStats):
+        start_time = time.time()
+        while not self.abort.is_set():
+            try:
+                item = q.get(timeout=0.5)
+                stats.starved_seconds += time.time() - start_time
+                return item
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _put(self, q: queue.Queue, item, stats: StageStats):
+        start_time = time.time()
+        while not self.abort.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                stats.blocked_seconds += time.time() - start_time
+                return
+            except queue.Full:
+                continue
+
+    def _stage(self, name: str, work: Callable, q_in: Optional[queue.Queue], q_out: Optional[queue.Queue]):
+        """Run work(item) on every item of q_in, or on None until it returns None if this is the first stage"""
+        stats = self.stats[name]
+        try:
+            while not self.abort.is_set():
+                item = self._get(q_in, stats) if q_in is not None else None
+                if item is _DONE:
+                    break
+                start_time = time.time()
+                result = work(item)
+                stats.busy_seconds += time.time() - start_time
+                if result is None:
+                    if q_in is None:
+                        break # the fetch stage has nothing more to claim
+                    continue
+                stats.batches += 1
+                stats.items += len(result["comments"])
+                if q_out is not None:
+                    self._put(q_out, result, stats)
+        except Exception as e:
+            print(f"Error in {name} stage: {e}")
+            self.errors.append(e)
+            self.abort.set()
+        finally:
+            if q_out is not None:
+                self._put(q_out, _DONE, stats)
+
+    def run(self, stop_event: Optional[threading.Event] = None, idle_wait: Optional[Callable[[], None]] = None) -> dict:
+        """
+        Run the pipeline and return per-stage stats.
+        Without idle_wait it stops once the backlog is drained; with it, it calls idle_wait
+        whenever nothing is left to claim and keeps going until stop_event is set.
+        Claimed batches are always written back before returning.
+        """
+        stop_event = stop_event or threading.Event()
+        labeler = self.labeler
+
+        def fetch(_):
+            while not stop_event.is_set():
+                with self.in_flight_lock:
+                    exclude_ids = set(self.in_flight)
+                comments = labeler.claim(self.claim_size, exclude_ids=exclude_ids)
+                if comments:
+                    with self.in_flight_lock:
+                        self.in_flight.update(c["comment_id"] for c in comments)
+                    return {"comments": comments, "claimed_at": time.time()}
+                if idle_wait is None:
+                    return None
+                start_time = time.time()
+                idle_wait()
+                # waiting for new comments is not work, count it as starvation
+                waited = time.time() - start_time
+                self.stats["fetch"].starved_seconds += waited
+                self.stats["fetch"].busy_seconds -= waited
+            return None
+
+        def tokenize(batch):
+            to_model, batch["excluded"] = labeler.prefilter.split(batch["comments"])
+            batch["lookup"] = labeler.cache.lookup(to_model)
+            batch["tokenized"] = labeler.model.tokenize(batch["lookup"].texts_to_predict)
+            return batch
+
+        def infer(batch):
+            start_time = time.time()
+            lookup = batch["lookup"]
+            preds = labeler.model.predict_tokenized(lookup.texts_to_predict, batch["tokenized"])
+            batch["predictions"] = labeler.cache.complete(lookup, preds) + batch["excluded"]
+            labeler.inference_seconds += time.time() - start_time
+            return batch
+
+        def write(batch):
+            labeler.write_predictions(batch["predictions"])
+            labeler.processed += len(batch["predictions"])
+            with self.in_flight_lock:
+                self.in_flight.difference_update(c["comment_id"] for c in batch["comments"])
+            if self.on_batch_written is not None:
+                self.on_batch_written(len(batch["predictions"]), time.time() - batch["claimed_at"])
+            return batch
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(STAGES) - 1)]
+        works = [fetch, tokenize, infer, write]
+        threads = []
+        for i, name in enumerate(STAGES):
+            q_in = queues[i - 1] if i > 0 else None
+            q_out = queues[i] if i < len(queues) else None
+            thread = threading.Thread(target=self._stage, args=(name, works[i], q_in, q_out), name=f"sentiment-{name}")
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        if self.errors:
+            raise self.errors[0]
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def report(self) -> str:
+        """Per-stage timings, the stage with the most busy time is the bottleneck"""
+        lines = []
+        for name, stats in self.stats.items():
+            lines.append(
+                f"{name:>8}: {stats.batches} batches, {stats.items} comments, busy {stats.busy_seconds:.2f}s, "
+                f"starved {stats.starved_seconds:.2f}s, blocked {stats.blocked_seconds:.2f}s"
+            )
+        bottleneck = max(self.stats.values(), key=lambda s: s.busy_seconds)
+        lines.append(f"Bottleneck: {bottleneck.name}")
+        return "\n".join(lines)
@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .labeler import SentimentLabeler
+from .staged_pipeline import StagedSentimentPipeline
+
+# exit code asking the supervisor to restart the worker, e.g. to load a new active model
+RESTART_EXIT_CODE = 3
+
+
+class SentimentWorker:
+    """
+    Keeps the staged sentiment pipeline running: drains the unlabeled comments, backs off
+    while there is nothing to do, and stops when another model version gets activated.
+    """
+
+    def __init__(
+        self,
+        labeler: SentimentLabeler,
+        claim_size: int = 512,
+        min_idle_sleep: float = 1.0,
+        max_idle_sleep: float = 60.0,
+        version_check_interval: float = 30.0
+    ):
+        self.labeler = labeler
+        self.claim_size = claim_size
+        self.min_idle_sleep = min_idle_sleep
+        self.max_idle_sleep = max_idle_sleep
+        self.idle_sleep = min_idle_sleep
+
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.started_at = time.time()
+        self.batches = 0
+        self.errors = 0
+        self.last_batch = None
+        self.pipeline = None
+
+        self.version_check_interval = version_check_interval
+        self.last_version_check = time.time()
+        self.restart_required = False
+
+    def stop(self, *_):
+        print("Stopping sentiment worker after the claimed batches...")
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def wake(self):
+        """New comments are in the database: stop backing off and claim them now"""
+        self.wake_event.set()
+
+    def status(self) -> dict:
+        uptime = time.time() - self.started_at
+        return {
+            "status": "stopping" if self.stop_event.is_set() else "running",
+            "model_id": self.labeler.model.model_id,
+            "model_version": self.labeler.model_version,
+            "uptime_seconds": uptime,
+            "batches": self.batches,
+            "errors": self.errors,
+            "processed": self.labeler.processed,
+            "comments_per_sec": self.labeler.processed / uptime if uptime else 0.0,
+            "inference_comments_per_sec": (
+                self.labeler.cache.misses / self.labeler.inference_seconds if self.labeler.inference_seconds else 0.0
+            ),
+            "cache_hit_rate": self.labeler.cache.hit_rate,
+            "prefilter_skip_rate": self.labeler.prefilter.skip_rate,
+            "idle_sleep_seconds": self.idle_sleep,
+            "last_batch": self.last_batch,
+            "stages": {name: stats.as_dict() for name, stats in self.pipeline.stats.items()} if self.pipeline else {},
+        }
+
+    def on_batch_written(self, n_processed: int, seconds: float):
+        """Called by the write stage, seconds go from the claim to the end of the write-back"""
+        self.batches += 1
+        self.last_batch = {
+            "size": n_processed,
+            "seconds": seconds,
+            "finished_at": time.time(),
+        }
+        print(f"Labeled {n_processed} comments in {seconds:.2f} seconds.")
+        self.idle_sleep = self.min_idle_sleep
+        self.check_active_version()
+
+    def idle_wait(self):
+        """Nothing to do: wait longer and longer, up to max_idle_sleep, or until woken up"""
+        if self.wake_event.wait(self.idle_sleep):
+            self.wake_event.clear()
+            self.idle_sleep = self.min_idle_sleep
+        else:
+            self.idle_sleep = min(self.idle_sleep * 2, self.max_idle_sleep)
+        self.check_active_version()
+
+    def check_active_version(self):
+        """Stop for a restart if another model version has been activated meanwhile"""
+        # the labeler saw the switch-over when claiming: no need to wait for the periodic check
+        active = self.labeler.superseded_by
+        if active is None:
+            if time.time() - self.last_version_check < self.version_check_interval:
+                return
+            self.last_version_check = time.time()
+            active = self.labeler.db_manager.get_active_model_version()
+        if active is not None and active != self.labeler.model_version:
+            print(f"Active model version is now {active}, restarting to load it...")
+            self.restart_required = True
+            self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.pipeline = StagedSentimentPipeline(
+                self.labeler,
+                claim_size=self.claim_size,
+                on_batch_written=self.on_batch_written
+            )
+            try:
+                self.pipeline.run(self.stop_event, idle_wait=self.idle_wait)
+            except Exception as e:
+                # e.g. the database restarting, retry after a backoff instead of dying
+                print(f"Error in sentiment worker: {e}")
+                self.errors += 1
+                self.idle_wait()
+            print(self.pipeline.report())
+        print("Sentiment worker stopped.")
+
+
+def serve_health(worker: SentimentWorker, port: int) -> ThreadingHTTPServer:
+    """Expose the worker status on GET /health in a background thread"""
+
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/health":
+                self.send_error(404)
+                return
+            body = json.dumps(worker.status()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), HealthHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
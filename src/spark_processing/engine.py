@@ -0,0 +1,52 @@
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from .manifest import FileManifest
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ["auto", "spark", "pandas"]
+
+
+def pending_input_bytes(data_path: Path, incremental: bool) -> int:
+    """Size of the raw CSV files the next run would read"""
+    total = 0
+    for kind in ["posts", "comments"]:
+        csv_files = sorted((data_path / "raw" / kind).glob("*.csv"))
+        if incremental:
+            csv_files = FileManifest(data_path / "processed" / "manifests" / f"{kind}.json").new_files(csv_files)
+        total += sum(f.stat().st_size for f in csv_files)
+    return total
+
+
+def select_processor(
+    data_path: str,
+    engine: Optional[str] = None,
+    spark_min_bytes: Optional[int] = None,
+    **kwargs
+):
+    """
+    Return the processor for the pending raw data: the in-process pandas engine below
+    spark_min_bytes of input, where starting a JVM costs more than the processing, Spark above.
+    The crossover on your machine is measured by benchmarks/processing_engines.py.
+    """
+    # read at call time, so a .env loaded after the import is honoured
+    engine = engine or os.getenv("PROCESSING_ENGINE", "auto")
+    if spark_min_bytes is None:
+        spark_min_bytes = int(os.getenv("SPARK_MIN_INPUT_MB", "256")) * 2**20
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown processing engine {engine}, expected one of {ENGINES}")
+    data_path = Path(data_path)
+    if engine == "auto":
+        input_bytes = pending_input_bytes(data_path, kwargs.get("incremental", False))
+        engine = "spark" if input_bytes >= spark_min_bytes else "pandas"
+        logger.info("%.1f MB of raw input, using the %s engine", input_bytes / 2**20, engine)
+
+    # imported here, so the pandas engine never needs pyspark or a JVM
+    if engine == "spark":
+        from .spark_processing import SparkProcessor
+        return SparkProcessor(data_path=data_path, **kwargs)
+    from .pandas_processing import PandasProcessor
+    return PandasProcessor(data_path=data_path, **kwargs)
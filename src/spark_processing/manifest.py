@@ -0,0 +1,61 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+def file_checksum(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileManifest:
+    """
+    JSON record of the raw files already processed: path, size, mtime and checksum.
+    Files whose path, size and mtime match an entry are skipped without reading them;
+    otherwise the checksum decides (a touched or renamed file with the same content is
+    not processed twice, a rewritten file is).
+    """
+
+    def __init__(self, manifest_path: Path):
+        self.manifest_path = Path(manifest_path)
+        self.entries: Dict[str, dict] = {}
+        if self.manifest_path.exists():
+            self.entries = json.loads(self.manifest_path.read_text())
+
+    def _describe(self, path: Path) -> dict:
+        stat = path.stat()
+        return {"path": str(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+    def new_files(self, files: List[Path]) -> List[Path]:
+        """Return the files not processed yet"""
+        known_checksums = {entry["checksum"] for entry in self.entries.values()}
+        result = []
+        for path in files:
+            info = self._describe(path)
+            entry = self.entries.get(str(path))
+            if entry and entry["size"] == info["size"] and entry["mtime"] == info["mtime"]:
+                continue
+            if file_checksum(path) in known_checksums:
+                logger.info("Skipping %s: same content already processed", path)
+                continue
+            result.append(path)
+        return result
+
+    def mark_processed(self, files: List[Path]):
+        """Record the files and save the manifest atomically, call it only once their output is written"""
+        for path in files:
+            info = self._describe(path)
+            info["checksum"] = file_checksum(path)
+            self.entries[str(path)] = info
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.entries, indent=2))
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,316 @@
+import logging
+import shutil
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from .manifest import FileManifest
+
+logger = logging.getLogger(__name__)
+
+# Same columns, order and types as POST_SCHEMA / COMMENT_SCHEMA of the Spark engine.
+# Like Spark with an explicit schema, the raw CSV columns are matched by position.
+POST_COLUMNS = {
+    "post_id": "string",
+    "subreddit": "string",
+    "title": "string",
+    "author": "string",
+    "score": "Int32",
+    "num_comments": "Int32",
+    "created_utc": "Int64",
+    "selftext": "string",
+    "fetch_type": "string",
+    "author_comment_karma": "Int32",
+    "author_link_karma": "Int32",
+}
+
+COMMENT_COLUMNS = {
+    "comment_id": "string",
+    "post_id": "string",
+    "parent_id": "string",
+    "author": "string",
+    "body": "string",
+    "score": "Int32",
+    "created_utc": "Int64",
+    "author_comment_karma": "Int32",
+    "author_link_karma": "Int32",
+}
+
+# Java's \s is ASCII only, Python's would also match unicode spaces
+JAVA_WHITESPACE = r"[ \t\n\x0b\f\r]+"
+
+
+# words longer than one character with upper case letters and no lower case ones (str.isupper on ASCII)
+CAPS_WORD = r"(?<![^ ])(?=[^ ]*[A-Z])[^ a-z]{2,}(?![^ ])"
+
+
+def clean_text(s: pd.Series) -> pd.Series:
+    """The text cleaning of SparkProcessor._clean_text, without the final lower()"""
+    s = s.astype("string")
+    s = s.str.replace(JAVA_WHITESPACE, " ", regex=True)
+    s = s.str.strip(" ") # Spark's trim only removes spaces
+    s = s.str.replace("\"", "'", regex=False)
+    return s.str.replace(r"[^\x00-\x7F]+", "", regex=True)
+
+
+def parse_integers(s: pd.Series, dtype: str) -> pd.Series:
+    """Unparsable or out of range numbers become nulls, like in Spark's permissive mode"""
+    values = pd.to_numeric(s.str.strip(), errors="coerce")
+    info = np.iinfo(dtype.lower())
+    values = values.where((values % 1 == 0) & values.between(info.min, info.max))
+    return values.astype(dtype)
+
+
+def spark_size(values: pd.Series) -> pd.Series:
+    """size() of a Spark array column: -1 for nulls"""
+    return values.fillna(-1).astype("int32")
+
+
+class PandasProcessor:
+    """
+    In-process engine with the same normalisation and output layout as SparkProcessor,
+    on pandas DataFrames. No JVM to start, so it is much faster on the small batches a
+    fetch cycle produces; use select_processor to pick the engine by input size.
+
+    Timestamps are converted in `timezone`, like SparkProcessor does with its session time
+    zone: both default to UTC, so the two engines give the same output on any host.
+    """
+
+    def __init__(
+        self,
+        data_path: str = "data",
+        incremental: bool = False,
+        output_format: str = "parquet",
+        compression: str = "zstd",
+        max_records_per_file: int = 500_000,
+        timezone: str = "UTC"
+    ):
+        self.data_path = Path(data_path)
+        self.raw_dir = self.data_path / "raw"
+        self.raw_posts_dir = self.raw_dir / "posts"
+        self.raw_comments_dir = self.raw_dir / "comments"
+        self.output_dir = self.data_path / "processed"
+        self.output_dir_posts = self.output_dir / "posts"
+        self.output_dir_comments = self.output_dir / "comments"
+
+        # shared with SparkProcessor, the engines can be switched between runs
+        self.incremental = incremental
+        self.manifest_dir = self.output_dir / "manifests"
+        self.posts_manifest = FileManifest(self.manifest_dir / "posts.json")
+        self.comments_manifest = FileManifest(self.manifest_dir / "comments.json")
+
+        if output_format not in ("parquet", "csv"):
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self.output_format = output_format
+        self.compression = compression
+        self.max_records_per_file = max_records_per_file
+        self.timezone = timezone
+
+    def _read_csv(self, csv_files: List[Path], columns: dict) -> pd.DataFrame:
+        frames = []
+        for f in csv_files:
+            # empty fields are nulls, like in Spark; "NA", "null"... are kept as text
+            df = pd.read_csv(
+                f, header=None, skiprows=1, dtype=str, keep_default_na=False, na_values=[""],
+                skipinitialspace=True, on_bad_lines="skip"
+            )
+            df = df.iloc[:, :len(columns)]
+            df.columns = list(columns)[:df.shape[1]]
+            frames.append(df.reindex(columns=list(columns)))
+        df = pd.concat(frames, ignore_index=True)
+        for c, dtype in columns.items():
+            if dtype == "string":
+                df[c] = df[c].astype("string")
+            else:
+                df[c] = parse_integers(df[c], dtype)
+        return df
+
+    def read_posts(self, csv_files: Optional[List[Path]] = None) -> pd.DataFrame:
+        if csv_files is None:
+            csv_files = list(self.raw_posts_dir.glob("*.csv"))
+        if not csv_files:
+            raise FileNotFoundError(f"Nessun CSV trovato in {self.raw_posts_dir}")
+        logger.info("CSV files found: %s", [str(f) for f in csv_files])
+        df = self._read_csv(csv_files, POST_COLUMNS)
+        logger.info("Read posts. Rows: %s", len(df))
+        return df
+
+    def read_comments(self, csv_files: Optional[List[Path]] = None) -> pd.DataFrame:
+        if csv_files is None:
+            csv_files = list(self.raw_comments_dir.glob("*.csv"))
+        if not csv_files:
+            raise FileNotFoundError(f"Nessun CSV trovato in {self.raw_comments_dir}")
+        logger.info("CSV files found: %s", [str(f) for f in csv_files])
+        df = self._read_csv(csv_files, COMMENT_COLUMNS)
+        logger.info("Read comments. Rows: %s", len(df))
+        return df
+
+    def _generic_normalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        if df is None:
+            raise ValueError("df is None")
+        for c in [c for c in df.columns if c.endswith("_id")]:
+            df[c] = df[c].astype("string").str.strip(" ")
+        for c in ["author_comment_karma", "author_link_karma", "score"]:
+            if c in df.columns:
+                df[c] = df[c].astype("Int64")
+        if "created_utc" in df.columns:
+            df["created_utc"] = df["created_utc"].astype("Int64")
+            created_ts = pd.to_datetime(df["created_utc"], unit="s", utc=True)
+            df["created_ts"] = created_ts.dt.tz_convert(self.timezone).dt.tz_localize(None)
+            df["created_date"] = df["created_ts"].dt.date.where(df["created_ts"].notna(), None)
+            df["created_time"] = df["created_ts"].dt.strftime("%H:%M").astype("string")
+        if "author" in df.columns:
+            df["author"] = df["author"].str.strip(" ")
+        return df
+
+    def _normalize_comments(self, df: pd.DataFrame) -> pd.DataFrame:
+        if df is None:
+            raise ValueError("df is None")
+        if "comment_id" in df.columns:
+            df = df.dropna(subset=["comment_id"]).drop_duplicates(subset=["comment_id"]).reset_index(drop=True)
+        if "body" in df.columns:
+            df["body"] = clean_text(df["body"])
+        df["num_caps_words"] = df["body"].str.count(CAPS_WORD).fillna(0).astype("int32")
+        df["body"] = df["body"].str.lower()
+        df["body_len_chars"] = df["body"].str.len().astype("Int32")
+        df["body_len_words"] = spark_size(df["body"].str.count(" ") + 1)
+        # pieces of the body split on urls, as computed by the Spark engine
+        df["num_urls"] = spark_size(df["body"].str.count(r"https?://\S+") + 1)
+        # Spark's dayofweek: 1 = Sunday ... 7 = Saturday
+        df["created_dayofweek"] = ((df["created_ts"].dt.dayofweek + 1) % 7 + 1).astype("Int32")
+        return df
+
+    def _normalize_posts(self, df: pd.DataFrame) -> pd.DataFrame:
+        if df is None:
+            raise ValueError("df is None")
+        if "num_comments" in df.columns:
+            df["num_comments"] = df["num_comments"].astype("Int64")
+        if "subreddit" in df.columns:
+            df["subreddit"] = df["subreddit"].str.strip(" ").str.lower()
+        for text_col in ["title", "selftext"]:
+            if text_col in df.columns:
+                df[text_col] = clean_text(df[text_col]).str.lower()
+        if "post_id" in df.columns:
+            df = df.dropna(subset=["post_id"]).drop_duplicates(subset=["post_id"]).reset_index(drop=True)
+        return df
+
+    def _new_raw_files(self, raw_dir: Path, manifest: FileManifest) -> List[Path]:
+        csv_files = sorted(raw_dir.glob("*.csv"))
+        new_files = manifest.new_files(csv_files)
+        logger.info("Incremental mode: %s new raw files out of %s in %s", len(new_files), len(csv_files), raw_dir)
+        return new_files
+
+    def _save(self, df: pd.DataFrame, output_dir: Path, mode: str, partition_cols: List[str]):
+        if mode == "overwrite" and output_dir.exists():
+            shutil.rmtree(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        # unique file names, so appends never replace the files of an earlier run
+        run_id = uuid.uuid4().hex
+        if self.output_format == "csv":
+            df.to_csv(output_dir / f"part-{run_id}.csv", index=False)
+            return
+        ds.write_dataset(
+            pa.Table.from_pandas(df, preserve_index=False),
+            str(output_dir),
+            format="parquet",
+            partitioning=partition_cols,
+            partitioning_flavor="hive",
+            basename_template=f"part-{run_id}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            max_rows_per_file=self.max_records_per_file,
+            max_rows_per_group=min(self.max_records_per_file, 1 << 20),
+            # Spark reads parquet timestamps in microseconds, pandas writes nanoseconds
+            file_options=ds.ParquetFileFormat().make_write_options(
+                compression=self.compression, coerce_timestamps="us", allow_truncated_timestamps=True
+            ),
+        )
+
+    def _with_subreddit(self, df_comments: pd.DataFrame) -> pd.DataFrame:
+        """Add the subreddit of each comment from the processed posts, to partition comments like posts"""
+        if self.output_format != "parquet":
+            # the csv output keeps the legacy comment columns
+            return df_comments
+        if not any(self.output_dir_posts.glob("subreddit=*")):
+            df_comments["subreddit"] = pd.Series(pd.NA, index=df_comments.index, dtype="string")
+            return df_comments
+        posts = self.read_processed_posts(columns=["post_id", "subreddit"]).drop_duplicates(subset=["post_id"])
+        return df_comments.merge(posts, on="post_id", how="left")
+
+    def read_processed_posts(
+        self,
+        subreddits: Optional[List[str]] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """Read the processed posts, only scanning the partitions matching the filters"""
+        return self._read_processed(self.output_dir_posts, subreddits, start_date, end_date, columns)
+
+    def read_processed_comments(
+        self,
+        subreddits: Optional[List[str]] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """Read the processed comments, only scanning the partitions matching the filters"""
+        return self._read_processed(self.output_dir_comments, subreddits, start_date, end_date, columns)
+
+    def _read_processed(self, output_dir: Path, subreddits, start_date, end_date, columns) -> pd.DataFrame:
+        partitioning = ds.partitioning(
+            pa.schema([("subreddit", pa.string()), ("created_date", pa.date32())]), flavor="hive"
+        )
+        dataset = ds.dataset(str(output_dir), format="parquet", partitioning=partitioning)
+        # filters on partition columns only open the matching directories
+        condition = None
+        filters = []
+        if subreddits:
+            filters.append(ds.field("subreddit").isin(subreddits))
+        if start_date:
+            filters.append(ds.field("created_date") >= pd.Timestamp(start_date).date())
+        if end_date:
+            filters.append(ds.field("created_date") <= pd.Timestamp(end_date).date())
+        for f in filters:
+            condition = f if condition is None else condition & f
+        return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+    def process_and_save_comments(self, incremental: Optional[bool] = None) -> Path:
+        incremental = self.incremental if incremental is None else incremental
+        if incremental:
+            csv_files = self._new_raw_files(self.raw_comments_dir, self.comments_manifest)
+            if not csv_files:
+                return self.output_dir_comments
+        else:
+            csv_files = sorted(self.raw_comments_dir.glob("*.csv"))
+        df_raw = self.read_comments(csv_files)
+        df_norm = self._generic_normalize(df_raw)
+        df_norm = self._normalize_comments(df_norm)
+        df_norm = self._with_subreddit(df_norm)
+        self._save(df_norm, self.output_dir_comments, "append" if incremental else "overwrite", ["subreddit", "created_date"])
+        self.comments_manifest.mark_processed(csv_files)
+        logger.info("Comments normalizzati salvati in: %s (%s raw files)", self.output_dir_comments, len(csv_files))
+        return self.output_dir_comments
+
+    def process_and_save_posts(self, incremental: Optional[bool] = None) -> Path:
+        incremental = self.incremental if incremental is None else incremental
+        if incremental:
+            csv_files = self._new_raw_files(self.raw_posts_dir, self.posts_manifest)
+            if not csv_files:
+                return self.output_dir_posts
+        else:
+            csv_files = sorted(self.raw_posts_dir.glob("*.csv"))
+        df_raw = self.read_posts(csv_files)
+        df_norm = self._generic_normalize(df_raw)
+        df_norm = self._normalize_posts(df_norm)
+        self._save(df_norm, self.output_dir_posts, "append" if incremental else "overwrite", ["subreddit", "created_date"])
+        self.posts_manifest.mark_processed(csv_files)
+        logger.info("Posts normalizzati salvati in: %s (%s raw files)", self.output_dir_posts, len(csv_files))
+        return self.output_dir_posts
+
+    def stop(self):
+        """Nothing to release, same interface as the Spark engine"""
@@ -0,0 +1,123 @@
+"""
+Backend access shared by the dashboard pages.
+
+Every page goes through one pooled HTTP session (kept for the whole server) and the reads
+are cached with st.cache_data for CACHE_TTL seconds, keyed by their arguments (subreddit,
+granularity, time window), so page reruns do not hit the backend until the data may have
+changed. Writes clear the caches they invalidate; the Refresh buttons clear them too.
+The sentiment trend is not cached: the trends page keeps it in the session and applies the
+live deltas to it, which would miss the ones of a frame up to CACHE_TTL seconds old.
+Errors are raised (and never cached): the pages show them.
+"""
+import os
+from typing import Optional
+
+import pandas as pd
+import requests
+import streamlit as st
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+
+API_URL = (os.getenv("API_URL") or "").rstrip("/")
+CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+TIMEOUT = (5, 60) # connect, read
+# time ranges (days) offered per trend granularity, the first one is the default
+TREND_RANGES = {"hourly": [4, 14, 30, 90], "daily": [30, 90, 365], "weekly": [90, 365, 730], "monthly": [365, 730, 1825]}
+# buckets per chart: about what a wide page can draw, longer ranges are downsampled by the API (LTTB)
+MAX_CHART_POINTS = 300
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """HTTP session shared by every page and browser session, with keep-alive connections"""
+    session = requests.Session()
+    retries = Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504], allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _request(path: str, **params) -> requests.Response:
+    params = {key: value for key, value in params.items() if value is not None}
+    response = get_http_session().get(f"{API_URL}/{path}", params=params or None, timeout=TIMEOUT)
+    response.raise_for_status()
+    return response
+
+
+def _get(path: str, **params):
+    return _request(path, **params).json()
+
+
+# ======================= READS ==========================
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def get_subreddits() -> list[str]:
+    return [sub["name"] for sub in _get("subreddits/")]
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def get_posts_count(subreddit: str) -> int:
+    return _get("posts/count/", subreddit=subreddit)["posts_count"]
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def get_comments_count(subreddit: str, labeled: bool = True) -> int:
+    return _get("comments/count/", subreddit=subreddit, labeled=labeled)["comments_count"]
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def get_comments_sentiment(subreddit: str) -> list[dict]:
+    """Comments of the subreddit with their sentiment scores"""
+    return _get(f"data/comments/sentiment/{subreddit}")
+
+
+def get_sentiment_trend(freq: str, subreddit: str, days: Optional[int] = None, max_points: Optional[int] = None) -> pd.DataFrame:
+    """Sentiment of the subreddit aggregated by freq (hourly, daily, weekly or monthly) over the
+    last days, downsampled by the backend to at most max_points buckets. attrs["sentiment_seq"]
+    is the last live delta already counted in it."""
+    response = _request(f"data/sentiment/{freq}/{subreddit}", days=days, max_points=max_points)
+    df = pd.DataFrame(response.json())
+    df.attrs["sentiment_seq"] = int(response.headers.get("X-Sentiment-Seq", 0))
+    return df
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def get_sentiment_comparison(
+    freq: str, subreddits: tuple[str, ...], days: Optional[int] = None, max_points: Optional[int] = None
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Sentiment of several subreddits aggregated by freq, from one backend query, in long format
+    (one row per subreddit and bucket, with a subreddit column), and the averages of every
+    subreddit over the whole range (one row per subreddit, indexed by it)"""
+    data = _get(f"data/sentiment/compare/{freq}", subreddits=list(subreddits), days=days, max_points=max_points)
+    frames = [pd.DataFrame(rows).assign(subreddit=subreddit) for subreddit, rows in data["series"].items() if rows]
+    averages = pd.DataFrame.from_dict(data["averages"], orient="index").rename_axis("subreddit")
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(), averages
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def get_stage_metrics(hours: int) -> pd.DataFrame:
+    df = pd.DataFrame(_get("metrics/stages/", hours=hours))
+    if not df.empty:
+        df["ended_datetime"] = pd.to_datetime(df["ended_datetime"])
+    return df
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def get_api_usage(hours: int) -> dict:
+    return _get("metrics/api/", hours=hours)
+
+
+# ======================= WRITES ==========================
+def add_subreddit(name: str) -> requests.Response:
+    response = get_http_session().post(f"{API_URL}/subreddits/", json={"name": name}, timeout=TIMEOUT)
+    get_subreddits.clear()
+    return response
+
+
+def delete_subreddit(name: str) -> requests.Response:
+    response = get_http_session().delete(f"{API_URL}/subreddits/{name}", timeout=TIMEOUT)
+    get_subreddits.clear()
+    return response
@@ -1,13 +1,8 @@
 import streamlit as st
-from reddit_db.db_manager import RedditDBManager
 import requests
-import os 
-from dotenv import load_dotenv
-load_dotenv()
+import data_client
 
 st.set_page_config(page_title="Select Subreddit", page_icon="🗂", layout="wide")
-api_url = os.getenv("API_URL")
-subreddits_url = api_url + "subreddits/"
 
 
 col1, col2 = st.columns([8, 2])
@@ -15,20 +10,20 @@ with col1:
     st.title("🗂 Manage Your Interests")
 with col2:
     if st.button("🔄 Refresh", use_container_width=True):
-        st.session_state["__rerun"] = not st.session_state.get("__rerun", False)
+        data_client.get_subreddits.clear()
 
 def get_available_subreddits():
-    response = requests.get(subreddits_url)
-    if response.status_code == 200:
-        subreddits = response.json()
-        return [sub["name"] for sub in subreddits]
-    
+    try:
+        return data_client.get_subreddits()
+    except requests.exceptions.RequestException as e:
+        st.error(f"❌ Error fetching the subreddits: {e}")
+        return []
+
 def get_n_posts_in_subreddit(subreddit_name: str) -> int:
-    response = requests.get(api_url + "posts/")
-    if response.status_code == 200:
-        posts = response.json()
-        return len(posts)
-    return 0
+    try:
+        return data_client.get_posts_count(subreddit_name)
+    except requests.exceptions.RequestException:
+        return 0
 
 available_subreddits = get_available_subreddits()
 st.subheader("📋 Available Subreddits")
@@ -37,7 +32,7 @@ cols = st.columns(3)
 if available_subreddits:
     for i, sub in enumerate(available_subreddits):
         with cols[i % 3]:
-            if st.button(sub, use_container_width=True):
+            if st.button(f"{sub} ({get_n_posts_in_subreddit(sub)} posts)", key=f"sub_{sub}", use_container_width=True):
                 st.session_state["selected_subreddit"] = sub
                 st.switch_page("pages/3_analysis.py")
 
@@ -48,14 +43,14 @@ st.markdown("---")
 st.subheader("➕ Request a new subreddit")
 
 def add_new_subreddit(subreddit_name: str):
-    response = requests.post(subreddits_url, json={"name": subreddit_name})
+    response = data_client.add_subreddit(subreddit_name)
     if response.status_code == 200:
         st.success(f"Subreddit '{subreddit_name}' added successfully.")
     else:
         st.error(f"Error adding subreddit: {response.text}")
 
 def delete_subreddit(subreddit_name: str):
-    response = requests.delete(subreddits_url + subreddit_name)
+    response = data_client.delete_subreddit(subreddit_name)
     if response.status_code == 200:
         st.success(f"Subreddit '{subreddit_name}' deleted successfully.")
     else:
@@ -1,14 +1,14 @@
 import requests
 import streamlit as st
-from reddit_db.db_manager import RedditDBManager
-import matplotlib.pyplot as plt
-import seaborn as sns
+import data_client
 import plotly.express as px
 import pandas as pd
-import os 
 from dotenv import load_dotenv
+from sentiment_stream import get_sentiment_stream, apply_label_deltas, session_consumer
 load_dotenv()
 
+LIVE_UPDATE_SECONDS = 5
+
 def plot_sentiments_distribution_by_post(df):
     st.subheader("Sentiment Distribution Across Posts")
 
@@ -49,7 +49,8 @@ with col1:
     st.title(f"📈 Analysis of r/{st.session_state['selected_subreddit']}")
 with col2:
     if st.button("🔄 Refresh", use_container_width=True):
-        st.session_state["__rerun"] = not st.session_state.get("__rerun", False)
+        data_client.get_comments_sentiment.clear()
+        data_client.get_posts_count.clear()
 
 # TODO da rendere dinamico
 subreddit_status = None
@@ -60,46 +61,50 @@ if subreddit_status is not None:
     elif priority == 1:
         st.info("ℹ️ This subreddit has a low number of posts. Analysis may be limited.")
 
-API_URL = os.getenv("API_URL")
+API_URL = data_client.API_URL
 
 def get_subreddit_general_info(subreddit_name):
-    status_url = f"{API_URL}/data/comments/sentiment/{subreddit_name}"
-    response = requests.get(status_url)
-    if response.status_code == 200:
-        data = response.json()
-    return data #list of comments with sentiment scores
+    try:
+        return data_client.get_comments_sentiment(subreddit_name) #list of comments with sentiment scores
+    except requests.exceptions.RequestException as e:
+        st.error(f"❌ Error fetching the comments: {e}")
+        return []
 
 def get_subreddit_posts_count(subreddit_name):
-    count_url = f"{API_URL}/data/subreddits/posts_count/{subreddit_name}"
-    response = requests.get(count_url)
-    if response.status_code == 200:
-        data = response.json()
-        return data # number of posts
-    else:
+    try:
+        return data_client.get_posts_count(subreddit_name) # number of posts
+    except requests.exceptions.RequestException:
         return 0
 
 
 data = get_subreddit_general_info(subreddit_name=subreddit)
-post_count = get_subreddit_posts_count(subreddit_name=subreddit)["posts_count"]
+post_count = get_subreddit_posts_count(subreddit_name=subreddit)
 if len(data) == 0:
     st.stop()
 
-col1, col2, col3, col4 = st.columns(4)
-non_null_comments = len(data)
-
-positive_percentage = 0
-negative_percentage = 0
+# the page was (re)loaded with a full fetch, so live deltas start from these counts
+label_counts = {}
 for comment in data:
-    if comment["pred_label"] == "positive":
-        positive_percentage += 1
-    elif comment["pred_label"] == "negative":
-        negative_percentage += 1
-positive_percentage = (positive_percentage / non_null_comments) * 100 if non_null_comments > 0 else 0
-negative_percentage = (negative_percentage / non_null_comments) * 100 if non_null_comments > 0 else 0
-col1.metric("Posts analyzed", post_count)
-col2.metric("Comments analyzed", non_null_comments)
-col3.metric("Positive comments", f"{positive_percentage:.1f}%")
-col4.metric("Negative comments", f"{negative_percentage:.1f}%")
+    label_counts[comment["pred_label"]] = label_counts.get(comment["pred_label"], 0) + 1
+st.session_state["analysis_label_counts"] = label_counts
+get_sentiment_stream(API_URL, subreddit).drain(session_consumer("analysis"))
+
+@st.fragment(run_every=LIVE_UPDATE_SECONDS)
+def show_metrics():
+    deltas = get_sentiment_stream(API_URL, subreddit).drain(session_consumer("analysis"))
+    label_counts = apply_label_deltas(st.session_state["analysis_label_counts"], deltas)
+    st.session_state["analysis_label_counts"] = label_counts
+
+    col1, col2, col3, col4 = st.columns(4)
+    non_null_comments = sum(label_counts.values())
+    positive_percentage = (label_counts.get("positive", 0) / non_null_comments) * 100 if non_null_comments > 0 else 0
+    negative_percentage = (label_counts.get("negative", 0) / non_null_comments) * 100 if non_null_comments > 0 else 0
+    col1.metric("Posts analyzed", post_count)
+    col2.metric("Comments analyzed", non_null_comments)
+    col3.metric("Positive comments", f"{positive_percentage:.1f}%")
+    col4.metric("Negative comments", f"{negative_percentage:.1f}%")
+
+show_metrics()
 st.markdown("---")
 
 def plot_sentiments_distribution(df_melted):
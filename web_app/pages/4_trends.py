@@ -3,13 +3,15 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import requests
-import os
-from dotenv import load_dotenv
-load_dotenv()
+import data_client
+from data_client import API_URL, MAX_CHART_POINTS, TREND_RANGES
+from sentiment_stream import get_sentiment_stream, apply_bucket_deltas, session_consumer
+from typing import Optional
 
 st.set_page_config(page_title="Sentiment Analysis", page_icon="📈", layout="wide")
 
-API_URL = os.getenv("API_URL")
+LIVE_UPDATE_SECONDS = 5
+DATE_COLUMNS = {"hourly": "hour", "daily": "day", "weekly": "week", "monthly": "month"}
 
 if "selected_subreddit" not in st.session_state:
     st.warning("⚠️ No subreddit selected. Please go back to the previous page.")
@@ -22,7 +24,7 @@ with col1:
     st.title(f"📈 r/{subreddit} Trends")
 with col2:
     if st.button("🔄 Refresh", use_container_width=True):
-        st.session_state["__rerun"] = not st.session_state.get("__rerun", False)
+        st.session_state.pop("trend_frames", None)
 
 st.markdown("---")
 trend_option = st.radio(
@@ -31,20 +33,23 @@ trend_option = st.radio(
     index=1,
     horizontal=True
 )
+days = st.radio(
+    "Time Range:",
+    options=TREND_RANGES[trend_option.lower()],
+    format_func=lambda d: f"{d} days" if d < 365 else f"{d // 365} year{'s' if d >= 730 else ''}",
+    horizontal=True
+)
 st.markdown("---")
 
 
 # ======================= UTILS ==========================
-def fetch_sentiment_data(freq: str, subreddit: str) -> pd.DataFrame:
-    """Chiama l'endpoint FastAPI e restituisce un DataFrame pandas"""
+def fetch_sentiment_data(freq: str, subreddit: str, days: int) -> Optional[pd.DataFrame]:
+    """Chiama l'endpoint FastAPI e restituisce un DataFrame pandas, None in caso di errore"""
     try:
-        response = requests.get(f"{API_URL}/data/sentiment/{freq}/{subreddit}")
-        response.raise_for_status()
-        data = response.json()
-        return pd.DataFrame(data)
+        return data_client.get_sentiment_trend(freq, subreddit, days=days, max_points=MAX_CHART_POINTS)
     except requests.exceptions.RequestException as e:
         st.error(f"❌ Error fetching {freq} data: {e}")
-        return pd.DataFrame()
+        return None
 
 
 def plot_bar(df, date_col, title="Bar Plot of Sentiment"):
@@ -73,11 +78,13 @@ def plot_bar(df, date_col, title="Bar Plot of Sentiment"):
     st.plotly_chart(fig, use_container_width=True, config={'staticPlot': True})
 
 
-def plot_ma(df, date_col, title="Moving Average of Sentiment", ma_window=7):
-    df_sorted = df.sort_values(date_col).copy()
-    df_sorted['avg_positive_ma'] = df_sorted['avg_positive'].rolling(ma_window, min_periods=1).mean()
-    df_sorted['avg_neutral_ma'] = df_sorted['avg_neutral'].rolling(ma_window, min_periods=1).mean()
-    df_sorted['avg_negative_ma'] = df_sorted['avg_negative'].rolling(ma_window, min_periods=1).mean()
+def plot_ma(df, date_col, title="Moving Average of Sentiment", ma_window="7D"):
+    # a time window, not a number of rows: the downsampled buckets are not evenly spaced
+    df_sorted = df.assign(**{date_col: pd.to_datetime(df[date_col])}).sort_values(date_col)
+    rolling = df_sorted.rolling(ma_window, on=date_col, min_periods=1)
+    df_sorted['avg_positive_ma'] = rolling['avg_positive'].mean()
+    df_sorted['avg_neutral_ma'] = rolling['avg_neutral'].mean()
+    df_sorted['avg_negative_ma'] = rolling['avg_negative'].mean()
 
     fig = go.Figure()
     fig.add_trace(go.Scatter(x=df_sorted[date_col], y=df_sorted['avg_positive_ma'],
@@ -98,41 +105,72 @@ def plot_ma(df, date_col, title="Moving Average of Sentiment", ma_window=7):
     st.plotly_chart(fig, use_container_width=True, config={'staticPlot': True})
 
 
+def get_trend_frame(freq: str, days: int) -> pd.DataFrame:
+    """
+    Return the aggregated sentiment of the selected subreddit, kept in the session.
+    Pending live deltas are applied to every cached frequency and range, the API is only hit
+    the first time a frequency and range is shown or after a manual refresh, bypassing the
+    st.cache_data of the other reads, so the frame is current when the deltas start.
+    """
+    frames = st.session_state.setdefault("trend_frames", {})
+    stream = get_sentiment_stream(API_URL, subreddit)
+    deltas = stream.drain(session_consumer("trends"))
+    if deltas:
+        for (sub, cached_freq, cached_days), df in frames.items():
+            if sub == subreddit:
+                frames[(sub, cached_freq, cached_days)] = apply_bucket_deltas(df, DATE_COLUMNS[cached_freq], cached_freq, deltas)
+    if (subreddit, freq, days) not in frames:
+        # subscribed before the fetch, so no later delta is missed; the ones the frame already
+        # counts are skipped by their sequence number
+        stream.wait_connected()
+        df = fetch_sentiment_data(freq, subreddit, days)
+        # errors are not kept: the next fragment run fetches again
+        if df is None:
+            return pd.DataFrame()
+        frames[(subreddit, freq, days)] = df
+    return frames[(subreddit, freq, days)]
+
+
 # ======================= MAIN LOGIC ==========================
 
-if trend_option == "Hourly":
-    st.subheader("Hourly Trends")
-    df_hourly = fetch_sentiment_data("hourly", subreddit)
-    if not df_hourly.empty:
-        plot_bar(df_hourly, date_col='hour', title="Hourly Sentiment (Stacked Bars)")
-
-        st.markdown("---")
-        window_option = st.radio(
-            "Select Moving Average Window:",
-            options=["6-hour", "12-hour", "24-hour"],
-            index=1,
-            horizontal=True
-        )
-        ma_window = int(window_option.split("-")[0])
-        plot_ma(df_hourly, date_col='hour', title=f"Hourly Sentiment ({window_option} Moving Average)", ma_window=ma_window)
-
-elif trend_option == "Daily":
-    st.subheader("Daily Trends")
-    df_daily = fetch_sentiment_data("daily", subreddit)
-    if not df_daily.empty:
-        plot_bar(df_daily, date_col='day', title="Daily Sentiment (Stacked Bars)")
-        plot_ma(df_daily, date_col='day', title="Daily Sentiment (7-day Moving Average)", ma_window=7)
-
-elif trend_option == "Weekly":
-    st.subheader("Weekly Trends")
-    df_weekly = fetch_sentiment_data("weekly", subreddit)
-    if not df_weekly.empty:
-        plot_bar(df_weekly, date_col='week', title="Weekly Sentiment (Stacked Bars)")
-        plot_ma(df_weekly, date_col='week', title="Weekly Sentiment (4-week Moving Average)", ma_window=4)
-
-elif trend_option == "Monthly":
-    st.subheader("Monthly Trends")
-    df_monthly = fetch_sentiment_data("monthly", subreddit)
-    if not df_monthly.empty:
-        plot_bar(df_monthly, date_col='month', title="Monthly Sentiment (Stacked Bars)")
-        plot_ma(df_monthly, date_col='month', title="Monthly Sentiment (3-month Moving Average)", ma_window=3)
+@st.fragment(run_every=LIVE_UPDATE_SECONDS)
+def show_trends(trend_option: str, days: int):
+    if trend_option == "Hourly":
+        st.subheader("Hourly Trends")
+        df_hourly = get_trend_frame("hourly", days)
+        if not df_hourly.empty:
+            plot_bar(df_hourly, date_col='hour', title="Hourly Sentiment (Stacked Bars)")
+
+            st.markdown("---")
+            window_option = st.radio(
+                "Select Moving Average Window:",
+                options=["6-hour", "12-hour", "24-hour"],
+                index=1,
+                horizontal=True
+            )
+            ma_window = f"{window_option.split('-')[0]}h"
+            plot_ma(df_hourly, date_col='hour', title=f"Hourly Sentiment ({window_option} Moving Average)", ma_window=ma_window)
+
+    elif trend_option == "Daily":
+        st.subheader("Daily Trends")
+        df_daily = get_trend_frame("daily", days)
+        if not df_daily.empty:
+            plot_bar(df_daily, date_col='day', title="Daily Sentiment (Stacked Bars)")
+            plot_ma(df_daily, date_col='day', title="Daily Sentiment (7-day Moving Average)", ma_window="7D")
+
+    elif trend_option == "Weekly":
+        st.subheader("Weekly Trends")
+        df_weekly = get_trend_frame("weekly", days)
+        if not df_weekly.empty:
+            plot_bar(df_weekly, date_col='week', title="Weekly Sentiment (Stacked Bars)")
+            plot_ma(df_weekly, date_col='week', title="Weekly Sentiment (4-week Moving Average)", ma_window="28D")
+
+    elif trend_option == "Monthly":
+        st.subheader("Monthly Trends")
+        df_monthly = get_trend_frame("monthly", days)
+        if not df_monthly.empty:
+            plot_bar(df_monthly, date_col='month', title="Monthly Sentiment (Stacked Bars)")
+            plot_ma(df_monthly, date_col='month', title="Monthly Sentiment (3-month Moving Average)", ma_window="91D")
+
+
+show_trends(trend_option, days)
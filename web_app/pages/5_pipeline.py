@@ -0,0 +1,109 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import requests
+import data_client
+
+st.set_page_config(page_title="Pipeline Health", page_icon="⚙️", layout="wide")
+
+col1, col2 = st.columns([8, 2])
+with col1:
+    st.title("⚙️ Pipeline Health")
+with col2:
+    if st.button("🔄 Refresh", use_container_width=True):
+        data_client.get_stage_metrics.clear()
+        data_client.get_api_usage.clear()
+
+st.markdown("---")
+hours = st.radio(
+    "Time Window:",
+    options=[6, 24, 72, 168],
+    format_func=lambda h: f"{h} hours" if h < 168 else "1 week",
+    index=1,
+    horizontal=True
+)
+st.markdown("---")
+
+
+# ======================= UTILS ==========================
+def fetch_stage_metrics(hours: int) -> pd.DataFrame:
+    try:
+        return data_client.get_stage_metrics(hours)
+    except requests.exceptions.RequestException as e:
+        st.error(f"❌ Error fetching the pipeline metrics: {e}")
+        return pd.DataFrame()
+
+
+def plot_throughput(df: pd.DataFrame):
+    fig = px.line(df, x="ended_datetime", y="rows_per_sec", color="stage", markers=True)
+    fig.update_layout(title="Throughput per Stage", xaxis_title="Time", yaxis_title="Rows / second")
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def plot_backlog(df: pd.DataFrame):
+    # every stage row of a window carries the same backlog snapshot
+    backlog = (
+        df.groupby("ended_datetime")[["unlabeled_backlog", "uncommented_backlog"]].max()
+        .reset_index()
+        .melt(id_vars="ended_datetime", var_name="Backlog", value_name="Size")
+    )
+    backlog["Backlog"] = backlog["Backlog"].map({
+        "unlabeled_backlog": "Comments without sentiment",
+        "uncommented_backlog": "Posts without comments",
+    })
+    fig = px.line(backlog, x="ended_datetime", y="Size", color="Backlog", markers=True)
+    fig.update_layout(title="Backlog", xaxis_title="Time", yaxis_title="Items waiting")
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def fetch_api_usage(hours: int) -> dict:
+    try:
+        return data_client.get_api_usage(hours)
+    except requests.exceptions.RequestException as e:
+        st.error(f"❌ Error fetching the Reddit API usage: {e}")
+        return {"operations": [], "budget": []}
+
+
+def show_api_usage(usage: dict):
+    st.subheader("Reddit API budget")
+    budget = pd.DataFrame(usage["budget"])
+    if not budget.dropna(subset=["remaining"]).empty:
+        budget["ended_datetime"] = pd.to_datetime(budget["ended_datetime"])
+        fig = px.line(budget, x="ended_datetime", y="remaining", markers=True)
+        fig.update_layout(title="Requests left in the rate-limit window", xaxis_title="Time", yaxis_title="Requests")
+        st.plotly_chart(fig, use_container_width=True)
+
+    operations = pd.DataFrame(usage["operations"])
+    if operations.empty:
+        st.info("No Reddit API requests in this time window.")
+        return
+    per_operation = operations.groupby("operation")[["requests", "items"]].sum()
+    per_operation["yield"] = per_operation["items"] / per_operation["requests"]
+    fig = px.bar(per_operation.reset_index(), x="operation", y="requests", color="yield")
+    fig.update_layout(title="Requests per Operation (color: new items per request)", xaxis_title="Operation", yaxis_title="Requests")
+    st.plotly_chart(fig, use_container_width=True)
+    with st.expander("Requests and yield per subreddit"):
+        st.dataframe(operations, use_container_width=True)
+
+
+# ======================= MAIN LOGIC ==========================
+df = fetch_stage_metrics(hours)
+if df.empty:
+    st.info("No pipeline metrics in this time window yet.")
+    st.stop()
+
+latest = df.sort_values("ended_datetime").groupby("stage").tail(1).set_index("stage")
+metric_cols = st.columns(len(latest) + 2)
+for col, (stage, row) in zip(metric_cols, latest.iterrows()):
+    col.metric(f"{stage.capitalize()} rows/s", f"{row['rows_per_sec']:.1f}", f"{int(row['errors'])} errors", delta_color="off")
+metric_cols[-2].metric("Comments without sentiment", int(latest["unlabeled_backlog"].max()))
+metric_cols[-1].metric("Posts without comments", int(latest["uncommented_backlog"].max()))
+
+plot_throughput(df)
+plot_backlog(df)
+
+with st.expander("API calls and errors"):
+    totals = df.groupby("stage")[["rows_processed", "api_calls", "errors"]].sum()
+    st.dataframe(totals, use_container_width=True)
+
+show_api_usage(fetch_api_usage(hours))
@@ -0,0 +1,83 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import requests
+import data_client
+from data_client import MAX_CHART_POINTS, TREND_RANGES
+
+st.set_page_config(page_title="Compare Subreddits", page_icon="⚖️", layout="wide")
+
+DATE_COLUMNS = {"hourly": "hour", "daily": "day", "weekly": "week", "monthly": "month"}
+METRICS = {
+    "Net sentiment (positive - negative)": "net",
+    "Positive": "avg_positive",
+    "Neutral": "avg_neutral",
+    "Negative": "avg_negative",
+}
+
+col1, col2 = st.columns([8, 2])
+with col1:
+    st.title("⚖️ Compare Subreddits")
+with col2:
+    if st.button("🔄 Refresh", use_container_width=True):
+        data_client.get_sentiment_comparison.clear()
+
+try:
+    available_subreddits = data_client.get_subreddits()
+except requests.exceptions.RequestException as e:
+    st.error(f"❌ Error fetching the subreddits: {e}")
+    st.stop()
+
+default = [st.session_state["selected_subreddit"]] if st.session_state.get("selected_subreddit") in available_subreddits else []
+subreddits = st.multiselect("Subreddits:", options=available_subreddits, default=default)
+
+st.markdown("---")
+freq = st.radio("Select Trend Type:", options=["Hourly", "Daily", "Weekly", "Monthly"], index=1, horizontal=True).lower()
+days = st.radio(
+    "Time Range:",
+    options=TREND_RANGES[freq],
+    format_func=lambda d: f"{d} days" if d < 365 else f"{d // 365} year{'s' if d >= 730 else ''}",
+    horizontal=True
+)
+metric_label = st.radio("Metric:", options=list(METRICS), horizontal=True)
+st.markdown("---")
+
+if not subreddits:
+    st.info("Select one or more subreddits to compare.")
+    st.stop()
+
+
+# ======================= UTILS ==========================
+def fetch_comparison(freq: str, subreddits: list[str], days: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    try:
+        # sorted, so the same selection in any order hits the same cache entry
+        return data_client.get_sentiment_comparison(freq, tuple(sorted(subreddits)), days=days, max_points=MAX_CHART_POINTS)
+    except requests.exceptions.RequestException as e:
+        st.error(f"❌ Error fetching the comparison: {e}")
+        return pd.DataFrame(), pd.DataFrame()
+
+
+def plot_comparison(df: pd.DataFrame, date_col: str, metric: str, title: str):
+    fig = px.line(df.sort_values(date_col), x=date_col, y=metric, color="subreddit", markers=len(df) < 200)
+    fig.update_layout(title=title, xaxis_title=date_col.capitalize(), yaxis_title="Average Score", legend_title="Subreddit")
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# ======================= MAIN LOGIC ==========================
+df, averages = fetch_comparison(freq, subreddits, days)
+if df.empty:
+    st.info("No sentiment data for these subreddits in this time range.")
+    st.stop()
+
+date_col = DATE_COLUMNS[freq]
+df["net"] = df["avg_positive"] - df["avg_negative"]
+plot_comparison(df, date_col, METRICS[metric_label], f"{metric_label} by {date_col}")
+
+missing = sorted(set(subreddits) - set(df["subreddit"]))
+if missing:
+    st.caption(f"No data in this range for: {', '.join(missing)}")
+
+# over every comment of the range, computed by the backend before the chart downsampling
+summary = averages.assign(net=averages["avg_positive"] - averages["avg_negative"])
+st.subheader("Averages over the time range")
+st.dataframe(summary.sort_values("net", ascending=False), use_container_width=True)
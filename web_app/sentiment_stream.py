@@ -0,0 +1,153 @@
+import json
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pandas as pd
+import requests
+import streamlit as st
+
+
+class SentimentStream:
+    """
+    Background consumer of the /stream/sentiment/{subreddit} server-sent events, one per
+    subreddit shared by every browser session. Deltas are buffered in one queue per
+    consumer (session and page) and applied with drain(), so the dashboard never has to
+    re-fetch the whole dataset to stay up to date.
+
+    Sessions end without notice: a consumer not drained for idle_seconds is dropped, and
+    the connection is closed once no consumer is left; the next drain() reopens it.
+    """
+
+    def __init__(self, api_url: str, subreddit: str, retry_seconds: int = 5, idle_seconds: int = 120):
+        self.url = f"{api_url}/stream/sentiment/{subreddit}"
+        self.subreddit = subreddit
+        self.retry_seconds = retry_seconds
+        self.idle_seconds = idle_seconds
+        self.consumers: dict[str, queue.Queue] = {}
+        self.last_drained: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # set while the stream is open: deltas published from then on are received
+        self.connected = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _prune(self) -> bool:
+        """Drop the idle consumers, return True if none is left"""
+        now = time.monotonic()
+        with self._lock:
+            for consumer in [c for c, drained in self.last_drained.items() if now - drained > self.idle_seconds]:
+                del self.consumers[consumer], self.last_drained[consumer]
+            return not self.consumers
+
+    def _run(self):
+        while not self._stop.is_set() and not self._prune():
+            try:
+                with requests.get(self.url, stream=True, timeout=(5, 60)) as response:
+                    response.raise_for_status()
+                    self.connected.set()
+                    for line in response.iter_lines(decode_unicode=True):
+                        if self._stop.is_set() or self._prune():
+                            return
+                        if line and line.startswith("data:"):
+                            delta = json.loads(line[len("data:"):])
+                            with self._lock:
+                                for consumer_queue in self.consumers.values():
+                                    consumer_queue.put(delta)
+            except (requests.exceptions.RequestException, ValueError):
+                pass
+            finally:
+                self.connected.clear()
+            self._stop.wait(self.retry_seconds)
+
+    def drain(self, consumer: str) -> list[dict]:
+        """Return all the deltas received since the last call of the given consumer"""
+        with self._lock:
+            consumer_queue = self.consumers.setdefault(consumer, queue.Queue())
+            self.last_drained[consumer] = time.monotonic()
+            if not self._stop.is_set() and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        deltas = []
+        while True:
+            try:
+                deltas.append(consumer_queue.get_nowait())
+            except queue.Empty:
+                return deltas
+
+    def wait_connected(self, timeout: float = 5.0) -> bool:
+        """Wait for the stream to be open, so a snapshot fetched now misses none of the next deltas"""
+        return self.connected.wait(timeout)
+
+    def stop(self):
+        self._stop.set()
+
+
+@st.cache_resource(show_spinner=False)
+def get_sentiment_stream(api_url: str, subreddit: str) -> SentimentStream:
+    """Return the stream of a subreddit, shared by every session"""
+    return SentimentStream(api_url, subreddit)
+
+
+def session_consumer(page: str) -> str:
+    """Consumer name of a page in the current browser session"""
+    session_id = st.session_state.setdefault("sentiment_stream_session", uuid.uuid4().hex)
+    return f"{session_id}:{page}"
+
+
+def bucket_key(hour: str, freq: str) -> str:
+    """Map an hourly bucket to the key used by the /data/sentiment/{freq} endpoints"""
+    ts = datetime.fromisoformat(hour)
+    if freq == "hourly":
+        return hour
+    if freq == "daily":
+        return str(ts.date())
+    if freq == "weekly":
+        return str((ts - timedelta(days=ts.weekday())).date())
+    if freq == "monthly":
+        return str(ts.date().replace(day=1))
+    raise ValueError(f"Unknown frequency: {freq}")
+
+
+def apply_bucket_deltas(df: pd.DataFrame, date_col: str, freq: str, deltas: list[dict]) -> pd.DataFrame:
+    """
+    Merge the hourly buckets of the deltas into an aggregated sentiment DataFrame.
+    The frame may be downsampled (LTTB): a delta for a bucket it lacks is only added when
+    newer than its last bucket, older ones were folded away and are skipped. Deltas published
+    before the frame was queried (seq up to df.attrs["sentiment_seq"]) are already in it.
+    """
+    seq = df.attrs.get("sentiment_seq", 0)
+    rows = {row[date_col]: row for row in df.to_dict("records")} if not df.empty else {}
+    newest = max(rows) if rows else None
+    for delta in deltas:
+        if delta.get("seq", 0) <= seq:
+            continue
+        for bucket in delta["buckets"]:
+            key = bucket_key(bucket["hour"], freq)
+            if key not in rows and newest is not None and key < newest:
+                continue
+            row = rows.get(key, {date_col: key, "avg_positive": 0.0, "avg_neutral": 0.0,
+                                 "avg_negative": 0.0, "n_comments": 0})
+            n_old = row["n_comments"]
+            n_new = n_old + bucket["n_comments"]
+            for avg_col, sum_col in [("avg_positive", "sum_positive"),
+                                     ("avg_neutral", "sum_neutral"),
+                                     ("avg_negative", "sum_negative")]:
+                row[avg_col] = ((row[avg_col] or 0.0) * n_old + bucket[sum_col]) / n_new
+            row["n_comments"] = n_new
+            rows[key] = row
+    merged = pd.DataFrame(sorted(rows.values(), key=lambda r: r[date_col]))
+    merged.attrs["sentiment_seq"] = seq
+    return merged
+
+
+def apply_label_deltas(label_counts: dict[str, int], deltas: list[dict]) -> dict[str, int]:
+    """Add the label counts of the deltas to the current counts"""
+    label_counts = dict(label_counts)
+    for delta in deltas:
+        for label, count in delta["label_counts"].items():
+            label_counts[label] = label_counts.get(label, 0) + count
+    return label_counts